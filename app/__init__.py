@@ -6,7 +6,23 @@ from dotenv import load_dotenv
 
 from config import config
 from .api import api as api_blueprint
+from .commands import register_commands
+from .like_queue import init_like_queue
+from .like_state import init_like_state_cache
 from .models import db
+from .search import init_search
+from .timeline import init_timeline_store
+from .utils.cache import init_feed_cache
+from .utils.common import init_token_keys
+from .utils.engine import apply_engine_options, init_engines
+from .utils.idempotency import init_idempotency
+from .utils.json_provider import FastJSONProvider
+from .utils.metrics import init_metrics
+from .utils.passwords import init_password_hasher
+from .utils.rate_limit import init_rate_limiter
+from .utils.replicas import init_replicas
+from .utils.request_parsing import init_request_parsing
+from .utils.token_cache import init_token_cache
 
 dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
 if os.path.exists(dotenv_path):
@@ -33,14 +49,31 @@ def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
+    app.json = FastJSONProvider(app)
 
+    apply_engine_options(app)
     db.init_app(app)
+    init_token_keys(app)
+    init_token_cache(app)
+    init_password_hasher(app)
+    init_feed_cache(app)
+    init_timeline_store(app)
+    init_metrics(app)
+    init_request_parsing(app)
+    init_engines(app)
+    init_replicas(app)
+    init_search(app)
+    init_like_queue(app)
+    init_like_state_cache(app)
+    init_rate_limiter(app)
+    init_idempotency(app)
 
-    if config_name in ['default', 'development', 'testing']:
+    if app.config['AUTO_CREATE_TABLES']:
         with app.app_context():
             db.create_all()
 
     app.register_blueprint(api_blueprint, url_prefix='/api/v1')
+    register_commands(app)
 
     return app
 
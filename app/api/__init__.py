@@ -4,4 +4,4 @@ api = Blueprint('api', __name__)
 
 print(f'name is {__name__}')
 
-from . import register, login, tweet
\ No newline at end of file
+from . import register, login, tweet, bulk, export, thread, user, search
\ No newline at end of file
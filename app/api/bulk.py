@@ -0,0 +1,139 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from flask import current_app, make_response, request
+from marshmallow import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import api
+from .tweet import _auth_user_for_tweet
+from ..models import db, Tweet
+from ..search import get_search_index
+from ..timeline import fan_out
+from ..tweet_validation import TweetInput
+from ..utils.cache import invalidate_feed_cache
+from ..utils.common import AuthError
+from ..utils.request_parsing import body_limit, read_json
+
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# the auth token is checked once per request, not per item
+bulk_tweet_schema = TweetInput(exclude=('auth_token',))
+
+
+def _parse_items():
+    """
+    Returns the list of submitted items and a dict of per-item errors. The body is
+    either a JSON array or, with an application/x-ndjson content type, one JSON
+    object per line.
+    """
+    if request.mimetype == NDJSON_MIMETYPE:
+        items, errors = [], {}
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(current_app.json.loads(line))
+            except ValueError:
+                errors[len(items)] = {'_schema': ['Invalid JSON.']}
+                items.append(None)
+        return items, errors
+    items = read_json()
+    if not isinstance(items, list):
+        raise ValueError('Expected a JSON array of tweets.')
+    return items, {}
+
+
+def _insert_batch(user_id, batch):
+    """
+    Inserts one batch of (index, item) pairs with a single executemany and
+    returns their ids in the order of `batch`. Reply counters of the parents are
+    bumped once per parent in the same transaction.
+    """
+    now = datetime.utcnow()
+    rows = [{
+        'user_id': user_id,
+        'body': item['body'],
+        'parent_id': item.get('parent_id'),
+        'dateadded': now,
+    } for index, item in batch]
+    # RETURNING does not promise VALUES order, so the ids are matched to the rows
+    # on (body, parent_id); rows equal on both are identical, and any of their ids
+    # fits any of them
+    returned = db.session.execute(insert(Tweet).returning(Tweet.id, Tweet.body, Tweet.parent_id), rows).all()
+    ids_by_key = defaultdict(list)
+    for id, body, parent_id in returned:
+        ids_by_key[body, parent_id].append(id)
+    ids = [ids_by_key[row['body'], row['parent_id']].pop() for row in rows]
+    get_search_index().add([(id, body) for id, body, parent_id in returned])
+    replies = Counter(row['parent_id'] for row in rows if row['parent_id'])
+    for parent_id, num_replies in replies.items():
+        Tweet.adjust_counter(parent_id, 'num_replies', num_replies)
+    db.session.commit()
+    fan_out(user_id, [(now, id) for id in ids])
+    return ids
+
+
+def create_tweets(auth_token, items, parse_errors):
+    user, void = _auth_user_for_tweet(auth_token)
+    max_items = current_app.config['BULK_TWEETS_MAX_ITEMS']
+    if len(items) > max_items:
+        raise ValueError(f'At most {max_items} tweets can be submitted at once.')
+
+    errors = dict(parse_errors)
+    valid = []
+    for index, item in enumerate(items):
+        if index in errors:
+            continue
+        try:
+            valid.append((index, bulk_tweet_schema.load(item)))
+        except ValidationError as e:
+            errors[index] = e.messages
+    results = [None] * len(items)
+
+    batch_size = current_app.config['BULK_INSERT_BATCH_SIZE']
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start:start + batch_size]
+        try:
+            ids = _insert_batch(user.id, batch)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.info(f'[tweets/bulk] batch failed: {e}')
+            for index, item in batch:
+                errors[index] = {'_schema': ['Could not be saved.']}
+            continue
+        for (index, item), id in zip(batch, ids):
+            results[index] = {'id': id}
+
+    for index, item_errors in errors.items():
+        results[index] = {'errors': item_errors}
+
+    created = len(items) - len(errors)
+    if created:
+        invalidate_feed_cache()
+    current_app.logger.info(f'[tweets/bulk] created {created} of {len(items)}')
+    return {
+        'created': created,
+        'results': results
+    }, 200
+
+
+@api.route('/tweets/bulk/', methods=['POST'])
+@body_limit('BULK_REQUEST_MAX_BYTES')
+def route_bulk_tweets():
+    """
+    Creates many tweets for the caller at once. Each result holds the new tweet's
+    id, or the errors that kept that item from being created.
+    """
+    try:
+        items, parse_errors = _parse_items()
+        return_data, status = create_tweets(request.headers.get('Authorization'), items, parse_errors)
+    except Exception as e:
+        status = 400
+        return_data = f'{e}'
+        if e.__class__ == AuthError:
+            status = 401
+        current_app.logger.info(f'[tweets/bulk] error: {e}')
+    return make_response({'data': return_data}, status)
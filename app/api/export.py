@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from flask import Response, current_app, make_response, request, stream_with_context
+
+from . import api
+from .user import _auth_user
+from ..tweet_export import iter_tweets_ndjson
+from ..utils.common import AuthError
+
+
+@api.route('/tweets/export/', methods=['GET'])
+def export_tweets():
+    """
+    Streams every tweet as NDJSON, optionally filtered by `user_id` and a
+    `since` / `until` range (ISO 8601) on dateadded. Only served with
+    TWEETS_EXPORT_ENABLED, and to callers with a valid bearer token.
+    """
+    if not current_app.config['TWEETS_EXPORT_ENABLED']:
+        return make_response({'data': 'Not found.'}, 404)
+    try:
+        _auth_user(request.headers.get('Authorization'))
+    except AuthError as e:
+        return make_response({'data': f'{e}'}, 401)
+    try:
+        since, until, user_id = [
+            parse(request.args[name]) if name in request.args else None
+            for name, parse in [('since', datetime.fromisoformat),
+                                ('until', datetime.fromisoformat),
+                                ('user_id', int)]
+        ]
+    except ValueError as e:
+        return make_response({'data': f'{e}'}, 400)
+    current_app.logger.info(f'[tweets/export] user_id={user_id} since={since} until={until}')
+    return Response(
+        stream_with_context(iter_tweets_ndjson(user_id=user_id, since=since, until=until)),
+        mimetype='application/x-ndjson'
+    )
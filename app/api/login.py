@@ -1,30 +1,26 @@
-from datetime import datetime, timedelta
-import json
-
-import jwt
 from flask import Flask, make_response, current_app, request, jsonify, session
 from flask_sqlalchemy import SQLAlchemy
+from marshmallow import ValidationError
 
 from . import api
 from ..models import db, User
 from ..user_validation import LoginInput
-from ..utils.common import generate_response
+from ..utils.common import TokenGenerator, generate_response
+from ..utils.passwords import HashingOverloaded
+from ..utils.request_parsing import load_body
+
 
+login_schema = LoginInput()
 
 
 def login_user(request, input_data):
     """
-    It takes in a request and input data, validates the input data, checks if the user exists, checks if
-    the password is correct, and returns a response
+    It takes in a request and the input data loaded by `login_schema`, checks if the user exists,
+    checks if the password is correct, and returns a response
     :param request: The request object
     :param input_data: The data that is passed to the function
     :return: A dictionary with the keys: data, message, status
     """
-    create_validation_schema = LoginInput()
-    errors = create_validation_schema.validate(input_data)
-    if errors:
-        return generate_response(message=errors)
-
     get_user = User.query.filter_by(email=input_data.get("email")).first()
     if get_user is None:
         current_app.logger.info('[login] user not found')
@@ -32,15 +28,12 @@ def login_user(request, input_data):
             'message':"User not found"
         }, 400
     if get_user.verify_password(input_data.get("password")):
+        if get_user.password_needs_rehash():
+            current_app.logger.info('[login] upgrading password hash')
+            get_user.password = input_data.get("password")
+            db.session.commit()
         current_app.logger.info('[login] creating token')
-        token = jwt.encode(
-            {
-                "id": get_user.id,
-                "email": get_user.email,
-                "exp": datetime.utcnow() + timedelta(minutes=300),
-            },
-            current_app.config["SECRET_KEY"],
-        )
+        token = TokenGenerator.encode_token(get_user)
         input_data["token"] = token
         return {
             'message': "Logged in",
@@ -55,6 +48,10 @@ def login_user(request, input_data):
 
 @api.route('/auth/login/', methods=['POST'])
 def route_login():
-    input_data = json.loads(request.data)
-    return_data, status = login_user(request, input_data)
+    try:
+        return_data, status = login_user(request, load_body(login_schema))
+    except ValidationError as e:
+        return_data, status = generate_response(message=e.messages)
+    except HashingOverloaded as e:
+        return_data, status = f'{e}', 503
     return make_response({'data': return_data}, status)
\ No newline at end of file
@@ -1,25 +1,28 @@
-import json
 
 from flask import Flask, request, make_response, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from marshmallow import ValidationError
 
 from . import api
 from ..models import db, User
 from ..user_validation import SignupInput
 from ..utils.common import generate_response
+from ..utils.idempotency import idempotent
+from ..utils.passwords import HashingOverloaded
+from ..utils.rate_limit import rate_limit
+from ..utils.request_parsing import load_body
+
+
+signup_schema = SignupInput()
 
 
 def create_user(request, input_data):
     """
     It creates a new user
     :param request: The request object
-    :param input_data: This is the data that is passed to the function
+    :param input_data: This is the data loaded by `signup_schema`
     :return: A response object
     """
-    create_validation_schema = SignupInput()
-    errors = create_validation_schema.validate(input_data)
-    if errors:
-        return generate_response(message=errors)
     email_exists = User.query.filter_by(email=input_data.get("email")).first()
     if email_exists:
         return {
@@ -38,7 +41,13 @@ def create_user(request, input_data):
 
 
 @api.route('/auth/register/', methods=['POST'])
+@idempotent
+@rate_limit('register')
 def route_register():
-    input_data = json.loads(request.data)
-    return_data, status = create_user(request, input_data)
+    try:
+        return_data, status = create_user(request, load_body(signup_schema))
+    except ValidationError as e:
+        return_data, status = generate_response(message=e.messages)
+    except HashingOverloaded as e:
+        return_data, status = f'{e}', 503
     return make_response({'data': return_data}, status)
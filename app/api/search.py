@@ -0,0 +1,42 @@
+from flask import current_app, jsonify, make_response, request, url_for
+
+from . import api
+from ..models import Tweet
+from ..search import get_search_index
+from ..utils.pagination import InvalidCursor, encode_rank_cursor
+from ..utils.replicas import read_only
+
+
+@api.route('/tweets/search/', methods=['GET'])
+@read_only
+def search_tweets():
+    """
+    Full-text search of tweet bodies for `q`, best match first, paged by `cursor`.
+    """
+    search_index = get_search_index()
+    if not search_index.enabled:
+        return make_response({'data': 'Search is not available.'}, 404)
+    query = request.args.get('q', '').strip()
+    if not query:
+        return make_response({'data': 'q is required'}, 400)
+    per_page = current_app.config['TWEETS_PER_PAGE']
+    try:
+        matches = search_index.search(query, request.args.get('cursor'), per_page + 1)
+    except InvalidCursor as e:
+        return make_response({'data': f'{e}'}, 400)
+
+    next_cursor = None
+    if len(matches) > per_page:
+        matches = matches[:per_page]
+        next_cursor = encode_rank_cursor(*matches[-1])
+    ids = [id for rank, id in matches]
+    tweets = {tweet.id: tweet for tweet in Tweet.query.filter(Tweet.id.in_(ids))}
+
+    next = None
+    if next_cursor:
+        next = url_for('api.search_tweets', q=query, cursor=next_cursor)
+    return jsonify({
+        'tweets': Tweet.bulk_json(tweets[id] for id in ids if id in tweets),
+        'next': next,
+        'cursor': next_cursor
+    })
@@ -0,0 +1,85 @@
+from flask import current_app, make_response, request
+
+from . import api
+from ..models import db, Tweet
+from ..utils.replicas import read_only
+
+
+def _thread_rows(root_id, max_depth, max_nodes):
+    """
+    Loads the reply tree under `root_id` with one recursive CTE, breadth first,
+    stopping at `max_depth` levels below the root. One row beyond `max_nodes` is
+    fetched so the caller can tell whether the tree was truncated.
+    """
+    thread = (
+        db.select(Tweet.id, Tweet.parent_id, db.literal(0).label('depth'))
+        .where(Tweet.id == root_id)
+        .cte('thread', recursive=True)
+    )
+    thread = thread.union_all(
+        db.select(Tweet.id, Tweet.parent_id, (thread.c.depth + 1).label('depth'))
+        .join(thread, Tweet.parent_id == thread.c.id)
+        .where(thread.c.depth < max_depth)
+    )
+    statement = (
+        db.select(Tweet, thread.c.depth)
+        .join(thread, Tweet.id == thread.c.id)
+        .order_by(thread.c.depth, Tweet.dateadded, Tweet.id)
+        .limit(max_nodes + 1)
+    )
+    return db.session.execute(statement).all()
+
+
+def _build_tree(rows):
+    """
+    Nests the breadth-first rows under their parents in one pass: every parent
+    precedes its children, so it is always already in `nodes`.
+    """
+    nodes = {}
+    root = None
+    for tweet, depth in rows:
+        node = tweet.to_json(children=[])
+        node['depth'] = depth
+        node['replies'] = []
+        nodes[tweet.id] = node
+        parent = nodes.get(tweet.parent_id) if depth else None
+        if parent is None:
+            root = node
+        else:
+            parent['children'].append(tweet.id)
+            parent['replies'].append(node)
+    return root
+
+
+@api.route('/tweet/<int:id>/thread/', methods=['GET'])
+@read_only
+def get_thread(id):
+    """
+    Returns tweet `id` with its replies nested under `replies`, down to
+    `max_depth` levels and at most `max_nodes` tweets in total. `truncated` is set
+    when the limits cut the tree short; `children` then only lists the loaded replies.
+    """
+    max_depth = min(
+        request.args.get('max_depth', current_app.config['THREAD_MAX_DEPTH'], type=int),
+        current_app.config['THREAD_MAX_DEPTH']
+    )
+    max_nodes = min(
+        request.args.get('max_nodes', current_app.config['THREAD_MAX_NODES'], type=int),
+        current_app.config['THREAD_MAX_NODES']
+    )
+    if max_depth < 0 or max_nodes < 1:
+        return make_response({'data': 'max_depth must be >= 0 and max_nodes >= 1'}, 400)
+
+    rows = _thread_rows(id, max_depth, max_nodes)
+    if not rows:
+        return make_response({'data': 'Tweet not found'}, 404)
+    truncated = len(rows) > max_nodes
+    rows = rows[:max_nodes]
+    # replies below max_depth were not loaded, but the counter tells they exist
+    truncated = truncated or any(depth == max_depth and tweet.num_replies for tweet, depth in rows)
+    return make_response({
+        'data': {
+            'thread': _build_tree(rows),
+            'truncated': truncated
+        }
+    }, 200)
@@ -1,22 +1,36 @@
 from datetime import datetime, timedelta
-import json
+import heapq
 import traceback
 
 from flask import Flask, make_response, current_app, request, jsonify, session, url_for
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import IntegrityError
 
 from . import api
-from ..models import db, User, Tweet, Like
-from ..tweet_validation import TweetInput, LikeInput
+from ..like_queue import LikeQueueFull, get_like_queue
+from ..like_state import liked_tweet_ids, set_liked
+from ..models import db, User, Tweet, Like, Retweet
+from ..search import get_search_index
+from ..timeline import fan_out, retract
+from ..tweet_validation import TweetInput, LikeInput, RetweetInput, UnlikeInput, UnretweetInput
+from ..utils.cache import get_feed_cache, invalidate_feed_cache, make_etag
 from ..utils.common import AuthError, generate_response
+from ..utils.idempotency import idempotent
+from ..utils.pagination import (
+    InvalidCursor, approximate_row_count, encode_cursor, keyset_page, merged_keyset_filter
+)
+from ..utils.rate_limit import rate_limit
+from ..utils.replicas import read_only
+from ..utils.request_parsing import load_body
 
 
-def _auth_user_for_tweet(auth_token, tweet_id=None):
+def _auth_user_for_tweet(auth_token, tweet_id=None, claims_only=False):
     '''
-    if tweet_id is None, then we are just returning the user from the auth_token
+    if tweet_id is None, then we are just returning the user from the auth_token.
+    Only read views pass `claims_only`, writes always check the user still exists
     '''
     tweet = None
-    user = User.get_from_bearer_token(auth_token)
+    user = User.get_identity_from_bearer_token(auth_token, claims_only=claims_only)
     if user is None:
         current_app.logger.info('[tweet] user is none')
         raise Exception("No record found with this email. please signup first.")
@@ -28,19 +42,25 @@ def _auth_user_for_tweet(auth_token, tweet_id=None):
     return user, tweet
 
 
-def _validate_tweet(input_data):
-    create_validation_schema = TweetInput()
-    errors = create_validation_schema.validate(input_data)
-    if errors:
-        current_app.logger.info(f'[tweet] validation errors: {errors}')
-        raise Exception(errors)
+# created once, loading a body is not cheap enough to also build a schema per request
+tweet_schema = TweetInput()
+like_schema = LikeInput()
+unlike_schema = UnlikeInput()
+retweet_schema = RetweetInput()
+unretweet_schema = UnretweetInput()
+
 
 def create_tweet(input_data):
-    _validate_tweet(input_data)
     user, void = _auth_user_for_tweet(input_data.get('auth_token'))
     tweet = Tweet(user_id=user.id, body=input_data['body'], parent_id=input_data.get('parent_id'))
     db.session.add(tweet)
+    db.session.flush()
+    get_search_index().add([(tweet.id, tweet.body)])
+    if tweet.parent_id:
+        Tweet.adjust_counter(tweet.parent_id, 'num_replies', 1)
     db.session.commit()
+    invalidate_feed_cache()
+    fan_out(user.id, [(tweet.dateadded, tweet.id)])
 
     current_app.logger.info('[tweet] finished')
 
@@ -49,12 +69,13 @@ def create_tweet(input_data):
     }, 200
 
 def update_tweet(id, input_data):
-    _validate_tweet(input_data)
     user, tweet = _auth_user_for_tweet(input_data.get('auth_token'), id)
 
+    get_search_index().update(tweet.id, tweet.body, input_data.get('body'))
     tweet.body = input_data.get('body')
     db.session.add(tweet)
     db.session.commit()
+    invalidate_feed_cache()
 
     current_app.logger.info('[tweet] update finished')
 
@@ -66,8 +87,15 @@ def update_tweet(id, input_data):
 def delete_tweet(id, input_data):
     user, tweet = _auth_user_for_tweet(input_data.get('auth_token'), id)
 
+    get_search_index().remove([(tweet.id, tweet.body)])
+    # retweets go with the tweet; its own num_retweets counter is deleted along
+    db.session.execute(db.delete(Retweet).where(Retweet.tweet_id == tweet.id))
     db.session.delete(tweet)
+    if tweet.parent_id:
+        Tweet.adjust_counter(tweet.parent_id, 'num_replies', -1)
     db.session.commit()
+    invalidate_feed_cache()
+    retract(user.id, [tweet.id])
 
     current_app.logger.info('[tweet] deleted')
 
@@ -77,38 +105,107 @@ def delete_tweet(id, input_data):
 
 
 def create_like(input_data):
-    create_validation_schema = LikeInput()
-    errors = create_validation_schema.validate(input_data)
-    if errors:
-        current_app.logger.info(f'[tweet] [create_like] validation errors: {errors}')
-        raise Exception(errors)
     user, void = _auth_user_for_tweet(input_data.get('auth_token'))
+    like_queue = get_like_queue()
+    if like_queue is not None:
+        return _enqueue_like(like_queue, user.id, input_data['tweet_id'])
     like = Like(user_id=user.id, tweet_id = input_data['tweet_id'])
     db.session.add(like)
+    Tweet.adjust_counter(like.tweet_id, 'num_likes', 1)
     db.session.commit()
+    invalidate_feed_cache()
+    set_liked(user.id, like.tweet_id, True)
 
     return {
         'like_id': like.id
     }, 201
 
 
+def _enqueue_like(like_queue, user_id, tweet_id):
+    """
+    Write-behind: acknowledges the like once it is known to be new, and leaves
+    the INSERT to the like queue.
+    """
+    if db.session.execute(db.select(Tweet.id).where(Tweet.id == tweet_id)).first() is None:
+        raise Exception("Tweet not found.")
+    already_liked = like_queue.is_pending(user_id, tweet_id) or db.session.execute(
+        db.select(Like.id).where(Like.user_id == user_id, Like.tweet_id == tweet_id)
+    ).first() is not None
+    if already_liked or not like_queue.enqueue(user_id, tweet_id):
+        raise Exception("Tweet already liked.")
+    set_liked(user_id, tweet_id, True)
+    return {
+        'queued': True
+    }, 202
+
+
 def delete_like(input_data):
     user, void = _auth_user_for_tweet(input_data.get('auth_token'))
-    like = Like.query.filter_by(id=input_data.get('like_id')).first()
+    like_queue = get_like_queue()
+    if like_queue is not None:
+        # the like may still be buffered
+        like_queue.flush()
+    if input_data.get('like_id') is None and input_data.get('tweet_id') is not None:
+        # write-behind likes are acknowledged without an id
+        like = Like.query.filter_by(user_id=user.id, tweet_id=input_data['tweet_id']).first()
+    else:
+        like = Like.query.filter_by(id=input_data.get('like_id')).first()
+    if like is None:
+        raise Exception("Like not found.")
     if like.user_id != user.id:
         current_app.logger.info('[like] user is not the owner of this like')
         raise AuthError("Provided token cannot modify this like.")
     db.session.delete(like)
+    if like.tweet_id:
+        Tweet.adjust_counter(like.tweet_id, 'num_likes', -1)
     db.session.commit()
+    invalidate_feed_cache()
+    set_liked(user.id, like.tweet_id, False)
 
     return {
         'like_id': like.id
     }, 200
 
-@api.route('/tweets/', methods=['GET'])
-def get_tweets():
+def create_retweet(input_data):
+    user, void = _auth_user_for_tweet(input_data.get('auth_token'))
+    if db.session.get(Tweet, input_data['tweet_id']) is None:
+        raise Exception("Tweet not found.")
+    retweet = Retweet(user_id=user.id, tweet_id=input_data['tweet_id'])
+    db.session.add(retweet)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        raise Exception("Tweet already retweeted.")
+    Tweet.adjust_counter(retweet.tweet_id, 'num_retweets', 1)
+    db.session.commit()
+    invalidate_feed_cache()
+
+    return {
+        'retweet_id': retweet.id
+    }, 201
+
+
+def delete_retweet(input_data):
+    user, void = _auth_user_for_tweet(input_data.get('auth_token'))
+    retweet = Retweet.query.filter_by(id=input_data.get('retweet_id')).first()
+    if retweet is None:
+        raise Exception("Retweet not found.")
+    if retweet.user_id != user.id:
+        current_app.logger.info('[retweet] user is not the owner of this retweet')
+        raise AuthError("Provided token cannot modify this retweet.")
+    db.session.delete(retweet)
+    Tweet.adjust_counter(retweet.tweet_id, 'num_retweets', -1)
+    db.session.commit()
+    invalidate_feed_cache()
+
+    return {
+        'retweet_id': retweet.id
+    }, 200
+
+def _get_tweets_by_page():
     page = request.args.get('page', 1, type=int)
-    pagination = Tweet.query.order_by(Tweet.dateadded.desc()).paginate(
+    pagination = Tweet.query.order_by(Tweet.dateadded.desc(), Tweet.id.desc()).paginate(
         page=page, per_page=current_app.config['TWEETS_PER_PAGE'],
         error_out=False)
     tweets = pagination.items
@@ -118,32 +215,183 @@ def get_tweets():
     next = None
     if pagination.has_next:
         next = url_for('api.get_tweets', page=page+1)
-    return jsonify({
-        'tweets': [tweet.to_json() for tweet in tweets],
+    return {
+        'tweets': Tweet.bulk_json(tweets),
         'prev': prev,
         'next': next,
         'count': pagination.total
-    })
+    }
+
+
+def _get_tweets_by_cursor():
+    """
+    Keyset pagination on (dateadded, id): no OFFSET scan, and the total is only
+    computed when asked for with `count=exact` (or estimated with `count=approx`).
+    """
+    cursor = request.args.get('cursor')
+    count_mode = request.args.get('count', 'none')
+    per_page = current_app.config['TWEETS_PER_PAGE']
+
+    tweets, next_cursor = keyset_page(Tweet.query, Tweet.dateadded, Tweet.id, cursor, per_page)
+
+    count = None
+    if count_mode == 'exact':
+        count = Tweet.query.count()
+    elif count_mode == 'approx':
+        count = approximate_row_count(db.session, Tweet.__table__)
+
+    next = None
+    if next_cursor:
+        next = url_for('api.get_tweets', cursor=next_cursor, count=request.args.get('count'))
+    return {
+        'tweets': Tweet.bulk_json(tweets),
+        'prev': None,
+        'next': next,
+        'cursor': next_cursor,
+        'count': count
+    }
+
+
+# at equal timestamps, tweets sort before the retweets in the merged feed
+TWEET_RANK = 1
+RETWEET_RANK = 0
+
+
+def _get_feed_with_retweets():
+    """
+    The cursor feed with retweets interleaved: the next page of each of the
+    `tweet` and `retweet` streams is fetched on its (dateadded, id) index, and the
+    two are k-way merged on (dateadded, rank, id). The retweeted tweets are then
+    loaded in one batch.
+    """
+    cursor = request.args.get('cursor')
+    per_page = current_app.config['TWEETS_PER_PAGE']
+
+    streams = []
+    for model, rank in [(Tweet, TWEET_RANK), (Retweet, RETWEET_RANK)]:
+        query = model.query
+        if cursor:
+            query = query.filter(merged_keyset_filter(model.dateadded, model.id, rank, cursor))
+        rows = query.order_by(model.dateadded.desc(), model.id.desc()).limit(per_page + 1)
+        streams.append([((row.dateadded, rank, row.id), row) for row in rows])
+    merged = list(heapq.merge(*streams, key=lambda item: item[0], reverse=True))
+
+    next_cursor = None
+    if len(merged) > per_page:
+        merged = merged[:per_page]
+        (dateadded, rank, id), row = merged[-1]
+        next_cursor = encode_cursor(dateadded, id, rank)
+
+    tweets = {row.id: row for (dateadded, rank, id), row in merged if rank == TWEET_RANK}
+    missing = {
+        row.tweet_id for (dateadded, rank, id), row in merged
+        if rank == RETWEET_RANK and row.tweet_id not in tweets
+    }
+    if missing:
+        tweets.update((tweet.id, tweet) for tweet in Tweet.query.filter(Tweet.id.in_(missing)))
+    tweet_json = {item['id']: item for item in Tweet.bulk_json(tweets.values())}
+
+    items = []
+    for (dateadded, rank, id), row in merged:
+        if rank == TWEET_RANK:
+            items.append({'type': 'tweet', **tweet_json[row.id]})
+        else:
+            items.append(row.to_json(tweet_json.get(row.tweet_id)))
+
+    next = None
+    if next_cursor:
+        next = url_for('api.get_tweets', cursor=next_cursor, include_retweets=1)
+    return {
+        'tweets': items,
+        'prev': None,
+        'next': next,
+        'cursor': next_cursor,
+        'count': None
+    }
+
+
+def _annotate_liked_by_me(user_id, items):
+    """
+    Sets `liked_by_me` on the tweets of a page, and on the tweets its retweets
+    point to, with a single lookup for all of them.
+    """
+    tweets = []
+    for item in items:
+        if item.get('type') == 'retweet':
+            if item['tweet'] is not None:
+                tweets.append(item['tweet'])
+        else:
+            tweets.append(item)
+    liked = liked_tweet_ids(user_id, list({tweet['id'] for tweet in tweets}))
+    for tweet in tweets:
+        tweet['liked_by_me'] = tweet['id'] in liked
+
+
+@api.route('/tweets/', methods=['GET'])
+@read_only
+def get_tweets():
+    """
+    Pages through tweets newest first. Passing `cursor` (empty for the first page)
+    switches from `page=` offset pagination to keyset pagination, in which
+    `include_retweets=1` interleaves retweets with the tweets.
+
+    Rendered pages are served from the feed cache while no write invalidated them,
+    and carry an ETag so that clients can revalidate with If-None-Match.
+
+    With an Authorization header every tweet also carries `liked_by_me` for the
+    caller. Those pages are per viewer and bypass the feed cache.
+    """
+    viewer = None
+    auth_token = request.headers.get('Authorization')
+    if auth_token:
+        try:
+            viewer, void = _auth_user_for_tweet(auth_token, claims_only=True)
+        except Exception as e:
+            current_app.logger.info(f'[tweets] viewer error: {e}')
+            return make_response({'data': f'{e}'}, 401)
+
+    feed_cache = get_feed_cache() if viewer is None else None
+    cached = feed_cache.get(request.full_path) if feed_cache else None
+    if cached is not None:
+        body, etag = cached
+        response = current_app.response_class(body, mimetype='application/json')
+    else:
+        try:
+            if 'cursor' in request.args and request.args.get('include_retweets', type=int):
+                data = _get_feed_with_retweets()
+            elif 'cursor' in request.args:
+                data = _get_tweets_by_cursor()
+            else:
+                data = _get_tweets_by_page()
+        except InvalidCursor as e:
+            return make_response({'data': f'{e}'}, 400)
+        if viewer is not None:
+            _annotate_liked_by_me(viewer.id, data['tweets'])
+        response = jsonify(data)
+        body = response.get_data()
+        if feed_cache is not None:
+            body, etag = feed_cache.set(request.full_path, body)
+        else:
+            etag = make_etag(body)
+    response.vary.add('Authorization')
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 @api.route('/tweet/', methods=['POST'], defaults={'id': None})
 @api.route('/tweet/<id>/', methods=['PUT', 'DELETE'])
+@idempotent
+@rate_limit('tweet')
 def route_tweet(id):
     return_data = {}
     auth_token = request.headers.get('Authorization')
-    if len(request.data):
-        input_data = json.loads(request.data)
-    else:
-        input_data = {}
-
-    input_data['auth_token'] = auth_token
 
     try:
         if request.method == 'POST':
-            return_data, status = create_tweet(input_data)
+            return_data, status = create_tweet(load_body(tweet_schema, auth_token=auth_token))
         elif request.method == 'PUT':
-            return_data, status = update_tweet(id, input_data)
+            return_data, status = update_tweet(id, load_body(tweet_schema, auth_token=auth_token))
         elif request.method == 'DELETE':
-            return_data, status = delete_tweet(id, input_data)
+            return_data, status = delete_tweet(id, {'auth_token': auth_token})
     except Exception as e:
         status = 400
         return_data = f'{e}'
@@ -153,21 +401,20 @@ def route_tweet(id):
     return make_response({'data': return_data}, status)
 
 @api.route('/tweet/like/', methods=['POST', 'DELETE'])
+@idempotent
+@rate_limit('like')
 def route_like():
     return_data = {}
     auth_token = request.headers.get('Authorization')
-    if len(request.data):
-        input_data = json.loads(request.data)
-    else:
-        input_data = {}
-
-    input_data['auth_token'] = auth_token
 
     try:
         if request.method == 'POST':
-            return_data, status = create_like(input_data)
+            return_data, status = create_like(load_body(like_schema, auth_token=auth_token))
         elif request.method == 'DELETE':
-            return_data, status = delete_like(input_data)
+            return_data, status = delete_like(load_body(unlike_schema, auth_token=auth_token))
+    except LikeQueueFull as e:
+        return_data, status = f'{e}', 503
+        current_app.logger.info(f'[tweet/like] {request.method} error: {e}')
     except Exception as e:
         status = 400
         return_data = f'{e}'
@@ -177,4 +424,23 @@ def route_like():
         if current_app.config['DEBUG']:
             traceback.print_exc()
 
-    return make_response({'data': return_data}, status)
\ No newline at end of file
+    return make_response({'data': return_data}, status)
+
+@api.route('/tweet/retweet/', methods=['POST', 'DELETE'])
+def route_retweet():
+    return_data = {}
+    auth_token = request.headers.get('Authorization')
+
+    try:
+        if request.method == 'POST':
+            return_data, status = create_retweet(load_body(retweet_schema, auth_token=auth_token))
+        elif request.method == 'DELETE':
+            return_data, status = delete_retweet(load_body(unretweet_schema, auth_token=auth_token))
+    except Exception as e:
+        status = 400
+        return_data = f'{e}'
+        if e.__class__ == AuthError:
+            status = 401
+        current_app.logger.info(f'[tweet/retweet] {request.method} error: {e}')
+
+    return make_response({'data': return_data}, status)
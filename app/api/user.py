@@ -0,0 +1,131 @@
+from flask import current_app, jsonify, make_response, request, url_for
+from sqlalchemy.exc import IntegrityError
+
+from . import api
+from ..models import db, Follow, User, Tweet
+from ..timeline import followers_changed, get_timeline_store, home_timeline_entries
+from ..utils.common import AuthError
+from ..utils.pagination import InvalidCursor, encode_cursor, keyset_page
+from ..utils.replicas import read_only
+
+
+def _auth_user(auth_token, claims_only=False):
+    if not auth_token:
+        raise AuthError("Missing bearer token.")
+    # only read views pass claims_only, writes always check the user still exists
+    user = User.get_identity_from_bearer_token(auth_token, claims_only=claims_only)
+    if user is None:
+        current_app.logger.info('[user] user is none')
+        raise AuthError("No record found with this email. please signup first.")
+    return user
+
+
+def user_timeline_query(user_id):
+    return Tweet.query.filter(Tweet.user_id == user_id)
+
+
+@api.route('/users/<int:id>/tweets/', methods=['GET'])
+@read_only
+def get_user_tweets(id):
+    """
+    Pages through one user's tweets newest first, by `cursor` (see /tweets/).
+    """
+    if db.session.get(User, id) is None:
+        return make_response({'data': 'User not found'}, 404)
+    try:
+        tweets, next_cursor = keyset_page(
+            user_timeline_query(id), Tweet.dateadded, Tweet.id,
+            request.args.get('cursor'), current_app.config['TWEETS_PER_PAGE']
+        )
+    except InvalidCursor as e:
+        return make_response({'data': f'{e}'}, 400)
+    next = None
+    if next_cursor:
+        next = url_for('api.get_user_tweets', id=id, cursor=next_cursor)
+    return jsonify({
+        'tweets': Tweet.bulk_json(tweets),
+        'next': next,
+        'cursor': next_cursor
+    })
+
+
+def follow_user(follower, followee_id):
+    if follower.id == followee_id:
+        raise Exception("Users cannot follow themselves.")
+    if db.session.get(User, followee_id) is None:
+        raise Exception("User not found.")
+    follow = Follow(follower_id=follower.id, followee_id=followee_id)
+    db.session.add(follow)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        raise Exception("Already following this user.")
+    User.adjust_counter(followee_id, 'num_followers', 1)
+    db.session.commit()
+    # rebuilt with the new followee's tweets on the next read
+    get_timeline_store().invalidate(follower.id)
+    followers_changed(followee_id, 1)
+    return {
+        'follow_id': follow.id
+    }, 201
+
+
+def unfollow_user(follower, followee_id):
+    follow = Follow.query.filter_by(follower_id=follower.id, followee_id=followee_id).first()
+    if follow is None:
+        raise Exception("Not following this user.")
+    db.session.delete(follow)
+    User.adjust_counter(followee_id, 'num_followers', -1)
+    db.session.commit()
+    get_timeline_store().invalidate(follower.id)
+    followers_changed(followee_id, -1)
+    return {
+        'follow_id': follow.id
+    }, 200
+
+
+@api.route('/users/<int:id>/follow/', methods=['POST', 'DELETE'])
+def route_follow(id):
+    try:
+        follower = _auth_user(request.headers.get('Authorization'))
+        if request.method == 'POST':
+            return_data, status = follow_user(follower, id)
+        elif request.method == 'DELETE':
+            return_data, status = unfollow_user(follower, id)
+    except Exception as e:
+        status = 400
+        return_data = f'{e}'
+        if e.__class__ == AuthError:
+            status = 401
+        current_app.logger.info(f'[users/follow] {request.method} error: {e}')
+    return make_response({'data': return_data}, status)
+
+
+@api.route('/timeline/home/', methods=['GET'])
+@read_only
+def get_home_timeline():
+    """
+    Pages through the newest tweets of the caller and the users they follow, by
+    `cursor` (see /tweets/).
+    """
+    try:
+        user = _auth_user(request.headers.get('Authorization'), claims_only=True)
+        entries, has_more = home_timeline_entries(
+            user.id, request.args.get('cursor'), current_app.config['TWEETS_PER_PAGE']
+        )
+    except InvalidCursor as e:
+        return make_response({'data': f'{e}'}, 400)
+    except AuthError as e:
+        return make_response({'data': f'{e}'}, 401)
+
+    ids = [id for dateadded, id in entries]
+    tweets = {tweet.id: tweet for tweet in Tweet.query.filter(Tweet.id.in_(ids))}
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(*entries[-1])
+    return jsonify({
+        'tweets': Tweet.bulk_json(tweets[id] for id in ids if id in tweets),
+        'next': next_cursor and url_for('api.get_home_timeline', cursor=next_cursor),
+        'cursor': next_cursor
+    })
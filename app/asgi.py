@@ -0,0 +1,228 @@
+"""
+ASGI serving mode.
+
+    uvicorn --factory app.asgi:create_asgi_app
+
+needs the optional packages asgiref and an asyncio database driver (aiosqlite,
+or asyncpg on Postgres). Cursor pages of /tweets/ and user timelines are
+served by coroutines on an SQLAlchemy AsyncEngine, so a request waiting on the
+database holds no thread. Every other request, including the feed variants
+the coroutines do not cover, goes to the Flask app through asgiref's
+WsgiToAsgi, which runs it on a thread pool as before.
+
+The coroutines share the feed cache and the request metrics with the Flask
+views, and build the same responses, but always read from the primary.
+"""
+import asyncio
+import os
+import re
+import time
+from urllib.parse import parse_qs
+
+from sqlalchemy import event, func, select
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from werkzeug.http import parse_etags, quote_etag
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+except ImportError as e:  # pragma: no cover - optional dependencies
+    raise ImportError('the ASGI mode needs asgiref and an asyncio database driver, '
+                      'e.g. pip install asgiref aiosqlite') from e
+
+from . import create_app
+from .like_queue import shutdown_like_queue
+from .models import db, Tweet, User
+from .utils.cache import make_etag
+from .utils.engine import sqlite_pragmas_listener
+from .utils.pagination import InvalidCursor, keyset_select, split_page
+
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def async_database_url(app):
+    """
+    ASYNC_DATABASE_URI, or the app's database url with the asyncio driver of its
+    backend.
+    """
+    if app.config.get('ASYNC_DATABASE_URI'):
+        return app.config['ASYNC_DATABASE_URI']
+    with app.app_context():
+        url = db.engine.url
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        raise ValueError('the ASGI mode cannot share an in-memory SQLite database')
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+class AsyncRequest:
+    """
+    The parts of an ASGI http scope the coroutines use, named like Flask's.
+    """
+
+    def __init__(self, scope):
+        self.path = scope['path']
+        self.query_string = scope['query_string'].decode('latin1')
+        self.args = {name: values[0] for name, values in
+                     parse_qs(self.query_string, keep_blank_values=True).items()}
+        self.headers = {name.decode('latin1').lower(): value.decode('latin1') for name, value in scope['headers']}
+
+    @property
+    def full_path(self):
+        return f'{self.path}?{self.query_string}'
+
+
+class AsyncAPI:
+    def __init__(self, app):
+        self.app = app
+        self.wsgi = WsgiToAsgi(app)
+        config = app.config
+        self.engine = create_async_engine(
+            async_database_url(app),
+            # aiosqlite defaults to opening a connection per checkout
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=config['ASYNC_DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+            pool_recycle=config['DB_POOL_RECYCLE'],
+            pool_pre_ping=config['DB_POOL_PRE_PING'],
+        )
+        if config['SQLITE_PRAGMAS'] and self.engine.dialect.name == 'sqlite':
+            event.listen(self.engine.sync_engine, 'connect', sqlite_pragmas_listener(config['SQLITE_PRAGMAS']))
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)
+        # builds the same links as url_for in the Flask views
+        self.urls = app.url_map.bind('')
+        self.routes = [
+            (re.compile(r'/api/v1/tweets/'), 'api.get_tweets', self.get_tweets),
+            (re.compile(r'/api/v1/users/(\d+)/tweets/'), 'api.get_user_tweets', self.get_user_tweets),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, endpoint, handler in self.routes:
+                match = pattern.fullmatch(scope['path'])
+                if match is None:
+                    continue
+                started = time.perf_counter()
+                response = await handler(AsyncRequest(scope), *match.groups())
+                if response is not None:
+                    await self._send(send, endpoint, started, *response)
+                    return
+                break
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # writes the buffered likes, on a thread since it blocks on the database
+                await asyncio.to_thread(shutdown_like_queue, self.app)
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _send(self, send, endpoint, started, status, body, headers=()):
+        metrics = self.app.extensions.get('metrics')
+        if metrics is not None:
+            metrics.request_duration.observe(time.perf_counter() - started, endpoint)
+            metrics.response_size.observe(len(body), endpoint)
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', self.app.json.mimetype.encode()),
+                (b'content-length', str(len(body)).encode()),
+                *((name.encode(), value.encode()) for name, value in headers)
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    def _json(self, obj):
+        return self.app.json.response(obj).get_data()
+
+    async def _tweets_json(self, session, tweets):
+        child_rows = []
+        if tweets:
+            child_rows = (await session.execute(Tweet.children_select([tweet.id for tweet in tweets]))).all()
+        return Tweet.bulk_json(tweets, child_rows)
+
+    async def get_tweets(self, request):
+        """
+        /tweets/ in cursor mode, see `app.api.tweet.get_tweets`. Returns None for
+        the variants left to the Flask view, which include every request with a
+        viewer.
+        """
+        if 'authorization' in request.headers:
+            return None
+        feed_cache = self.app.extensions.get('feed_cache')
+        cached = feed_cache.get(request.full_path) if feed_cache else None
+        if cached is not None:
+            body, etag = cached
+        else:
+            count_mode = request.args.get('count', 'none')
+            if ('cursor' not in request.args or request.args.get('include_retweets', '0') not in ('', '0')
+                    or count_mode == 'approx'):
+                return None
+            cursor = request.args['cursor']
+            per_page = self.app.config['TWEETS_PER_PAGE']
+            try:
+                statement = keyset_select(select(Tweet), Tweet.dateadded, Tweet.id, cursor, per_page)
+            except InvalidCursor as e:
+                return 400, self._json({'data': f'{e}'})
+            async with self.session() as session:
+                tweets, next_cursor = split_page((await session.scalars(statement)).all(), per_page)
+                count = None
+                if count_mode == 'exact':
+                    count = await session.scalar(select(func.count()).select_from(Tweet))
+                tweets_json = await self._tweets_json(session, tweets)
+            next = None
+            if next_cursor:
+                next = self.urls.build('api.get_tweets', {'cursor': next_cursor, 'count': request.args.get('count')})
+            body = self._json({
+                'tweets': tweets_json,
+                'prev': None,
+                'next': next,
+                'cursor': next_cursor,
+                'count': count
+            })
+            if feed_cache is not None:
+                body, etag = feed_cache.set(request.full_path, body)
+            else:
+                etag = make_etag(body)
+        headers = [('ETag', quote_etag(etag)), ('Vary', 'Authorization')]
+        if parse_etags(request.headers.get('if-none-match')).contains(etag):
+            return 304, b'', headers
+        return 200, body, headers
+
+    async def get_user_tweets(self, request, id):
+        """
+        See `app.api.user.get_user_tweets`.
+        """
+        id = int(id)
+        per_page = self.app.config['TWEETS_PER_PAGE']
+        async with self.session() as session:
+            if await session.get(User, id) is None:
+                return 404, self._json({'data': 'User not found'})
+            try:
+                statement = keyset_select(select(Tweet).where(Tweet.user_id == id), Tweet.dateadded, Tweet.id,
+                                          request.args.get('cursor'), per_page)
+            except InvalidCursor as e:
+                return 400, self._json({'data': f'{e}'})
+            tweets, next_cursor = split_page((await session.scalars(statement)).all(), per_page)
+            tweets_json = await self._tweets_json(session, tweets)
+        next = None
+        if next_cursor:
+            next = self.urls.build('api.get_user_tweets', {'id': id, 'cursor': next_cursor})
+        return 200, self._json({
+            'tweets': tweets_json,
+            'next': next,
+            'cursor': next_cursor
+        })
+
+
+def create_asgi_app(config_name=None):
+    return AsyncAPI(create_app(config_name or os.environ.get('FLASK_CONFIG') or 'default'))
@@ -0,0 +1,37 @@
+import click
+
+from .migrations import register_migration_commands
+from .models import Tweet
+from .search import get_search_index
+from .tweet_export import iter_tweets_ndjson
+
+
+def register_commands(app):
+    register_migration_commands(app)
+
+    @app.cli.command('reconcile-counters')
+    @click.option('--batch-size', default=10000, show_default=True,
+                  help='Number of tweets recomputed per transaction.')
+    def reconcile_counters(batch_size):
+        """Recompute the denormalized like/reply/retweet counters on tweets."""
+        fixed = Tweet.reconcile_counters(batch_size=batch_size)
+        click.echo(f'Reconciled counters on {fixed} tweets.')
+
+    @app.cli.command('export-tweets')
+    @click.option('--user-id', type=int, help='Only export the tweets of this user.')
+    @click.option('--since', type=click.DateTime(), help='Only export tweets added at or after this time.')
+    @click.option('--until', type=click.DateTime(), help='Only export tweets added before this time.')
+    @click.option('--output', type=click.File('w'), default='-', help='File to write to, stdout by default.')
+    def export_tweets(user_id, since, until, output):
+        """Write tweets to a file as NDJSON, one tweet per line."""
+        for chunk in iter_tweets_ndjson(user_id=user_id, since=since, until=until):
+            output.write(chunk)
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index():
+        """Rebuild the full-text search index of tweet bodies."""
+        search_index = get_search_index()
+        if not search_index.enabled:
+            raise click.ClickException('Search is not available on this database.')
+        search_index.rebuild()
+        click.echo('Rebuilt the tweet search index.')
@@ -0,0 +1,219 @@
+"""
+Write-behind for likes.
+
+With LIKE_WRITE_BEHIND enabled, create_like only checks that the tweet exists
+and that the like is neither pending nor stored, then buffers it in memory and
+answers right away. At most LIKE_QUEUE_MAX_PENDING likes are buffered; past
+that create_like answers 503 until the worker catches up. A background thread
+flushes the buffer every LIKE_FLUSH_INTERVAL seconds, or as soon as
+LIKE_FLUSH_SIZE likes are pending. Each flush is one batched
+`INSERT ... ON CONFLICT DO NOTHING`, so a like that raced in through another
+process is skipped instead of failing the batch, and likes of tweets deleted
+since they were acknowledged are left out. The like counters of the affected
+tweets are then recomputed from the `like` table in the same transaction. If
+the batch still fails, its likes are written one per transaction so that only
+the offending ones are lost.
+
+`shutdown()` stops the worker and flushes what is left. The ASGI app calls it
+on lifespan shutdown, and queues not shut down by then are at interpreter
+exit. Neither that exit hook nor the worker thread keeps a queue, and its app,
+alive: an app that is discarded without shutdown loses its pending likes.
+"""
+import atexit
+from threading import Condition, Lock, Thread
+import weakref
+
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .models import db, Like, Tweet
+from .utils.cache import invalidate_feed_cache
+from .utils.metrics import gauge
+
+
+def insert_ignoring_conflicts(model):
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    return insert(model).on_conflict_do_nothing()
+
+
+class LikeQueueFull(Exception):
+    pass
+
+
+class LikeWriteBehind:
+    def __init__(self, app, flush_interval, flush_size, max_pending=10000):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_pending = max_pending
+        # insertion-ordered set of (user_id, tweet_id)
+        self._pending = {}
+        self._condition = Condition()
+        # held for a whole flush, so that flush() waits for one in progress
+        self._flush_lock = Lock()
+        self._stopping = False
+        self._thread = None
+
+    def is_pending(self, user_id, tweet_id):
+        return (user_id, tweet_id) in self._pending
+
+    def enqueue(self, user_id, tweet_id):
+        """
+        Buffers a like. Returns False if the same like is already pending, and
+        raises LikeQueueFull if `max_pending` likes are.
+        """
+        with self._condition:
+            if self._stopping:
+                raise RuntimeError('The like queue is shut down.')
+            if (user_id, tweet_id) in self._pending:
+                return False
+            if len(self._pending) >= self.max_pending:
+                self._condition.notify()
+                raise LikeQueueFull('Too many likes are waiting to be written, try again shortly.')
+            self._pending[(user_id, tweet_id)] = None
+            if self._thread is None:
+                self._thread = Thread(target=_work, args=(weakref.ref(self),),
+                                      name='like-write-behind', daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.flush_size:
+                self._condition.notify()
+            return True
+
+    def flush(self):
+        """
+        Writes every pending like, after waiting for a flush in progress to
+        finish. Returns the number of likes flushed, not counting those of
+        deleted tweets or that failed to insert.
+        """
+        with self._flush_lock:
+            with self._condition:
+                batch, self._pending = list(self._pending), {}
+            if not batch:
+                return 0
+            return self._flush(batch)
+
+    def _flush(self, batch):
+        with self.app.app_context():
+            try:
+                written = self._write(batch)
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception(
+                    f'[like queue] batch of {len(batch)} likes failed, writing them one by one')
+                written = 0
+                for like in batch:
+                    try:
+                        written += self._write([like])
+                    except Exception:
+                        db.session.rollback()
+                        current_app.logger.exception(f'[like queue] dropped the like {like}')
+            if written:
+                invalidate_feed_cache()
+        return written
+
+    def _write(self, batch):
+        """
+        Inserts the likes of `batch` whose tweet still exists, recomputes the
+        counters of those tweets and commits. Returns the number of likes kept.
+        """
+        tweet_ids = set(db.session.execute(
+            db.select(Tweet.id).where(Tweet.id.in_({tweet_id for user_id, tweet_id in batch}))
+        ).scalars())
+        rows = [{'user_id': user_id, 'tweet_id': tweet_id} for user_id, tweet_id in batch if tweet_id in tweet_ids]
+        if len(rows) < len(batch):
+            current_app.logger.info(f'[like queue] skipped {len(batch) - len(rows)} likes of deleted tweets')
+        if not rows:
+            return 0
+        db.session.execute(insert_ignoring_conflicts(Like), rows)
+        db.session.execute(
+            db.update(Tweet)
+            .where(Tweet.id.in_(tweet_ids))
+            .values(num_likes=db.select(db.func.count(Like.id))
+                    .where(Like.tweet_id == Tweet.id).scalar_subquery())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return len(rows)
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def shutdown(self):
+        """
+        Stops the worker after a last flush. Safe to call more than once.
+        """
+        _like_queues.discard(self)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+
+def _work(ref):
+    """
+    The worker thread of the LikeWriteBehind `ref` refers to. It only holds the
+    queue while it checks or flushes it, and exits once the queue is gone.
+    """
+    while True:
+        like_queue = ref()
+        if like_queue is None:
+            return
+        condition = like_queue._condition
+        with condition:
+            if not like_queue._stopping and len(like_queue._pending) < like_queue.flush_size:
+                interval = like_queue.flush_interval
+                del like_queue
+                condition.wait(interval)
+                like_queue = ref()
+                if like_queue is None:
+                    return
+            stopping = like_queue._stopping
+        like_queue.flush()
+        if stopping:
+            return
+        del like_queue
+
+
+# queues to shut down at exit, unless they were shut down or collected before
+_like_queues = weakref.WeakSet()
+
+
+@atexit.register
+def _shutdown_like_queues():
+    for like_queue in list(_like_queues):
+        like_queue.shutdown()
+
+
+def shutdown_like_queue(app):
+    """
+    Shuts down the LikeWriteBehind of `app`, if it has one.
+    """
+    like_queue = app.extensions.get('like_queue')
+    if like_queue is not None:
+        like_queue.shutdown()
+
+
+def get_like_queue():
+    """
+    The current app's LikeWriteBehind, or None unless LIKE_WRITE_BEHIND is set.
+    """
+    return current_app.extensions.get('like_queue')
+
+
+def init_like_queue(app):
+    if not app.config.get('LIKE_WRITE_BEHIND'):
+        return
+    like_queue = app.extensions['like_queue'] = LikeWriteBehind(
+        app,
+        flush_interval=app.config['LIKE_FLUSH_INTERVAL'],
+        flush_size=app.config['LIKE_FLUSH_SIZE'],
+        max_pending=app.config['LIKE_QUEUE_MAX_PENDING']
+    )
+    _like_queues.add(like_queue)
+    app.extensions['metrics'].register_collector(
+        lambda: gauge('like_queue_pending', 'Likes buffered for write-behind.', like_queue.pending_count())
+    )
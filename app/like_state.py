@@ -0,0 +1,148 @@
+"""
+Which tweets of a page the viewer has liked.
+
+`liked_tweet_ids` answers with one `user_id = ? AND tweet_id IN (...)` query,
+a range of the uix_like__user_id__tweet_id index, for all the tweets of a
+page. The answers are kept per user in a LikeStateCache, so that loading the
+same page again needs no query at all. Creating and deleting likes update the
+cached answers of that user; entries expire after LIKE_STATE_CACHE_TTL
+seconds, which bounds how stale they get when the like went through another
+process.
+"""
+from collections import OrderedDict
+from threading import Lock
+import time
+
+from flask import current_app
+
+from .models import db, Like
+from .utils.metrics import counter, gauge
+
+
+class LikeStateCache:
+    """
+    An LRU of at most `maxusers` users, each with the ids of tweets looked up
+    for them (at most `maxids`, the entry starts over beyond that) and the
+    subset they liked.
+    """
+
+    def __init__(self, maxusers=10000, maxids=2000, ttl=60, clock=time.monotonic):
+        self.maxusers = maxusers
+        self.maxids = maxids
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def _entry(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] <= self.clock():
+            del self._entries[user_id]
+            return None
+        return entry
+
+    def lookup(self, user_id, tweet_ids):
+        """
+        Returns the cached liked subset of `tweet_ids` and the ids the cache
+        knows nothing about.
+        """
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry is None:
+                self.misses += 1
+                return set(), list(tweet_ids)
+            expires, resolved, liked = entry
+            self._entries.move_to_end(user_id)
+            missing = [id for id in tweet_ids if id not in resolved]
+            if missing:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return {id for id in tweet_ids if id in liked}, missing
+
+    def add(self, user_id, resolved_ids, liked_ids):
+        """
+        Records the answer to a query for `resolved_ids`.
+        """
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry is None or len(entry[1]) + len(resolved_ids) > self.maxids:
+                entry = self._entries[user_id] = (self.clock() + self.ttl, set(), set())
+            entry[1].update(resolved_ids)
+            entry[2].update(liked_ids)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxusers:
+                self._entries.popitem(last=False)
+
+    def set_liked(self, user_id, tweet_id, liked):
+        """
+        Updates a user's cached answer after they liked or unliked a tweet.
+        """
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry is None:
+                return
+            entry[1].add(tweet_id)
+            if liked:
+                entry[2].add(tweet_id)
+            else:
+                entry[2].discard(tweet_id)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+def get_like_state_cache():
+    """
+    The current app's LikeStateCache, or None if LIKE_STATE_CACHE_USERS disables it.
+    """
+    return current_app.extensions.get('like_state_cache')
+
+
+def liked_tweet_ids(user_id, tweet_ids):
+    """
+    The subset of `tweet_ids` that `user_id` has liked, including likes still
+    buffered by the like queue.
+    """
+    cache = get_like_state_cache()
+    liked, missing = cache.lookup(user_id, tweet_ids) if cache is not None else (set(), list(tweet_ids))
+    if not missing:
+        return liked
+    found = set(db.session.execute(
+        db.select(Like.tweet_id).where(Like.user_id == user_id, Like.tweet_id.in_(missing))
+    ).scalars())
+    like_queue = current_app.extensions.get('like_queue')
+    if like_queue is not None:
+        found.update(id for id in missing if like_queue.is_pending(user_id, id))
+    if cache is not None:
+        cache.add(user_id, missing, found)
+    return liked | found
+
+
+def set_liked(user_id, tweet_id, liked):
+    """
+    Keeps the cache in step with a committed (or queued) like or unlike.
+    """
+    cache = get_like_state_cache()
+    if cache is not None:
+        cache.set_liked(user_id, tweet_id, liked)
+
+
+def init_like_state_cache(app):
+    if not app.config.get('LIKE_STATE_CACHE_USERS'):
+        return
+    cache = app.extensions['like_state_cache'] = LikeStateCache(
+        maxusers=app.config['LIKE_STATE_CACHE_USERS'],
+        maxids=app.config['LIKE_STATE_CACHE_IDS'],
+        ttl=app.config['LIKE_STATE_CACHE_TTL']
+    )
+    app.extensions['metrics'].register_collector(lambda: _like_state_metrics(cache.stats()))
+
+
+def _like_state_metrics(stats):
+    return (counter('like_state_cache_hits_total', 'Pages whose like state was served from the cache.', stats['hits'])
+            + counter('like_state_cache_misses_total', 'Pages whose like state needed a query.', stats['misses'])
+            + gauge('like_state_cache_size', 'Users with cached like state.', stats['size']))
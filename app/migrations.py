@@ -0,0 +1,244 @@
+"""
+Schema migrations.
+
+    flask db upgrade [--batch-size N]
+    flask db status
+
+`MIGRATIONS` brings a database created with the original schema (user, tweet,
+like and retweet, as the first release created them) up to the current
+models, one step at a time. Applied steps are recorded in `schema_migrations`.
+An empty database is created from the models in one go and every step is
+recorded as applied.
+
+Every step is idempotent, so a step that was interrupted can be run again,
+and a database made by `db.create_all()` before migrations existed is
+upgraded as well:
+
+- columns and tables are only added when missing,
+- indexes are built with IF NOT EXISTS, and CONCURRENTLY on Postgres, where
+  it does not lock out writes; an invalid index left by an interrupted
+  concurrent build is dropped and built again,
+- backfills update one id range of `batch_size` rows per transaction, so that
+  large tables like `tweet` and `like` are never locked as a whole.
+"""
+from datetime import datetime
+
+import click
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+
+from .models import db, Follow
+from .search import FTS_TABLE, TSVECTOR, TSVECTOR_INDEX
+
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', String(64), primary_key=True),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+class Migrator:
+    """
+    What migration steps run against: the primary engine, and the operations
+    above made idempotent and non-blocking.
+    """
+
+    def __init__(self, engine, batch_size=10000, echo=lambda message: None):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.echo = echo
+        self.dialect = engine.dialect.name
+
+    def quote(self, name):
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def execute(self, sql, params=None):
+        with self.engine.begin() as connection:
+            return connection.execute(text(sql), params or {})
+
+    def has_table(self, table):
+        return inspect(self.engine).has_table(table)
+
+    def has_column(self, table, column):
+        return column in {c['name'] for c in inspect(self.engine).get_columns(table)}
+
+    def has_index(self, table, name):
+        """
+        Whether `table` has an index or unique constraint named `name`.
+        """
+        inspector = inspect(self.engine)
+        return name in {index['name'] for index in inspector.get_indexes(table)} | {
+            constraint['name'] for constraint in inspector.get_unique_constraints(table)}
+
+    def type_ddl(self, type_):
+        return type_.compile(dialect=self.engine.dialect)
+
+    def add_column(self, table, column, ddl):
+        """
+        Adds `column` with the type and constraints in `ddl`. NOT NULL columns
+        need a DEFAULT, which both SQLite and Postgres (11+) add without
+        rewriting the table.
+        """
+        if not self.has_column(table, column):
+            self.echo(f'  adding {table}.{column}')
+            self.execute(f'ALTER TABLE {self.quote(table)} ADD COLUMN {column} {ddl}')
+
+    def create_index(self, name, table, columns, unique=False, using=None):
+        """
+        Creates index `name` on `columns` (SQL, e.g. 'user_id, dateadded DESC'),
+        of the access method `using` if given.
+        """
+        if self.dialect != 'postgresql' and self.has_index(table, name):
+            return
+        unique = 'UNIQUE ' if unique else ''
+        using = f'USING {using} ' if using else ''
+        statement = f'CREATE {unique}INDEX {{}}IF NOT EXISTS {name} ON {self.quote(table)} {using}({columns})'
+        if self.dialect != 'postgresql':
+            self.echo(f'  building index {name}')
+            self.execute(statement.format(''))
+            return
+        # CONCURRENTLY cannot run in a transaction
+        with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            invalid = connection.execute(text(
+                'SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid '
+                'WHERE pg_class.relname = :name AND NOT pg_index.indisvalid'
+            ), {'name': name}).first()
+            if invalid:
+                connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+            self.echo(f'  building index {name} concurrently')
+            connection.execute(text(statement.format('CONCURRENTLY ')))
+
+    def backfill(self, table, sql):
+        """
+        Runs `sql`, an UPDATE (or INSERT ... SELECT) limited to the rows of
+        `table` with :low <= id <= :high, over the whole table one batch per
+        transaction. Returns the number of rows it changed.
+        """
+        max_id = self.execute(f'SELECT max(id) FROM {self.quote(table)}').scalar() or 0
+        changed = 0
+        for low in range(0, max_id + 1, self.batch_size):
+            result = self.execute(sql, {'low': low, 'high': low + self.batch_size - 1})
+            changed += max(result.rowcount, 0)
+        self.echo(f'  backfilled {changed} rows of {table}')
+        return changed
+
+
+def tweet_counters(m):
+    for column in ['num_likes', 'num_replies', 'num_retweets']:
+        m.add_column('tweet', column, "INTEGER DEFAULT '0' NOT NULL")
+    m.backfill('tweet', f'''
+        UPDATE tweet SET
+            num_likes = (SELECT count(*) FROM {m.quote('like')} WHERE {m.quote('like')}.tweet_id = tweet.id),
+            num_replies = (SELECT count(*) FROM tweet AS child WHERE child.parent_id = tweet.id),
+            num_retweets = (SELECT count(*) FROM retweet WHERE retweet.tweet_id = tweet.id)
+        WHERE tweet.id BETWEEN :low AND :high
+    ''')
+
+
+def feed_indexes(m):
+    m.create_index('ix_tweet__dateadded__id', 'tweet', 'dateadded, id')
+    m.create_index('ix_tweet__user_id__dateadded', 'tweet', 'user_id, dateadded DESC, id DESC')
+
+
+def retweet_feed(m):
+    m.add_column('retweet', 'dateadded', m.type_ddl(DateTime()))
+    # the original retweets were not dated; the retweeted tweet's date is the
+    # nearest stand-in and keeps them at their place in the merged feed
+    m.backfill('retweet', '''
+        UPDATE retweet SET dateadded = (SELECT tweet.dateadded FROM tweet WHERE tweet.id = retweet.tweet_id)
+        WHERE retweet.dateadded IS NULL AND retweet.id BETWEEN :low AND :high
+    ''')
+    m.create_index('ix_retweet__dateadded__id', 'retweet', 'dateadded, id')
+    # retweeting twice was possible before the unique constraint; keep the first
+    m.backfill('retweet', '''
+        DELETE FROM retweet WHERE retweet.id BETWEEN :low AND :high AND retweet.id > (
+            SELECT min(kept.id) FROM retweet AS kept
+            WHERE kept.user_id = retweet.user_id AND kept.tweet_id = retweet.tweet_id
+        )
+    ''')
+    m.create_index('uix_retweet__user_id__tweet_id', 'retweet', 'user_id, tweet_id', unique=True)
+
+
+def follows(m):
+    m.add_column('user', 'num_followers', "INTEGER DEFAULT '0' NOT NULL")
+    with m.engine.begin() as connection:
+        Follow.__table__.create(connection, checkfirst=True)
+
+
+def tweet_search(m):
+    if m.dialect == 'postgresql':
+        # an expression index, built concurrently, leaves the table as it is
+        m.create_index(TSVECTOR_INDEX, 'tweet', TSVECTOR, using='GIN')
+        return
+    if m.has_table(FTS_TABLE):
+        return
+    m.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(body, content='tweet', content_rowid='id')")
+    m.backfill('tweet', f'''
+        INSERT INTO {FTS_TABLE}(rowid, body) SELECT id, body FROM tweet WHERE id BETWEEN :low AND :high
+    ''')
+
+
+# (version, step), applied in this order; never reorder or edit applied steps
+MIGRATIONS = [
+    # before the counters, which count retweets
+    ('0001_retweet_feed', retweet_feed),
+    ('0002_tweet_counters', tweet_counters),
+    ('0003_feed_indexes', feed_indexes),
+    ('0004_follows', follows),
+    ('0005_tweet_search', tweet_search),
+]
+
+
+def applied_versions(engine):
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def _record(engine, versions):
+    with engine.begin() as connection:
+        connection.execute(schema_migrations.insert(), [
+            {'version': version, 'applied_at': datetime.utcnow()} for version in versions
+        ])
+
+
+def upgrade(engine=None, batch_size=10000, echo=lambda message: None):
+    """
+    Applies the pending migrations and returns their versions.
+    """
+    engine = engine or db.engine
+    applied = applied_versions(engine)
+    pending = [(version, step) for version, step in MIGRATIONS if version not in applied]
+    if not applied and not inspect(engine).has_table('tweet'):
+        echo('empty database, creating the current schema')
+        db.metadata.create_all(engine)
+        _record(engine, [version for version, step in pending])
+        return [version for version, step in pending]
+
+    migrator = Migrator(engine, batch_size=batch_size, echo=echo)
+    for version, step in pending:
+        echo(f'applying {version}')
+        step(migrator)
+        _record(engine, [version])
+    return [version for version, step in pending]
+
+
+def register_migration_commands(app):
+    @app.cli.group('db')
+    def db_group():
+        """Database schema migrations."""
+
+    @db_group.command('upgrade')
+    @click.option('--batch-size', type=int,
+                  help='Rows updated per transaction by backfills, MIGRATION_BATCH_SIZE by default.')
+    def upgrade_command(batch_size):
+        """Apply the pending schema migrations."""
+        applied = upgrade(batch_size=batch_size or app.config['MIGRATION_BATCH_SIZE'], echo=click.echo)
+        click.echo(f'Applied {len(applied)} migrations.' if applied else 'The schema is up to date.')
+
+    @db_group.command('status')
+    def status_command():
+        """List the schema migrations and whether they were applied."""
+        applied = applied_versions(db.engine)
+        for version, step in MIGRATIONS:
+            click.echo(f"{'applied' if version in applied else 'pending'}  {version}")
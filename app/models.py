@@ -1,14 +1,17 @@
 from datetime import datetime
 import json
 
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from .utils.common import TokenGenerator
+from .utils.passwords import check_password, hash_password, needs_rehash
+from .utils.replicas import RoutingSession
+from .utils.token_cache import AuthIdentity, get_token_cache
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(UserMixin, db.Model):
     __tablename__ = 'user'
@@ -17,8 +20,10 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(128))
     dateadded = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     dateupdated = db.Column(db.DateTime, index=True, onupdate=datetime.utcnow)
+    # kept in sync by follow/unfollow, decides between fan-out on write and on read
+    num_followers = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
-    # TODO: see how this query looks, and if it needs performance tuning
+    # paged newest first by /users/<id>/tweets/, on ix_tweet__user_id__dateadded
     tweets = db.relationship('Tweet', backref='author', lazy='dynamic')
     
     @property
@@ -27,20 +32,77 @@ class User(UserMixin, db.Model):
 
     @password.setter
     def password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return check_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
     
     @classmethod
-    def get_from_bearer_token(self, auth_token):
+    def get_from_bearer_token(cls, auth_token):
+        claims, identity = cls._verify_bearer_token(auth_token)
+        if identity is None:
+            return None
+        return db.session.get(User, identity.id)
+
+    @classmethod
+    def get_identity_from_bearer_token(cls, auth_token, claims_only=False):
+        """
+        Like get_from_bearer_token, but returns an AuthIdentity. A token seen before
+        is served from the token cache without decoding it or querying the user.
+
+        Read views that only need the caller's id pass `claims_only`: with
+        AUTH_CLAIMS_ONLY on, their identity is then taken from the verified
+        claims without the SELECT, so a deleted user's tokens keep working
+        there until they expire. Writes never pass it. Such identities have no
+        email and are not cached.
+        """
+        claims, identity = cls._verify_bearer_token(
+            auth_token, claims_only and current_app.config['AUTH_CLAIMS_ONLY'])
+        return identity
+
+    @classmethod
+    def _verify_bearer_token(cls, auth_token, claims_only=False):
         auth_token = auth_token.replace('Bearer ', '')
-        token = TokenGenerator.decode_token(auth_token)
-        return User.query.filter_by(id=token.get('id')).first()
+        token_cache = get_token_cache()
+        if token_cache is not None:
+            cached = token_cache.get(auth_token)
+            if cached is not None:
+                return cached
+        claims = TokenGenerator.decode_token(auth_token)
+        if claims_only:
+            return claims, AuthIdentity(id=int(claims['id']), email=None)
+        user = User.query.filter_by(id=claims.get('id')).first()
+        if user is None:
+            return claims, None
+        identity = AuthIdentity(id=user.id, email=user.email)
+        if token_cache is not None:
+            token_cache.set(auth_token, claims, identity)
+        return claims, identity
 
     def __repr__(self):
         return f'<User {self.username}>'
 
+    @classmethod
+    def adjust_counter(cls, id, counter, delta):
+        """
+        Atomically adds `delta` to one of the counter columns of user `id` as part of
+        the current transaction. The caller commits.
+        """
+        column = getattr(cls, counter)
+        db.session.execute(
+            db.update(cls).where(cls.id == id).values({column: column + delta})
+        )
+
+
+@db.event.listens_for(User, 'after_delete')
+def _invalidate_deleted_user_tokens(mapper, connection, target):
+    token_cache = get_token_cache()
+    if token_cache is not None:
+        token_cache.invalidate_user(target.id)
+
 
 class Tweet(db.Model):
     __tablename__ = 'tweet'
@@ -50,21 +112,115 @@ class Tweet(db.Model):
     dateadded = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     dateupdated = db.Column(db.DateTime, index=True, onupdate=datetime.utcnow)
     parent_id = db.Column(db.Integer, db.ForeignKey('tweet.id'), nullable=True)
+    # denormalized counters, kept in sync by the write paths in api/tweet.py
+    # and recomputable with `flask reconcile-counters`
+    num_likes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    num_replies = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    num_retweets = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     children = db.relationship("Tweet", backref=db.backref("parent", remote_side=[id]))
     likes = db.relationship("Like", backref=db.backref("like"))
+    __table_args__ = (
+        # keyset pagination of the feed orders by (dateadded, id)
+        db.Index('ix_tweet__dateadded__id', 'dateadded', 'id'),
+        # per-user timelines filter on user_id and page on (dateadded, id)
+        db.Index('ix_tweet__user_id__dateadded', user_id, dateadded.desc(), id.desc()),
+    )
 
-    def to_json(self):
+    def to_json(self, children=None):
+        """
+        `children` can be passed in when it was preloaded for a batch of tweets
+        (see `bulk_json`), otherwise it is lazily loaded.
+        """
+        if children is None:
+            children = [child.id for child in self.children]
         return {
             'id': self.id,
             'body': self.body,
             'dateadded': self.dateadded,
             'dateupdated': self.dateupdated,
-            'children': [child.id for child in self.children],
+            'children': children,
             'parent_id': self.parent_id,
-            # TODO: is there a more efficient way to find this?
-            'num_likes': len(self.likes)
+            'num_likes': self.num_likes,
+            'num_replies': self.num_replies,
+            'num_retweets': self.num_retweets
         }
 
+    @classmethod
+    def children_select(cls, ids):
+        return db.select(Tweet.parent_id, Tweet.id).where(Tweet.parent_id.in_(ids)).order_by(Tweet.id)
+
+    @classmethod
+    def bulk_json(cls, tweets, child_rows=None):
+        """
+        Serializes a page of tweets with a single query for the child ids of every
+        tweet on the page, instead of a lazy load per tweet. Callers that ran
+        `children_select` themselves pass its rows in `child_rows`.
+        """
+        tweets = list(tweets)
+        ids = [tweet.id for tweet in tweets]
+        if not ids:
+            return []
+
+        children = {id: [] for id in ids}
+        if child_rows is None:
+            child_rows = db.session.execute(cls.children_select(ids))
+        for parent_id, child_id in child_rows:
+            children[parent_id].append(child_id)
+
+        return [tweet.to_json(children=children[tweet.id]) for tweet in tweets]
+
+    @classmethod
+    def adjust_counter(cls, id, counter, delta):
+        """
+        Atomically adds `delta` to one of the counter columns of tweet `id` as part of
+        the current transaction. The caller commits.
+        """
+        column = getattr(cls, counter)
+        db.session.execute(
+            db.update(cls).where(cls.id == id).values({column: column + delta})
+        )
+
+    @classmethod
+    def reconcile_counters(cls, batch_size=10000):
+        """
+        Recomputes num_likes, num_replies and num_retweets from the `like`, `tweet`
+        and `retweet` tables, one id range of `batch_size` tweets per transaction.
+        Returns the number of tweets whose counters had drifted.
+        """
+        child = db.aliased(cls)
+        actual_likes = (
+            db.select(db.func.count(Like.id))
+            .where(Like.tweet_id == cls.id)
+            .scalar_subquery()
+        )
+        actual_replies = (
+            db.select(db.func.count(child.id))
+            .where(child.parent_id == cls.id)
+            .scalar_subquery()
+        )
+        actual_retweets = (
+            db.select(db.func.count(Retweet.id))
+            .where(Retweet.tweet_id == cls.id)
+            .scalar_subquery()
+        )
+        max_id = db.session.execute(db.select(db.func.max(cls.id))).scalar() or 0
+        fixed = 0
+        for low in range(0, max_id + 1, batch_size):
+            result = db.session.execute(
+                db.update(cls)
+                .where(cls.id.between(low, low + batch_size - 1))
+                .where(db.or_(
+                    cls.num_likes != actual_likes,
+                    cls.num_replies != actual_replies,
+                    cls.num_retweets != actual_retweets
+                ))
+                .values(num_likes=actual_likes, num_replies=actual_replies, num_retweets=actual_retweets)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            fixed += result.rowcount
+        return fixed
+
 
 class Like(db.Model):
     __tablename__ = 'like'
@@ -80,4 +236,30 @@ class Retweet(db.Model):
     __tablename__ = 'retweet'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    tweet_id = db.Column(db.Integer, db.ForeignKey('tweet.id'))
\ No newline at end of file
+    tweet_id = db.Column(db.Integer, db.ForeignKey('tweet.id'))
+    dateadded = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'tweet_id', name='uix_retweet__user_id__tweet_id'),
+        # merged into the feed by (dateadded, id), like tweets
+        db.Index('ix_retweet__dateadded__id', 'dateadded', 'id'),
+    )
+
+    def to_json(self, tweet_json):
+        return {
+            'type': 'retweet',
+            'id': self.id,
+            'user_id': self.user_id,
+            'dateadded': self.dateadded,
+            'tweet': tweet_json
+        }
+
+
+class Follow(db.Model):
+    __tablename__ = 'follow'
+    id = db.Column(db.Integer, primary_key=True)
+    follower_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    followee_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    dateadded = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.UniqueConstraint('follower_id', 'followee_id', name='uix_follow__follower_id__followee_id'),
+    )
@@ -0,0 +1,168 @@
+"""
+Full-text search over tweet bodies.
+
+On SQLite the index is an FTS5 table, `tweet_fts`, over the `tweet` table
+(external content, so bodies are not stored twice). The tweet write paths keep
+it in sync in the same transaction. On Postgres it is a GIN index on the
+`tsvector` expression of the body, which Postgres keeps in sync by itself, so
+the write path hooks do nothing there. Queries use the very same expression,
+so that the planner matches them to the index. Both are created along with the `tweet` table.
+Other databases have no search backend, and search is off there.
+"""
+from sqlalchemy import DDL, event, text
+
+from .models import db, Tweet
+from .utils.pagination import decode_rank_cursor
+
+
+FTS_TABLE = 'tweet_fts'
+TSVECTOR_INDEX = 'ix_tweet__body_tsvector'
+# indexed and queried as is; an expression index needs no column, which Postgres
+# could only add to `tweet` by rewriting the table
+TSVECTOR = "to_tsvector('english', coalesce(body, ''))"
+
+event.listen(Tweet.__table__, 'after_create', DDL(
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(body, content='tweet', content_rowid='id')"
+).execute_if(dialect='sqlite'))
+event.listen(Tweet.__table__, 'before_drop', DDL(
+    f"DROP TABLE IF EXISTS {FTS_TABLE}"
+).execute_if(dialect='sqlite'))
+event.listen(Tweet.__table__, 'after_create', DDL(
+    f"CREATE INDEX IF NOT EXISTS {TSVECTOR_INDEX} ON tweet USING GIN ({TSVECTOR})"
+).execute_if(dialect='postgresql'))
+
+
+class SQLiteSearchIndex:
+    enabled = True
+
+    def add(self, rows):
+        """Indexes the (id, body) of new tweets."""
+        db.session.execute(
+            text(f'INSERT INTO {FTS_TABLE}(rowid, body) VALUES (:id, :body)'),
+            [{'id': id, 'body': body} for id, body in rows]
+        )
+
+    def remove(self, rows):
+        """Unindexes tweets by the (id, body) they were indexed with."""
+        # 'delete' of a row the index does not hold corrupts it, so rows that
+        # were never indexed (e.g. written without the write paths) are skipped
+        rows = [(id, body) for id, body in rows if self._indexed(id, body)]
+        if rows:
+            db.session.execute(
+                text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', :id, :body)"),
+                [{'id': id, 'body': body} for id, body in rows]
+            )
+
+    def _indexed(self, id, body):
+        """
+        Whether the index holds `body` under `id`. The rowids of an external
+        content table are read from `tweet`, so this matches the whole body as a
+        phrase, which only the index can answer. Bodies without any token never
+        match, and are left in the index, where they match nothing either.
+        """
+        phrase = '"{}"'.format(body.replace('"', '""'))
+        return db.session.execute(
+            text(f'SELECT 1 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :phrase AND rowid = :id'),
+            {'phrase': phrase, 'id': id}
+        ).first() is not None
+
+    def update(self, id, old_body, new_body):
+        self.remove([(id, old_body)])
+        self.add([(id, new_body)])
+
+    def rebuild(self):
+        db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        db.session.commit()
+
+    def search(self, query, cursor, limit):
+        """
+        Returns up to `limit` (rank, id) of the tweets matching every word of
+        `query`, best bm25 match first (lower ranks are better), after `cursor`.
+        """
+        # quote every word so that user input is never parsed as FTS5 syntax
+        match = ' '.join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+        params = {'match': match, 'limit': limit}
+        after = ''
+        if cursor:
+            params['rank'], params['id'] = decode_rank_cursor(cursor)
+            after = 'AND (rank > :rank OR (rank = :rank AND rowid > :id))'
+        return db.session.execute(text(
+            f'SELECT rank, rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match {after} '
+            'ORDER BY rank, rowid LIMIT :limit'
+        ), params).all()
+
+
+class PostgresSearchIndex:
+    enabled = True
+
+    def add(self, rows):
+        pass
+
+    def remove(self, rows):
+        pass
+
+    def update(self, id, old_body, new_body):
+        pass
+
+    def rebuild(self):
+        db.session.commit()
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text(f'REINDEX INDEX CONCURRENTLY {TSVECTOR_INDEX}'))
+
+    def search(self, query, cursor, limit):
+        """
+        Like SQLiteSearchIndex.search, ranked by the negated ts_rank so that lower
+        ranks are better on both backends.
+        """
+        params = {'query': query, 'limit': limit}
+        after = ''
+        if cursor:
+            params['rank'], params['id'] = decode_rank_cursor(cursor)
+            after = 'WHERE rank > :rank OR (rank = :rank AND id > :id)'
+        return db.session.execute(text(
+            'SELECT rank, id FROM ('
+            f'  SELECT -ts_rank({TSVECTOR}, plainto_tsquery(\'english\', :query)) AS rank, id FROM tweet'
+            f'  WHERE {TSVECTOR} @@ plainto_tsquery(\'english\', :query)'
+            f') AS matches {after} ORDER BY rank, id LIMIT :limit'
+        ), params).all()
+
+
+class NullSearchIndex:
+    """
+    Search is off on other databases: the write path hooks do nothing, and the
+    search endpoint answers 404.
+    """
+    enabled = False
+
+    def add(self, rows):
+        pass
+
+    def remove(self, rows):
+        pass
+
+    def update(self, id, old_body, new_body):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, cursor, limit):
+        return []
+
+
+SEARCH_INDEXES = {
+    'sqlite': SQLiteSearchIndex,
+    'postgresql': PostgresSearchIndex,
+}
+
+
+def get_search_index():
+    return SEARCH_INDEXES.get(db.session.get_bind().dialect.name, NullSearchIndex)()
+
+
+def init_search(app):
+    with app.app_context():
+        dialect = db.engine.dialect.name
+    if dialect not in SEARCH_INDEXES:
+        app.logger.warning(f'[search] full-text search is off, {dialect} databases have no search backend')
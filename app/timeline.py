@@ -0,0 +1,260 @@
+"""
+Home timelines: the newest tweets of the users someone follows, plus their own.
+
+Timelines are materialized on write. When a tweet is created its (dateadded, id)
+entry is pushed onto the stored timeline of every follower of the author. Each
+stored timeline keeps only the newest TIMELINE_LENGTH entries. Authors with more
+than FANOUT_MAX_FOLLOWERS followers are not fanned out, since one tweet would
+cost that many writes. Their tweets are read from the per-user tweet index at
+read time and merged into the stored timeline instead. When an author crosses
+that threshold, the stored timelines of their followers are dropped and
+rebuilt on the next read, so that none of the author's tweets fall between the
+two paths.
+
+Stored timelines expire after TIMELINE_TTL seconds, which bounds how long a
+worker with an in-process store misses the tweets fanned out by the others.
+"""
+from bisect import insort
+from collections import OrderedDict
+import heapq
+from threading import Lock
+import time
+
+from flask import current_app
+from werkzeug.utils import import_string
+
+from .models import db, Follow, Tweet, User
+from .utils.pagination import decode_cursor, keyset_filter
+
+
+class TimelineStore:
+    """
+    The interface of a store of materialized timelines. Entries are
+    (dateadded, tweet_id) tuples, newest first. A shared backend (e.g. Redis
+    sorted sets) lets every worker process see the same timelines.
+    """
+
+    def get(self, user_id):
+        """The stored entries of `user_id`, or None if not materialized."""
+        raise NotImplementedError
+
+    def set(self, user_id, entries):
+        raise NotImplementedError
+
+    def push(self, user_ids, entries):
+        """Adds `entries` to the materialized timelines among `user_ids`."""
+        raise NotImplementedError
+
+    def remove(self, user_ids, tweet_ids):
+        """
+        Removes `tweet_ids` from the materialized timelines among `user_ids`. A
+        timeline of `length` entries may have been trimmed, which readers only
+        tell by its length, so it is dropped instead of shrunk.
+        """
+        raise NotImplementedError
+
+    def invalidate(self, user_id):
+        raise NotImplementedError
+
+
+class MemoryTimelineStore(TimelineStore):
+    """
+    An in-process store keeping at most `length` entries per timeline, for at
+    most `maxsize` users, least recently read evicted first, and for `ttl`
+    seconds if given. Timelines are rebuilt from the database after a restart.
+    """
+
+    def __init__(self, length=800, maxsize=10000, ttl=None, clock=time.monotonic):
+        self.length = length
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        # user_id -> (expires, entries), where entries are oldest first, so that
+        # new entries are appended and trimming drops the oldest
+        self._timelines = OrderedDict()
+        self._lock = Lock()
+
+    def _timeline(self, user_id):
+        # the caller holds the lock
+        stored = self._timelines.get(user_id)
+        if stored is None:
+            return None
+        expires, timeline = stored
+        if expires is not None and expires <= self.clock():
+            del self._timelines[user_id]
+            return None
+        return timeline
+
+    def get(self, user_id):
+        with self._lock:
+            timeline = self._timeline(user_id)
+            if timeline is None:
+                return None
+            self._timelines.move_to_end(user_id)
+            return timeline[::-1]
+
+    def set(self, user_id, entries):
+        timeline = sorted(entries)[-self.length:]
+        with self._lock:
+            self._timelines[user_id] = (self.clock() + self.ttl if self.ttl else None, timeline)
+            self._timelines.move_to_end(user_id)
+            while len(self._timelines) > self.maxsize:
+                self._timelines.popitem(last=False)
+
+    def push(self, user_ids, entries):
+        with self._lock:
+            for user_id in user_ids:
+                timeline = self._timeline(user_id)
+                if timeline is None:
+                    continue
+                for entry in entries:
+                    insort(timeline, entry)
+                del timeline[:-self.length]
+
+    def remove(self, user_ids, tweet_ids):
+        tweet_ids = set(tweet_ids)
+        with self._lock:
+            for user_id in user_ids:
+                timeline = self._timeline(user_id)
+                if timeline is None:
+                    continue
+                kept = [entry for entry in timeline if entry[1] not in tweet_ids]
+                if len(kept) == len(timeline):
+                    continue
+                if len(timeline) >= self.length:
+                    del self._timelines[user_id]
+                else:
+                    timeline[:] = kept
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._timelines.pop(user_id, None)
+
+
+def init_timeline_store(app):
+    backend_class = import_string(app.config['TIMELINE_STORE_BACKEND'])
+    app.extensions['timeline_store'] = backend_class(
+        length=app.config['TIMELINE_LENGTH'],
+        ttl=app.config['TIMELINE_TTL'],
+        **app.config.get('TIMELINE_STORE_OPTIONS', {})
+    )
+
+
+def get_timeline_store():
+    return current_app.extensions['timeline_store']
+
+
+def _fans_out(num_followers):
+    return num_followers <= current_app.config['FANOUT_MAX_FOLLOWERS']
+
+
+def _recipients(author_id):
+    """
+    The users whose stored timelines hold the tweets of `author_id`: the author,
+    and their followers unless the author has too many to fan out to.
+    """
+    num_followers = db.session.execute(
+        db.select(User.num_followers).where(User.id == author_id)
+    ).scalar() or 0
+    if not _fans_out(num_followers):
+        return [author_id]
+    follower_ids = db.session.scalars(
+        db.select(Follow.follower_id).where(Follow.followee_id == author_id)
+    ).all()
+    return [author_id, *follower_ids]
+
+
+def fan_out(author_id, entries):
+    """
+    Pushes the (dateadded, tweet_id) `entries` of new tweets by `author_id` onto
+    the stored timelines of their recipients.
+    """
+    get_timeline_store().push(_recipients(author_id), entries)
+
+
+def retract(author_id, tweet_ids):
+    get_timeline_store().remove(_recipients(author_id), tweet_ids)
+
+
+def followers_changed(author_id, delta):
+    """
+    Called once `author_id` gained (`delta` 1) or lost (-1) a follower. If that
+    moved them across FANOUT_MAX_FOLLOWERS, the stored timelines of their
+    followers hold the author's tweets from one side of it but not the other,
+    and are dropped to be rebuilt with the path the author now takes.
+    """
+    num_followers = db.session.execute(
+        db.select(User.num_followers).where(User.id == author_id)
+    ).scalar() or 0
+    if _fans_out(num_followers) == _fans_out(num_followers - delta):
+        return
+    store = get_timeline_store()
+    for follower_id in db.session.scalars(db.select(Follow.follower_id).where(Follow.followee_id == author_id)):
+        store.invalidate(follower_id)
+
+
+def _read_entries(where, cursor, limit):
+    """
+    Fan-out on read: the newest `limit` (dateadded, id) entries of the tweets
+    matching `where`, after `cursor`.
+    """
+    statement = db.select(Tweet.dateadded, Tweet.id).where(where)
+    if cursor:
+        statement = statement.where(keyset_filter(Tweet.dateadded, Tweet.id, cursor))
+    statement = statement.order_by(Tweet.dateadded.desc(), Tweet.id.desc()).limit(limit)
+    return [tuple(row) for row in db.session.execute(statement)]
+
+
+def _followees(user_id, fanned_out):
+    """
+    The ids of the users `user_id` follows whose tweets are fanned out on write
+    (`fanned_out`), or those that are merged in on read.
+    """
+    limit = current_app.config['FANOUT_MAX_FOLLOWERS']
+    statement = (
+        db.select(Follow.followee_id)
+        .join(User, User.id == Follow.followee_id)
+        .where(Follow.follower_id == user_id)
+    )
+    if fanned_out:
+        return statement.where(User.num_followers <= limit)
+    return statement.where(User.num_followers > limit)
+
+
+def _stored_where(user_id):
+    return db.or_(Tweet.user_id == user_id, Tweet.user_id.in_(_followees(user_id, fanned_out=True)))
+
+
+def home_timeline_entries(user_id, cursor, limit):
+    """
+    Returns up to `limit` (dateadded, tweet_id) entries of the home timeline of
+    `user_id` after `cursor`, and whether there are more.
+    """
+    store = get_timeline_store()
+    stored = store.get(user_id)
+    if stored is None:
+        stored = _read_entries(_stored_where(user_id), None, store.length)
+        store.set(user_id, stored)
+
+    entries = stored
+    if cursor:
+        after = decode_cursor(cursor)
+        entries = [entry for entry in stored if entry < after]
+    if len(entries) <= limit and len(stored) >= store.length:
+        # paged past what the stored timeline retains
+        entries = _read_entries(_stored_where(user_id), cursor, limit + 1)
+
+    streams = [entries]
+    celebrity_ids = db.session.scalars(_followees(user_id, fanned_out=False)).all()
+    if celebrity_ids:
+        streams.append(_read_entries(Tweet.user_id.in_(celebrity_ids), cursor, limit + 1))
+
+    merged, seen = [], set()
+    for entry in heapq.merge(*streams, reverse=True):
+        if entry[1] in seen:
+            continue
+        seen.add(entry[1])
+        merged.append(entry)
+        if len(merged) > limit:
+            break
+    return merged[:limit], len(merged) > limit
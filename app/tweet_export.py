@@ -0,0 +1,45 @@
+from flask import current_app
+
+from .models import db, Tweet
+
+
+EXPORT_COLUMNS = (
+    Tweet.id,
+    Tweet.user_id,
+    Tweet.parent_id,
+    Tweet.body,
+    Tweet.dateadded,
+    Tweet.dateupdated,
+    Tweet.num_likes,
+    Tweet.num_replies,
+    Tweet.num_retweets,
+)
+
+
+def _export_statement(user_id=None, since=None, until=None):
+    statement = db.select(*EXPORT_COLUMNS).order_by(Tweet.id)
+    if user_id is not None:
+        statement = statement.where(Tweet.user_id == user_id)
+    if since is not None:
+        statement = statement.where(Tweet.dateadded >= since)
+    if until is not None:
+        statement = statement.where(Tweet.dateadded < until)
+    return statement
+
+
+def _row_to_json(row):
+    # the app's encoder, so that dates are written as in every other response
+    return current_app.json.dumps(row._asdict())
+
+
+def iter_tweets_ndjson(user_id=None, since=None, until=None, chunk_rows=1000):
+    """
+    Yields the matching tweets as NDJSON, one chunk of `chunk_rows` lines at a time.
+    Rows are streamed from a server-side cursor as plain tuples (no ORM objects
+    accumulate in the session), so memory use does not grow with the table.
+    """
+    result = db.session.execute(
+        _export_statement(user_id, since, until).execution_options(yield_per=chunk_rows)
+    )
+    for rows in result.partitions():
+        yield ''.join(_row_to_json(row) + '\n' for row in rows)
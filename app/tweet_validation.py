@@ -4,9 +4,26 @@ from marshmallow import Schema, fields, validate
 class TweetInput(Schema):
     body = fields.Str(required=True, validate=validate.Length(min=6, max=255))
     auth_token = fields.Str(required=True)
-    parent_id = fields.Number(required=False)
+    parent_id = fields.Integer(required=False)
 
 
 class LikeInput(Schema):
-    tweet_id = fields.Number(required=True)
-    auth_token = fields.Str(required=True)
\ No newline at end of file
+    tweet_id = fields.Integer(required=True)
+    auth_token = fields.Str(required=True)
+
+
+class UnlikeInput(Schema):
+    # write-behind likes are acknowledged without an id, so tweet_id works too
+    like_id = fields.Integer(required=False)
+    tweet_id = fields.Integer(required=False)
+    auth_token = fields.Str(required=True)
+
+
+class RetweetInput(Schema):
+    tweet_id = fields.Integer(required=True)
+    auth_token = fields.Str(required=True)
+
+
+class UnretweetInput(Schema):
+    retweet_id = fields.Integer(required=True)
+    auth_token = fields.Str(required=True)
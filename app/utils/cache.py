@@ -0,0 +1,127 @@
+from collections import OrderedDict
+import hashlib
+from threading import Lock
+import time
+
+from flask import current_app
+from werkzeug.utils import import_string
+
+
+class CacheBackend:
+    """
+    The interface the response cache needs from a store. A shared backend (e.g.
+    Redis or memcached) implements these with the store's native expiry and
+    atomic increment, so that invalidations reach every worker process.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def incr(self, key):
+        """Atomically increments the integer at `key` (missing is 0) and returns it."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LRUCacheBackend(CacheBackend):
+    """
+    An in-process backend holding at most `maxsize` entries, evicted least recently
+    used first or once their ttl has passed. Counters are kept apart and never
+    evicted, since losing one would resurrect entries it had invalidated.
+    """
+
+    def __init__(self, maxsize=1024, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            expires = self.clock() + ttl if ttl else None
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+
+def make_etag(body):
+    return hashlib.sha1(body).hexdigest()
+
+
+class FeedCache:
+    """
+    Caches rendered feed pages as (body, etag), keyed by the request path and
+    query string. Writes invalidate every page at once by bumping a version
+    number that is part of each key. Entries also expire after `ttl` seconds, which
+    bounds how stale a page can be when a write went through another process.
+    """
+    VERSION_KEY = 'feed:version'
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+
+    def _key(self, path):
+        return f'feed:{self.backend.get(self.VERSION_KEY) or 0}:{path}'
+
+    def get(self, path):
+        return self.backend.get(self._key(path))
+
+    def set(self, path, body):
+        etag = make_etag(body)
+        self.backend.set(self._key(path), (body, etag), self.ttl)
+        return body, etag
+
+    def invalidate(self):
+        self.backend.incr(self.VERSION_KEY)
+
+
+def init_feed_cache(app):
+    if app.config.get('FEED_CACHE_TTL'):
+        backend_class = import_string(app.config['FEED_CACHE_BACKEND'])
+        backend = backend_class(**app.config.get('FEED_CACHE_OPTIONS', {}))
+        app.extensions['feed_cache'] = FeedCache(backend, app.config['FEED_CACHE_TTL'])
+
+
+def get_feed_cache():
+    """
+    The current app's FeedCache, or None if FEED_CACHE_TTL disables it.
+    """
+    return current_app.extensions.get('feed_cache')
+
+
+def invalidate_feed_cache():
+    feed_cache = get_feed_cache()
+    if feed_cache is not None:
+        feed_cache.invalidate()
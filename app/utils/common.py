@@ -22,7 +22,50 @@ def generate_response(data=None, message=None, status=400):
     }, status
 
 
+class TokenKeys:
+    """
+    The JWT algorithm and its keys, parsed once by `init_token_keys`. With an
+    asymmetric algorithm (RS256, ES256, EdDSA, ...) tokens are signed with
+    JWT_PRIVATE_KEY and verified with JWT_PUBLIC_KEY, so a node that only
+    verifies tokens needs no secret; HMAC algorithms use SECRET_KEY for both.
+    """
+
+    def __init__(self, algorithm, signing_key, verifying_key, expires_in):
+        self.algorithm = algorithm
+        self.signing_key = signing_key
+        self.verifying_key = verifying_key
+        self.expires_in = expires_in
+
+    @classmethod
+    def from_config(cls, config):
+        algorithm = config['JWT_ALGORITHM']
+        implementation = jwt.get_algorithm_by_name(algorithm)
+        if algorithm.startswith('HS'):
+            secret = implementation.prepare_key(config['SECRET_KEY'])
+            return cls(algorithm, secret, secret, config['JWT_EXPIRES_IN'])
+        if not config.get('JWT_PUBLIC_KEY'):
+            raise ValueError(f'JWT_ALGORITHM {algorithm} needs JWT_PUBLIC_KEY')
+        signing_key = None
+        if config.get('JWT_PRIVATE_KEY'):
+            signing_key = implementation.prepare_key(config['JWT_PRIVATE_KEY'])
+        return cls(algorithm, signing_key, implementation.prepare_key(config['JWT_PUBLIC_KEY']),
+                   config['JWT_EXPIRES_IN'])
+
+
+def init_token_keys(app):
+    app.extensions['token_keys'] = TokenKeys.from_config(app.config)
+
+
 class TokenGenerator:
+    """
+    Issues and verifies every bearer token, with the algorithm and keys of
+    JWT_ALGORITHM. Tokens only carry the user's id and their expiry.
+    """
+
+    @staticmethod
+    def _keys():
+        return current_app.extensions['token_keys']
+
     @staticmethod
     def encode_token(user):
         """
@@ -31,27 +74,30 @@ class TokenGenerator:
         :param user: The user object that we want to encode
         :return: A token
         """
-
+        keys = TokenGenerator._keys()
+        if keys.signing_key is None:
+            raise RuntimeError('JWT_PRIVATE_KEY is not set, this node can only verify tokens')
         payload = {
-            "exp": datetime.now(timezone.utc) + timedelta(days=1),
-            "id": str(user.id),
+            "exp": datetime.now(timezone.utc) + keys.expires_in,
+            "id": user.id,
         }
-        token = jwt.encode(payload, current_app.config["SECRET_KEY"], algorithm="HS256")
-        return token
+        return jwt.encode(payload, keys.signing_key, algorithm=keys.algorithm)
 
     @staticmethod
     def decode_token(token):
         """
-        It takes a token, decodes it, and returns the decoded token
+        It takes a token, verifies its signature and expiry, and returns its claims.
+        Only tokens signed with JWT_ALGORITHM are accepted.
         
         :param token: The token to decode
-        :return: A dictionary with the user's id and username.
+        :return: A dictionary with the user's id and the expiry.
         """
+        keys = TokenGenerator._keys()
         return jwt.decode(
             token,
-            current_app.config["SECRET_KEY"],
-            algorithms="HS256",
-            options={"require_exp": True},
+            keys.verifying_key,
+            algorithms=[keys.algorithm],
+            options={"require": ["exp", "id"]},
         )
 
     @staticmethod
@@ -63,14 +109,9 @@ class TokenGenerator:
         :return: A boolean value.
         """
         try:
-            jwt.decode(
-                token,
-                current_app.config["SECRET_KEY"],
-                algorithms="HS256",
-                options={"require_exp": True},
-            )
+            TokenGenerator.decode_token(token)
             return True
-        except:
+        except jwt.InvalidTokenError:
             return False
 
     @staticmethod
@@ -81,13 +122,8 @@ class TokenGenerator:
         :param token: The token that was sent to the server
         :return: The user id is being returned.
         """
-        data = jwt.decode(
-            token,
-            current_app.config["SECRET_KEY"],
-            algorithms="HS256",
-            options={"require_exp": True},
-        )
-        return data["id"]
+        # tokens issued before ids were encoded as integers carry a string
+        return int(TokenGenerator.decode_token(token)["id"])
 
 
 token_generator = TokenGenerator()
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Database engine and connection pool tuning.
+
+`apply_engine_options` turns the DB_* settings of the config class into
+SQLAlchemy engine options before Flask-SQLAlchemy creates its engines. Pools
+are sized from WORKER_THREADS, the number of requests a worker process serves
+at once, since every process has a pool of its own. `init_engines` then
+applies SQLITE_PRAGMAS to each new SQLite connection and reports how long
+requests wait to check a connection out of the pool.
+"""
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from ..models import db
+from .metrics import Histogram, gauge
+
+
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+
+class TimedQueuePool(QueuePool):
+    """
+    A QueuePool that passes the time every checkout took, including waiting
+    for a free connection, opening a new one and the pre-ping, to
+    `wait_observer`.
+    """
+    wait_observer = None
+
+    def connect(self):
+        started = time.perf_counter()
+        connection = super().connect()
+        if self.wait_observer is not None:
+            self.wait_observer(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool built by recreate()
+        pool = super().recreate()
+        pool.wait_observer = self.wait_observer
+        return pool
+
+
+def _is_memory_sqlite(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def pool_options(config, url):
+    """
+    Returns the pool related engine options for a database url.
+    """
+    if _is_memory_sqlite(url):
+        # Flask-SQLAlchemy shares one connection through a StaticPool
+        return {}
+    pool_size = config['DB_POOL_SIZE']
+    if pool_size is None:
+        # the like queue flushes from a thread of its own
+        pool_size = config['WORKER_THREADS'] + (1 if config['LIKE_WRITE_BEHIND'] else 0)
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def apply_engine_options(app):
+    """
+    Adds pool options to SQLALCHEMY_ENGINE_OPTIONS and SQLALCHEMY_BINDS. Options
+    set there explicitly win. Must run before `db.init_app`.
+    """
+    config = app.config
+    uri = config.get('SQLALCHEMY_DATABASE_URI')
+    if uri is not None:
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            **pool_options(config, uri), **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    binds = {}
+    for key, value in config.get('SQLALCHEMY_BINDS', {}).items():
+        options = {'url': value} if isinstance(value, str) else dict(value)
+        binds[key] = {**pool_options(config, options['url']), **options}
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+def sqlite_pragmas_listener(pragmas):
+    """
+    Returns a 'connect' event listener that applies `pragmas` to new connections.
+    """
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def _pool_metrics(engines, wait_histogram):
+    def collect():
+        lines = wait_histogram.render()
+        for name, engine in engines.items():
+            pool = engine.pool
+            if not isinstance(pool, QueuePool):
+                continue
+            labels = (('bind', name),)
+            lines += gauge('db_pool_size', 'Connections kept open by the pool.', pool.size(), labels)
+            lines += gauge('db_pool_checked_out', 'Connections currently checked out.', pool.checkedout(), labels)
+            lines += gauge('db_pool_overflow', 'Connections open beyond the pool size.', pool.overflow(), labels)
+        return lines
+    return collect
+
+
+def init_engines(app):
+    with app.app_context():
+        engines = {key or 'default': engine for key, engine in db.engines.items()}
+
+    pragmas = app.config['SQLITE_PRAGMAS']
+    wait_histogram = Histogram(
+        'db_pool_checkout_wait_seconds', 'Time taken to check a connection out of the pool.',
+        ('bind',), POOL_WAIT_BUCKETS)
+    for name, engine in engines.items():
+        if pragmas and engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', sqlite_pragmas_listener(pragmas))
+        if isinstance(engine.pool, TimedQueuePool):
+            engine.pool.wait_observer = lambda seconds, name=name: wait_histogram.observe(seconds, name)
+
+    if 'metrics' in app.extensions:
+        app.extensions['metrics'].register_collector(_pool_metrics(engines, wait_histogram))
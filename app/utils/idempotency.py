@@ -0,0 +1,153 @@
+"""
+Idempotency-Key support for write endpoints.
+
+A client that retries a write after a timeout sends the same Idempotency-Key
+header with each attempt. The first attempt runs the view and its response is
+stored for IDEMPOTENCY_TTL seconds; later attempts get the stored response
+back, marked with `Idempotent-Replayed: true`, without running the view again.
+Keys are scoped to the client (its Authorization header, or its address), the
+method and the path. Reusing a key with a different body is answered with 422,
+and a retry that arrives while the first attempt is still running with 409.
+
+Responses with a 5xx or 429 status are not stored, so that the retry runs
+again. Stores are pluggable through IDEMPOTENCY_BACKEND; the in-process
+default only sees the requests of its own worker.
+"""
+from functools import wraps
+import hashlib
+
+from flask import current_app, make_response, request
+from werkzeug.utils import import_string
+
+from .cache import LRUCacheBackend
+from .metrics import counter
+
+
+IN_PROGRESS = 'in-progress'
+
+
+class IdempotencyBackend:
+    """
+    The interface idempotency keys need from a store. A shared backend
+    implements `add` with the store's set-if-absent (e.g. Redis SET NX).
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def add(self, key, value, ttl):
+        """Stores `value` unless `key` is already there, and returns whether it did."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class MemoryIdempotencyBackend(LRUCacheBackend, IdempotencyBackend):
+    """
+    An LRUCacheBackend with the operations idempotency keys need on top.
+    """
+
+    def __init__(self, maxsize=10000, **kwargs):
+        super().__init__(maxsize=maxsize, **kwargs)
+
+    def add(self, key, value, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > self.clock()):
+                return False
+            self._entries[key] = (value, self.clock() + ttl)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class IdempotencyStore:
+    def __init__(self, backend, ttl, lock_ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.replayed = 0
+
+
+def get_idempotency_store():
+    """
+    The current app's IdempotencyStore, or None if IDEMPOTENCY_TTL disables it.
+    """
+    return current_app.extensions.get('idempotency_store')
+
+
+def _request_key(idempotency_key):
+    client = request.headers.get('Authorization') or request.remote_addr
+    scope = hashlib.sha1(f'{client}\n{request.method}\n{request.path}'.encode()).hexdigest()
+    return f'idempotency:{scope}:{idempotency_key}'
+
+
+def idempotent(view):
+    """
+    Replays the stored response of a request with the same Idempotency-Key.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        store = get_idempotency_store()
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if store is None or not idempotency_key:
+            return view(*args, **kwargs)
+
+        key = _request_key(idempotency_key)
+        fingerprint = hashlib.sha1(request.get_data()).hexdigest()
+        if not store.backend.add(key, (IN_PROGRESS, fingerprint), store.lock_ttl):
+            stored = store.backend.get(key)
+            if stored is not None:
+                return _replay(store, stored, fingerprint)
+            # expired in between
+            return view(*args, **kwargs)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except BaseException:
+            store.backend.delete(key)
+            raise
+        if response.status_code >= 500 or response.status_code == 429:
+            store.backend.delete(key)
+        else:
+            store.backend.set(key, (
+                fingerprint, response.status_code, response.get_data(), response.mimetype
+            ), store.ttl)
+        return response
+    return wrapper
+
+
+def _replay(store, stored, fingerprint):
+    if stored[0] == IN_PROGRESS:
+        if stored[1] != fingerprint:
+            return make_response({'data': 'Idempotency-Key was already used with a different request body.'}, 422)
+        return make_response({'data': 'A request with this Idempotency-Key is still in progress.'}, 409)
+    stored_fingerprint, status, body, mimetype = stored
+    if stored_fingerprint != fingerprint:
+        return make_response({'data': 'Idempotency-Key was already used with a different request body.'}, 422)
+    store.replayed += 1
+    response = current_app.response_class(body, status=status, mimetype=mimetype)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def init_idempotency(app):
+    if not app.config.get('IDEMPOTENCY_TTL'):
+        return
+    backend_class = import_string(app.config['IDEMPOTENCY_BACKEND'])
+    store = app.extensions['idempotency_store'] = IdempotencyStore(
+        backend_class(**app.config.get('IDEMPOTENCY_OPTIONS', {})),
+        ttl=app.config['IDEMPOTENCY_TTL'],
+        lock_ttl=app.config['IDEMPOTENCY_LOCK_TTL']
+    )
+    app.extensions['metrics'].register_collector(
+        lambda: counter('idempotent_replays_total', 'Responses replayed for a repeated Idempotency-Key.', store.replayed)
+    )
@@ -0,0 +1,78 @@
+from datetime import date, datetime, timezone
+import json
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def _as_utc(value):
+    # the models store naive UTC timestamps
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Encodes responses with orjson when it is installed, and with the stdlib json
+    module otherwise. Both produce the same documents. Datetimes are written in
+    the format set by JSON_DATETIME_FORMAT: 'iso' (ISO 8601 with a UTC offset),
+    'epoch' (float seconds) or 'http' (RFC 822, Flask's default format).
+    `response` encodes straight to bytes, without an intermediate str, and
+    `loads` decodes request bodies with orjson too.
+    """
+    sort_keys = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.datetime_format = app.config.get('JSON_DATETIME_FORMAT', 'iso')
+        self.use_orjson = orjson is not None and app.config.get('JSON_USE_ORJSON', True)
+
+    def default(self, value):
+        if isinstance(value, date):
+            value = _as_utc(value)
+            if self.datetime_format == 'epoch' and isinstance(value, datetime):
+                return value.timestamp()
+            if self.datetime_format == 'http':
+                return http_date(value)
+            return value.isoformat()
+        return super().default(value)
+
+    def _orjson_option(self, indent=False):
+        option = orjson.OPT_NAIVE_UTC
+        if self.datetime_format != 'iso':
+            option |= orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_option()).decode()
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        compact = self.compact if self.compact is not None else not self._app.debug
+        if self.use_orjson:
+            body = orjson.dumps(obj, default=self.default, option=self._orjson_option(indent=not compact))
+        elif compact:
+            body = self.dumps(obj, separators=(',', ':'))
+        else:
+            body = self.dumps(obj, indent=2)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,192 @@
+"""
+Per-request performance instrumentation.
+
+Every request is timed. Its wall time, the time spent in and the number of
+recorded SQLAlchemy queries, and its response size are reported in a
+Server-Timing header and aggregated into per-endpoint histograms. Queries
+slower than SLOW_QUERY_THRESHOLD seconds are logged with their statement. The
+histograms, plus whatever registered collectors report, are served in the
+Prometheus text format at METRICS_PATH, which is off unless configured and
+requires METRICS_TOKEN as a bearer token when that is set.
+"""
+from bisect import bisect_left
+import hmac
+from threading import Lock
+import time
+
+from flask import current_app, g, make_response, request
+from flask_sqlalchemy.record_queries import get_recorded_queries
+
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+def _format_labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    A Prometheus histogram with one series per tuple of label values.
+    """
+
+    def __init__(self, name, help, label_names, buckets):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            if index < len(counts):
+                counts[index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, (list(counts), count, total)) for key, (counts, count, total) in self._series.items())
+        for label_values, (counts, count, total) in series:
+            labels = list(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(labels + [('le', _format_number(bound))])
+                lines.append(f'{self.name}_bucket{{{le}}} {cumulative}')
+            le = _format_labels(labels + [('le', '+Inf')])
+            lines.append(f'{self.name}_bucket{{{le}}} {count}')
+            lines.append(f'{self.name}_sum{{{_format_labels(labels)}}} {_format_number(total)}')
+            lines.append(f'{self.name}_count{{{_format_labels(labels)}}} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.request_duration = Histogram(
+            'http_request_duration_seconds', 'Wall time of requests.', ('endpoint',), LATENCY_BUCKETS)
+        self.request_db_duration = Histogram(
+            'http_request_db_duration_seconds', 'Time spent in database queries per request.',
+            ('endpoint',), LATENCY_BUCKETS)
+        self.request_queries = Histogram(
+            'http_request_queries', 'Database queries per request.', ('endpoint',), COUNT_BUCKETS)
+        self.response_size = Histogram(
+            'http_response_size_bytes', 'Size of response bodies.', ('endpoint',), SIZE_BUCKETS)
+        self.histograms = [self.request_duration, self.request_db_duration, self.request_queries, self.response_size]
+        self.collectors = []
+
+    def register_collector(self, collector):
+        """
+        Adds a callable returning lines of Prometheus text, called on every scrape.
+        """
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for histogram in self.histograms:
+            lines += histogram.render()
+        for collector in self.collectors:
+            lines += collector()
+        return '\n'.join(lines) + '\n'
+
+
+def _metric(type, name, help, value, labels):
+    return [
+        f'# HELP {name} {help}',
+        f'# TYPE {name} {type}',
+        f'{name}{{{_format_labels(labels)}}} {_format_number(value)}' if labels else f'{name} {_format_number(value)}'
+    ]
+
+
+def gauge(name, help, value, labels=()):
+    return _metric('gauge', name, help, value, labels)
+
+
+def counter(name, help, value, labels=()):
+    """
+    A value that only ever grows while the process runs. By convention `name`
+    ends in _total.
+    """
+    return _metric('counter', name, help, value, labels)
+
+
+def get_metrics():
+    return current_app.extensions['metrics']
+
+
+def _start_timer():
+    g._request_started = time.perf_counter()
+    # queries are recorded on `g`, which may outlive a single request
+    g._request_queries_offset = len(get_recorded_queries())
+
+
+def _record_request(response):
+    started = g.pop('_request_started', None)
+    if started is None:
+        return response
+    duration = time.perf_counter() - started
+    queries = get_recorded_queries()[g.pop('_request_queries_offset', 0):]
+    db_duration = sum(query.duration for query in queries)
+    endpoint = request.endpoint or 'unmatched'
+
+    threshold = current_app.config['SLOW_QUERY_THRESHOLD']
+    if threshold is not None:
+        for query in queries:
+            if query.duration >= threshold:
+                current_app.logger.warning(
+                    f'[slow query] {query.duration * 1000:.1f}ms in {endpoint} '
+                    f'({query.location}): {query.statement}'
+                )
+
+    metrics = get_metrics()
+    metrics.request_duration.observe(duration, endpoint)
+    metrics.request_db_duration.observe(db_duration, endpoint)
+    metrics.request_queries.observe(len(queries), endpoint)
+    size = response.calculate_content_length()
+    if size is not None:
+        metrics.response_size.observe(size, endpoint)
+
+    response.headers.add(
+        'Server-Timing',
+        f'app;dur={duration * 1000:.2f}, db;dur={db_duration * 1000:.2f};desc="{len(queries)} queries"'
+    )
+    return response
+
+
+def _token_cache_metrics():
+    token_cache = current_app.extensions.get('token_cache')
+    if token_cache is None:
+        return []
+    stats = token_cache.stats()
+    return (counter('auth_token_cache_hits_total', 'Bearer token cache hits.', stats['hits'])
+            + counter('auth_token_cache_misses_total', 'Bearer token cache misses.', stats['misses'])
+            + gauge('auth_token_cache_size', 'Bearer tokens in the cache.', stats['size']))
+
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return make_response({'data': 'Invalid metrics token.'}, 401)
+    return current_app.response_class(get_metrics().render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_metrics(app):
+    metrics = app.extensions['metrics'] = MetricsRegistry()
+    metrics.register_collector(_token_cache_metrics)
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    if app.config.get('METRICS_PATH'):
+        app.add_url_rule(app.config['METRICS_PATH'], 'metrics', metrics_view)
@@ -0,0 +1,130 @@
+import base64
+from datetime import datetime
+import json
+
+from sqlalchemy import func, select, text
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _encode(values):
+    raw = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def encode_cursor(dateadded, id, *rest):
+    """
+    Encodes the (dateadded, id) position of the last row on a page into an opaque,
+    url-safe token. Feeds merging several tables append integer tiebreakers in
+    `rest`.
+    """
+    return _encode([dateadded.isoformat(), id, *rest])
+
+
+def decode_cursor(cursor):
+    """
+    The inverse of `encode_cursor`. Raises InvalidCursor if the token was not
+    produced by it.
+    """
+    try:
+        dateadded, id, *rest = _decode(cursor)
+        return (datetime.fromisoformat(dateadded), int(id), *(int(value) for value in rest))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'invalid cursor: {cursor}') from e
+
+
+def encode_rank_cursor(rank, id):
+    """
+    Encodes the (rank, id) position of the last row on a page of results ordered
+    by a relevance score.
+    """
+    return _encode([rank, id])
+
+
+def decode_rank_cursor(cursor):
+    try:
+        rank, id = _decode(cursor)
+        return float(rank), int(id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'invalid cursor: {cursor}') from e
+
+
+def keyset_filter(date_column, id_column, cursor):
+    """
+    The WHERE clause selecting the rows after `cursor` when ordering by
+    (date_column DESC, id_column DESC). Written as an OR rather than a row-value
+    comparison so that SQLite can use the (dateadded, id) index for it.
+    """
+    dateadded, id, *rest = decode_cursor(cursor)
+    return (date_column < dateadded) | ((date_column == dateadded) & (id_column < id))
+
+
+def merged_keyset_filter(date_column, id_column, rank, cursor):
+    """
+    The keyset_filter of one stream of a feed merging several tables, ordered by
+    (dateadded DESC, rank DESC, id DESC). Each stream has a constant `rank`, and
+    the cursor is encoded as (dateadded, id, rank).
+    """
+    try:
+        dateadded, id, cursor_rank = decode_cursor(cursor)
+    except ValueError as e:
+        raise InvalidCursor(f'invalid cursor: {cursor}') from e
+    if rank < cursor_rank:
+        return date_column <= dateadded
+    if rank > cursor_rank:
+        return date_column < dateadded
+    return keyset_filter(date_column, id_column, cursor)
+
+
+def keyset_select(statement, date_column, id_column, cursor, per_page):
+    """
+    Limits a query or select() to the page after `cursor`, newest first. It
+    fetches one row more than `per_page` to find out whether another page
+    follows, see `split_page`.
+    """
+    statement = statement.order_by(date_column.desc(), id_column.desc())
+    if cursor:
+        statement = statement.where(keyset_filter(date_column, id_column, cursor))
+    return statement.limit(per_page + 1)
+
+
+def split_page(rows, per_page):
+    """
+    Returns the rows fetched by a `keyset_select` statement along with the cursor
+    of the next page, or None on the last one.
+    """
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    return rows, encode_cursor(rows[-1].dateadded, rows[-1].id)
+
+
+def keyset_page(query, date_column, id_column, cursor, per_page):
+    """
+    Applies keyset pagination to `query`, newest first, and returns the rows of the
+    page after `cursor` (the first page if it is empty) along with the cursor of
+    the next page, or None on the last one.
+    """
+    rows = keyset_select(query, date_column, id_column, cursor, per_page).all()
+    return split_page(rows, per_page)
+
+
+def approximate_row_count(session, table):
+    """
+    A cheap estimate of the number of rows in `table`: the planner statistics on
+    Postgres, and the largest primary key elsewhere (an upper bound that is read
+    straight off the primary key index).
+    """
+    if session.get_bind().dialect.name == 'postgresql':
+        return int(session.execute(
+            text('SELECT reltuples FROM pg_class WHERE relname = :name'),
+            {'name': table.name}
+        ).scalar() or 0)
+    return session.execute(select(func.max(table.c.id))).scalar() or 0
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class HashingOverloaded(Exception):
+    pass
+
+
+class PasswordHasher:
+    """
+    Runs password hashing on a bounded pool of `workers` threads, so that a burst
+    of logins or registrations occupies at most that many cores and leaves the rest
+    to other endpoints. hashlib releases the GIL while it hashes. At most
+    `max_pending` hashes may be queued or running; past that HashingOverloaded is
+    raised instead of queueing more work.
+    """
+
+    def __init__(self, workers, max_pending):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = BoundedSemaphore(max_pending)
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingOverloaded('Too many password hashes pending, try again later.')
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def init_password_hasher(app):
+    workers = app.config.get('PASSWORD_HASH_WORKERS')
+    if workers:
+        app.extensions['password_hasher'] = PasswordHasher(
+            workers=workers,
+            max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING') or workers * 8
+        )
+
+
+def _run(fn, *args):
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        return fn(*args)
+    return hasher.run(fn, *args)
+
+
+def _configured_method():
+    """
+    PASSWORD_HASH_METHOD with werkzeug's implicit PBKDF2 iteration count spelled
+    out, as it appears at the start of a stored hash.
+    """
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    if method.startswith('pbkdf2:') and method.count(':') == 1:
+        method = f'{method}:{DEFAULT_PBKDF2_ITERATIONS}'
+    return method
+
+
+def hash_password(password):
+    return _run(
+        generate_password_hash,
+        password,
+        current_app.config['PASSWORD_HASH_METHOD'],
+        current_app.config['PASSWORD_SALT_LENGTH']
+    )
+
+
+def check_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """
+    True if `password_hash` was made with a different method, cost or salt length
+    than the ones currently configured.
+    """
+    if password_hash.count('$') < 2:
+        return True
+    method, salt, hashval = password_hash.split('$', 2)
+    return method != _configured_method() or len(salt) != current_app.config['PASSWORD_SALT_LENGTH']
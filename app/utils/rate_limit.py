@@ -0,0 +1,162 @@
+"""
+Token-bucket rate limiting of write endpoints.
+
+Each client gets one bucket per limit named in RATE_LIMITS, holding up to
+`requests` tokens and refilled at `requests / seconds` tokens per second. A
+request takes a token, or is answered with 429 and a Retry-After header when
+the bucket is empty. Clients are users when the request carries a valid
+bearer token, and addresses otherwise.
+
+Buckets live in a pluggable RATE_LIMIT_BACKEND. The in-process default keeps
+three floats per bucket and drops a bucket once it would have refilled, since a
+full bucket and a missing one behave the same; with several workers each one
+limits on its own, and a shared backend implements `take` with an atomic
+script in its store.
+"""
+from collections import OrderedDict
+from functools import wraps
+import math
+from threading import Lock
+import time
+
+from flask import current_app, make_response, request
+from werkzeug.utils import import_string
+
+from ..models import User
+from .metrics import counter
+
+
+class RateLimitBackend:
+    """
+    The interface the rate limiter needs from a store.
+    """
+
+    def take(self, key, capacity, rate):
+        """
+        Takes a token from bucket `key`, which holds up to `capacity` tokens and
+        refills at `rate` tokens per second, and returns 0 if there was one, or
+        else the number of seconds until there will be.
+        """
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    In-process buckets, at most `maxsize` of them. Past that the least recently
+    used are forgotten, which refills them early.
+    """
+
+    def __init__(self, maxsize=100000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        # key -> (tokens, updated, full_at)
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def take(self, key, capacity, rate):
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            if bucket is None:
+                tokens = capacity
+            else:
+                tokens, updated, full_at = bucket
+                tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            self._prune(now)
+            return wait
+
+    def _prune(self, now):
+        # buckets are ordered by last use, so the ones at the front are the
+        # likeliest to have refilled
+        while self._buckets:
+            key, (tokens, updated, full_at) = next(iter(self._buckets.items()))
+            if full_at > now and len(self._buckets) <= self.maxsize:
+                break
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RateLimiter:
+    def __init__(self, backend, limits):
+        self.backend = backend
+        # name -> (capacity, refill rate per second)
+        self.limits = {name: (requests, requests / seconds) for name, (requests, seconds) in limits.items()}
+        self.rejected = 0
+
+    def check(self, name, client):
+        """
+        Returns 0 if `client` may make a request counted against limit `name`,
+        or else the seconds to wait.
+        """
+        if name not in self.limits:
+            return 0
+        capacity, rate = self.limits[name]
+        wait = self.backend.take(f'{name}:{client}', capacity, rate)
+        if wait:
+            self.rejected += 1
+        return wait
+
+
+def get_rate_limiter():
+    """
+    The current app's RateLimiter, or None if RATE_LIMITS is empty.
+    """
+    return current_app.extensions.get('rate_limiter')
+
+
+def client_key():
+    """
+    The user of the request's bearer token, or the remote address when there is
+    no valid one.
+    """
+    auth_token = request.headers.get('Authorization')
+    if auth_token:
+        try:
+            identity = User.get_identity_from_bearer_token(auth_token, claims_only=True)
+        except Exception:
+            identity = None
+        if identity is not None:
+            return f'user:{identity.id}'
+    return f'ip:{request.remote_addr}'
+
+
+def rate_limit(name):
+    """
+    Counts the decorated view against RATE_LIMITS[name].
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = get_rate_limiter()
+            if limiter is not None:
+                wait = limiter.check(name, client_key())
+                if wait:
+                    retry_after = math.ceil(wait)
+                    current_app.logger.info(f'[rate_limit] {name} limit reached, retry after {retry_after}s')
+                    response = make_response({'data': f'Too many requests, retry in {retry_after} seconds.'}, 429)
+                    response.headers['Retry-After'] = str(retry_after)
+                    return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_rate_limiter(app):
+    if not app.config.get('RATE_LIMITS'):
+        return
+    backend_class = import_string(app.config['RATE_LIMIT_BACKEND'])
+    limiter = app.extensions['rate_limiter'] = RateLimiter(
+        backend_class(**app.config.get('RATE_LIMIT_OPTIONS', {})),
+        app.config['RATE_LIMITS']
+    )
+    app.extensions['metrics'].register_collector(
+        lambda: counter('rate_limit_rejected_total', 'Requests answered with 429.', limiter.rejected)
+    )
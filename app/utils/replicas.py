@@ -0,0 +1,107 @@
+"""
+Read-replica routing.
+
+Replicas are ordinary Flask-SQLAlchemy binds listed in READ_REPLICA_BINDS.
+Views decorated with `read_only` pick one replica per request, round robin,
+and `RoutingSession` sends that request's queries to it. INSERT, UPDATE and
+DELETE statements and flushes always go to the primary.
+
+A client that has just written something is pinned to the primary for
+READ_REPLICA_PIN_SECONDS so it reads its own writes despite replication lag.
+Clients are told apart by their Authorization header, or their address when
+they have none, and pins are kept in-process, so with several workers the
+window is per worker.
+"""
+from collections import OrderedDict
+from functools import wraps
+from itertools import count
+from threading import Lock
+import time
+
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.expression import UpdateBase
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase) and has_app_context():
+            replica = g.get('_db_replica')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    def __init__(self, engines, pin_seconds, clock=time.monotonic):
+        self.engines = engines
+        self.pin_seconds = pin_seconds
+        self.clock = clock
+        self._next = count()
+        self._pins = OrderedDict()
+        self._lock = Lock()
+
+    def choose(self):
+        return self.engines[next(self._next) % len(self.engines)]
+
+    def pin(self, client):
+        now = self.clock()
+        with self._lock:
+            self._pins[client] = now + self.pin_seconds
+            self._pins.move_to_end(client)
+            # every pin lasts as long, so the oldest ones expire first
+            while self._pins:
+                oldest, until = next(iter(self._pins.items()))
+                if until > now:
+                    break
+                del self._pins[oldest]
+
+    def is_pinned(self, client):
+        with self._lock:
+            until = self._pins.get(client)
+        return until is not None and until > self.clock()
+
+
+def _client_key():
+    return request.headers.get('Authorization') or request.remote_addr
+
+
+def get_replica_router():
+    return current_app.extensions.get('replicas')
+
+
+def read_only(view):
+    """
+    Lets a view's queries run on a read replica, unless its client was pinned
+    to the primary by a recent write.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        router = get_replica_router()
+        if router is None or router.is_pinned(_client_key()):
+            return view(*args, **kwargs)
+        g._db_replica = router.choose()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.pop('_db_replica', None)
+    return wrapper
+
+
+def _pin_writers(response):
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        get_replica_router().pin(_client_key())
+    return response
+
+
+def init_replicas(app):
+    bind_keys = app.config['READ_REPLICA_BINDS']
+    if not bind_keys:
+        return
+    with app.app_context():
+        engines = [app.extensions['sqlalchemy'].engines[key] for key in bind_keys]
+    app.extensions['replicas'] = ReplicaRouter(engines, app.config['READ_REPLICA_PIN_SECONDS'])
+    app.after_request(_pin_writers)
@@ -0,0 +1,64 @@
+"""
+Request body parsing and validation.
+
+Bodies larger than REQUEST_MAX_BYTES (or the limit a view sets with
+`body_limit`) are answered with 413 before the view runs, going by their
+Content-Length, so they are never read. `load_body` then decodes the JSON body
+and loads it with a schema instance created once per module, which validates
+and converts it in a single pass. Invalid JSON and invalid data both raise
+marshmallow's ValidationError.
+"""
+from flask import current_app, request
+from marshmallow import ValidationError
+
+
+def body_limit(config_key):
+    """
+    Sets the config key holding the largest body, in bytes, a view accepts.
+    """
+    def decorator(view):
+        view.body_limit = config_key
+        return view
+    return decorator
+
+
+def _max_body_bytes():
+    view = current_app.view_functions.get(request.endpoint)
+    return current_app.config[getattr(view, 'body_limit', 'REQUEST_MAX_BYTES')]
+
+
+def reject_oversized_body():
+    limit = _max_body_bytes()
+    if limit is not None and request.content_length is not None and request.content_length > limit:
+        current_app.logger.info(f'[request] {request.content_length} byte body over the {limit} byte limit')
+        return current_app.response_class(
+            current_app.json.dumps({'data': f'Request bodies are limited to {limit} bytes.'}),
+            status=413, mimetype='application/json')
+
+
+def read_json():
+    """
+    Returns the decoded JSON body, or an empty dict for an empty body.
+    """
+    data = request.get_data()
+    if not data:
+        return {}
+    try:
+        return current_app.json.loads(data)
+    except ValueError:
+        raise ValidationError({'_schema': ['Invalid JSON.']})
+
+
+def load_body(schema, **extra):
+    """
+    Decodes the JSON body, adds `extra` (e.g. the auth token from the headers)
+    and returns it loaded by `schema`.
+    """
+    data = read_json()
+    if extra and isinstance(data, dict):
+        data.update(extra)
+    return schema.load(data)
+
+
+def init_request_parsing(app):
+    app.before_request(reject_oversized_body)
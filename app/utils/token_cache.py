@@ -0,0 +1,97 @@
+from collections import OrderedDict, namedtuple
+from threading import Lock
+import time
+
+from flask import current_app
+
+
+# what authenticated endpoints need to know about the caller, without a User row
+AuthIdentity = namedtuple('AuthIdentity', ['id', 'email'])
+
+
+class TokenCache:
+    """
+    A bounded LRU cache of verified bearer tokens. Each entry holds the decoded
+    claims and the AuthIdentity of the token's user, and is dropped once the
+    token's `exp` has passed.
+    """
+
+    def __init__(self, maxsize=10000, clock=time.time):
+        self.maxsize = maxsize
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._tokens_by_user = {}
+        self._lock = Lock()
+
+    def get(self, token):
+        """
+        Returns (claims, identity) for a cached token that has not expired, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            claims, identity = entry
+            if claims['exp'] <= self.clock():
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry
+
+    def set(self, token, claims, identity):
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (claims, identity)
+            self._tokens_by_user.setdefault(identity.id, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        """
+        Drops every cached token of `user_id`, e.g. when the user is deleted.
+        """
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, token):
+        claims, identity = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(identity.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[identity.id]
+
+
+def get_token_cache():
+    """
+    The current app's TokenCache, or None if TOKEN_CACHE_SIZE disables it.
+    """
+    return current_app.extensions.get('token_cache')
+
+
+def init_token_cache(app):
+    if app.config.get('TOKEN_CACHE_SIZE'):
+        app.extensions['token_cache'] = TokenCache(maxsize=app.config['TOKEN_CACHE_SIZE'])
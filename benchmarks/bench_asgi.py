@@ -0,0 +1,149 @@
+"""
+Concurrent feed reads served by the Flask app, one thread per in-flight
+request as under a threaded WSGI server, versus the coroutines of the ASGI
+mode (app/asgi.py). Reports throughput at each concurrency and the Python heap
+allocated per in-flight request (thread stacks come on top for the WSGI mode).
+
+    python -m benchmarks.bench_asgi [num_tweets] [requests_per_level]
+
+Needs the optional packages asgiref and aiosqlite.
+"""
+import asyncio
+from datetime import datetime, timedelta
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from app.models import Tweet, User, db
+
+from .common import make_app, register_file_config
+
+
+PATH = '/api/v1/tweets/'
+QUERY_STRING = 'cursor='
+CONCURRENCY = (8, 64, 256)
+
+
+def seed(num_tweets):
+    db.session.execute(User.__table__.insert(), [{'id': 1, 'email': 'bench@example.com', 'num_followers': 0}])
+    start = datetime(2020, 1, 1)
+    db.session.execute(Tweet.__table__.insert(), [{
+        'user_id': 1,
+        'body': f'benchmark tweet number {i}',
+        'dateadded': start + timedelta(seconds=i),
+        'num_likes': 0,
+        'num_replies': 0,
+        'num_retweets': 0,
+    } for i in range(num_tweets)])
+    db.session.commit()
+
+
+def run_threads(app, concurrency, total):
+    """
+    Makes `total` requests from `concurrency` threads and returns the elapsed time.
+    """
+    per_thread = total // concurrency
+    barrier = threading.Barrier(concurrency + 1)
+
+    def worker():
+        client = app.test_client()
+        barrier.wait()
+        for _ in range(per_thread):
+            assert client.get(f'{PATH}?{QUERY_STRING}').status_code == 200
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+async def asgi_get(application):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': PATH, 'raw_path': PATH.encode(), 'root_path': '',
+        'query_string': QUERY_STRING.encode(), 'server': ('bench', 80), 'client': ('127.0.0.1', 1),
+        'headers': [],
+    }
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    assert status == [200]
+
+
+async def run_coroutines(application, concurrency, total):
+    per_task = total // concurrency
+
+    async def worker():
+        for _ in range(per_task):
+            await asgi_get(application)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+def heap_per_request(run, concurrency):
+    """
+    The peak Python heap growth while `concurrency` requests run at once,
+    divided by `concurrency`.
+    """
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    run(concurrency, concurrency)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (peak - baseline) / concurrency
+
+
+def main(num_tweets=10000, total=2048):
+    from app.asgi import AsyncAPI
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        # the cache would answer every request without touching the database
+        app = make_app(register_file_config(
+            os.path.join(tmpdir, 'bench.sqlite'), WORKER_THREADS=max(CONCURRENCY), FEED_CACHE_TTL=0))
+        seed(num_tweets)
+        db.session.remove()
+        asgi = AsyncAPI(app)
+        loop = asyncio.new_event_loop()
+
+        def threads(concurrency, requests):
+            return run_threads(app, concurrency, requests)
+
+        def coroutines(concurrency, requests):
+            return loop.run_until_complete(run_coroutines(asgi, concurrency, requests))
+
+        print(f'GET {PATH}?{QUERY_STRING}, {total} requests per level')
+        for label, run in [('WSGI, thread per request', threads), ('ASGI coroutines', coroutines)]:
+            run(8, 64)  # warm up pools and caches
+            print(f'  {label}')
+            for concurrency in CONCURRENCY:
+                elapsed = run(concurrency, total)
+                memory = heap_per_request(run, concurrency)
+                print(f'    {concurrency:4} in flight  {total / elapsed:8.1f} req/s  '
+                      f'{memory / 1024:8.1f} KiB heap per in-flight request')
+        loop.run_until_complete(asgi.engine.dispose())
+        loop.close()
+        db.engine.dispose()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,72 @@
+"""
+Per-request bearer authentication cost: the verified-token cache, full
+verification (signature + SELECT of the user), and claims-only verification
+(signature alone) for HS256 and the asymmetric algorithms. Only the
+verification calls are timed, all inside one pushed request context.
+"""
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from app.models import User, db
+from app.utils.common import TokenGenerator, TokenKeys
+
+from .common import make_app, measure, print_table
+
+
+def pem_keys(private_key):
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private_pem, public_pem
+
+
+def main():
+    app = make_app()
+    user = User(email='bench@example.com', password='benchmark')
+    db.session.add(user)
+    db.session.commit()
+    token_cache = app.extensions.pop('token_cache')
+    hmac_keys = app.extensions['token_keys']
+    algorithms = [
+        ('ES256', ec.generate_private_key(ec.SECP256R1())),
+        ('EdDSA', ed25519.Ed25519PrivateKey.generate()),
+        ('RS256', rsa.generate_private_key(public_exponent=65537, key_size=2048)),
+    ]
+
+    def use_keys(keys):
+        app.extensions['token_keys'] = keys
+        return f'Bearer {TokenGenerator.encode_token(user)}'
+
+    def authenticate(bearer, claims_only):
+        return lambda: User.get_identity_from_bearer_token(bearer, claims_only=claims_only)
+
+    app.config['AUTH_CLAIMS_ONLY'] = True
+    bearer = use_keys(hmac_keys)
+    with app.test_request_context():
+        rows = [
+            ('HS256, jwt.decode + SELECT', measure(authenticate(bearer, False))),
+            ('HS256, claims only', measure(authenticate(bearer, True))),
+        ]
+        signing = [('HS256', measure(lambda: TokenGenerator.encode_token(user), iterations=200))]
+        for algorithm, private_key in algorithms:
+            private_pem, public_pem = pem_keys(private_key)
+            bearer = use_keys(TokenKeys.from_config({
+                'JWT_ALGORITHM': algorithm, 'JWT_PRIVATE_KEY': private_pem, 'JWT_PUBLIC_KEY': public_pem,
+                'JWT_EXPIRES_IN': hmac_keys.expires_in,
+            }))
+            rows.append((f'{algorithm}, claims only', measure(authenticate(bearer, True))))
+            signing.append((algorithm, measure(lambda: TokenGenerator.encode_token(user), iterations=200)))
+
+        bearer = use_keys(hmac_keys)
+        app.extensions['token_cache'] = token_cache
+        rows.append(('token cache hit', measure(authenticate(bearer, False))))
+
+    print_table('bearer token authentication', rows)
+    print_table('token issuance at login', signing)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Tweets/sec through POST /tweet/ one at a time versus POST /tweets/bulk/.
+"""
+import sys
+import time
+
+from app.models import Tweet, User, db
+from app.utils.common import TokenGenerator
+
+from .common import make_app
+
+
+def main(num_tweets=2000):
+    app = make_app()
+    user = User(email='bench@example.com', password='benchmark')
+    db.session.add(user)
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {TokenGenerator.encode_token(user)}'}
+    client = app.test_client()
+    items = [{'body': f'benchmark tweet number {i}'} for i in range(num_tweets)]
+
+    start = time.perf_counter()
+    for item in items:
+        client.post('/api/v1/tweet/', json=item, headers=headers)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    client.post('/api/v1/tweets/bulk/', json=items, headers=headers)
+    bulk = time.perf_counter() - start
+
+    assert Tweet.query.count() == 2 * num_tweets
+    print(f'inserting {num_tweets} tweets')
+    print(f'  single POST /tweet/      {num_tweets / single:10.0f} tweets/sec')
+    print(f'  POST /tweets/bulk/       {num_tweets / bulk:10.0f} tweets/sec  {single / bulk:6.1f}x')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
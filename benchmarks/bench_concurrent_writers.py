@@ -0,0 +1,87 @@
+"""
+Throughput of a file-backed SQLite database under concurrent writers and
+readers, with SQLite's default rollback journal versus the SQLITE_PRAGMAS
+defaults (WAL, synchronous=NORMAL, busy_timeout).
+
+    python -m benchmarks.bench_concurrent_writers [writers] [readers] [seconds]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from app.models import Tweet, User, db
+from app.utils.common import TokenGenerator
+from config import config, TestingConfig
+
+from .common import make_app, register_file_config, summarize
+
+
+def run(config_name, writers, readers, seconds):
+    app = make_app(config_name)
+    user = User(email='bench@example.com', password='benchmark')
+    db.session.add(user)
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {TokenGenerator.encode_token(user)}'}
+    db.session.add_all(Tweet(user_id=user.id, body=f'seed tweet {i}') for i in range(200))
+    db.session.commit()
+    db.session.remove()
+
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+    results = {'writes': [], 'reads': [], 'errors': 0}
+
+    def client_loop(write):
+        client = app.test_client()
+        latencies = []
+        errors = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            if write:
+                response = client.post('/api/v1/tweet/', json={'body': 'concurrent write'}, headers=headers)
+            else:
+                response = client.get('/api/v1/tweets/?cursor=')
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+        with lock:
+            results['writes' if write else 'reads'].extend(latencies)
+            results['errors'] += errors
+
+    threads = [threading.Thread(target=client_loop, args=(True,)) for _ in range(writers)]
+    threads += [threading.Thread(target=client_loop, args=(False,)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db.session.remove()
+    db.engine.dispose()
+    return results
+
+
+def main(writers=8, readers=8, seconds=5.0):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for label, pragmas in [('rollback journal, no pragmas', {}),
+                               ('SQLITE_PRAGMAS (WAL)', TestingConfig.SQLITE_PRAGMAS)]:
+            path = os.path.join(tmpdir, f'bench-{len(pragmas)}.sqlite')
+            config_name = register_file_config(
+                path, SQLITE_PRAGMAS=pragmas, WORKER_THREADS=writers + readers, FEED_CACHE_TTL=0)
+            results = run(config_name, writers, readers, seconds)
+            print(f'{label} ({writers} writers, {readers} readers, {seconds:.0f}s)')
+            for kind in ('writes', 'reads'):
+                stats = summarize(results[kind])
+                print(f'  {kind:<7} {len(results[kind]) / seconds:8.1f}/s  '
+                      + '  '.join(f'{name} {value * 1000:7.1f}ms' for name, value in stats.items()))
+            print(f'  failed requests: {results["errors"]}')
+    finally:
+        config.pop('bench', None)
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(*(int(arg) for arg in args[:2]), *(float(arg) for arg in args[2:3]))
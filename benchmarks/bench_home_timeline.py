@@ -0,0 +1,70 @@
+"""
+Home timeline read latency: materialized by fan-out on write versus merged
+from every followee at read time.
+
+    python -m benchmarks.bench_home_timeline [num_users] [follows_per_user] [num_tweets]
+"""
+from datetime import datetime, timedelta
+import random
+import sys
+
+from app.models import Follow, Tweet, User, db
+from app.timeline import home_timeline_entries
+
+from .common import make_app, measure
+
+
+def seed(num_users, follows_per_user, num_tweets):
+    db.session.execute(User.__table__.insert(), [
+        {'id': id, 'email': f'user{id}@example.com', 'num_followers': 0} for id in range(1, num_users + 1)
+    ])
+    follows = set()
+    for follower_id in range(1, num_users + 1):
+        for followee_id in random.sample(range(1, num_users + 1), follows_per_user):
+            if followee_id != follower_id:
+                follows.add((follower_id, followee_id))
+    db.session.execute(Follow.__table__.insert(), [
+        {'follower_id': follower_id, 'followee_id': followee_id} for follower_id, followee_id in follows
+    ])
+    db.session.execute(
+        db.update(User).values(num_followers=db.select(db.func.count(Follow.id))
+                               .where(Follow.followee_id == User.id).scalar_subquery())
+    )
+    start = datetime(2020, 1, 1)
+    db.session.execute(Tweet.__table__.insert(), [{
+        'user_id': random.randint(1, num_users),
+        'body': f'benchmark tweet number {i}',
+        'dateadded': start + timedelta(seconds=i),
+        'num_likes': 0,
+        'num_replies': 0,
+    } for i in range(num_tweets)])
+    db.session.commit()
+
+
+def main(num_users=5000, follows_per_user=200, num_tweets=500000):
+    app = make_app()
+    print(f'seeding {num_users} users following {follows_per_user} each, {num_tweets} tweets...')
+    seed(num_users, follows_per_user, num_tweets)
+    per_page = 50
+    readers = random.sample(range(1, num_users + 1), min(200, num_users))
+
+    def read_pages():
+        for user_id in readers:
+            home_timeline_entries(user_id, None, per_page)
+
+    app.config['FANOUT_MAX_FOLLOWERS'] = num_users
+    read_pages()  # materialize the stored timelines
+    on_write = measure(read_pages, iterations=1, repeat=3) / len(readers)
+
+    app.config['FANOUT_MAX_FOLLOWERS'] = -1
+    app.extensions['timeline_store'] = type(app.extensions['timeline_store'])(app.config['TIMELINE_LENGTH'])
+    read_pages()
+    on_read = measure(read_pages, iterations=1, repeat=3) / len(readers)
+
+    print('home timeline first page')
+    print(f'  fan-out on write (stored)   {on_write * 1e3:8.3f} ms')
+    print(f'  fan-out on read (merged)    {on_read * 1e3:8.3f} ms  {on_read / on_write:6.1f}x slower')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
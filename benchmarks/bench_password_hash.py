@@ -0,0 +1,69 @@
+"""
+Cost of the configurable password hash methods, and the latency of a cheap
+endpoint while a login storm hashes inline versus on a bounded worker pool.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+
+from app.models import User, db
+from app.utils.passwords import PasswordHasher, check_password, hash_password
+
+from .common import make_app, measure, print_table, summarize
+
+
+METHODS = ['pbkdf2:sha256:1000', 'pbkdf2:sha256:260000', 'pbkdf2:sha256:600000', 'scrypt:32768:8:1']
+STORM_THREADS = 2 * (os.cpu_count() or 1)
+
+
+def _feed_latency_during_storm(app, user):
+    stop = threading.Event()
+
+    def storm():
+        with app.app_context():
+            while not stop.is_set():
+                check_password(user.password_hash, 'benchmark')
+
+    samples = []
+    client = app.test_client()
+    with ThreadPoolExecutor(STORM_THREADS) as executor:
+        for _ in range(STORM_THREADS):
+            executor.submit(storm)
+        time.sleep(0.2)
+        for _ in range(100):
+            start = time.perf_counter()
+            client.get('/api/v1/tweets/')
+            samples.append(time.perf_counter() - start)
+        stop.set()
+    return summarize(samples)
+
+
+def main():
+    app = make_app()
+    rows = []
+    for method in METHODS:
+        app.config['PASSWORD_HASH_METHOD'] = method
+        try:
+            rows.append((method, measure(lambda: hash_password('benchmark'), iterations=3, repeat=3)))
+        except ValueError:
+            continue
+    print_table('hash cost per method', rows)
+
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:260000'
+    user = User(email='bench@example.com', password='benchmark')
+    db.session.add(user)
+    db.session.commit()
+
+    print(f'GET /tweets/ latency with {STORM_THREADS} threads verifying passwords')
+    inline = _feed_latency_during_storm(app, user)
+    hasher = PasswordHasher(workers=max(1, (os.cpu_count() or 2) // 2), max_pending=10**6)
+    app.extensions['password_hasher'] = hasher
+    pooled = _feed_latency_during_storm(app, user)
+    hasher.shutdown()
+    for label, stats in [('inline', inline), ('worker pool', pooled)]:
+        print(f'  {label:<12} ' + '  '.join(f'{k}={v * 1e3:.2f}ms' for k, v in stats.items()))
+
+
+if __name__ == '__main__':
+    main()
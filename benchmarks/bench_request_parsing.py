@@ -0,0 +1,44 @@
+"""
+Per-request cost of parsing and validating a tweet body: a fresh schema and
+stdlib json per request versus the shared schema and load_body.
+"""
+import json
+
+from flask import request
+
+from app.api.tweet import tweet_schema
+from app.tweet_validation import TweetInput
+from app.utils.request_parsing import load_body
+
+from .common import make_app, measure, print_table
+
+
+def main():
+    app = make_app()
+    body = json.dumps({'body': 'a tweet of a typical length, with a reply parent', 'parent_id': 42})
+    headers = {'Content-Type': 'application/json'}
+
+    def per_request_schema():
+        with app.test_request_context('/api/v1/tweet/', method='POST', data=body, headers=headers):
+            input_data = json.loads(request.data)
+            input_data['auth_token'] = 'Bearer token'
+            errors = TweetInput().validate(input_data)
+            assert not errors
+
+    def shared_schema():
+        with app.test_request_context('/api/v1/tweet/', method='POST', data=body, headers=headers):
+            load_body(tweet_schema, auth_token='Bearer token')
+
+    def empty_request():
+        with app.test_request_context('/api/v1/tweet/', method='POST', data=body, headers=headers):
+            pass
+
+    overhead = measure(empty_request)
+    print_table('parse + validate a tweet body (request context overhead subtracted)', [
+        ('TweetInput() + json.loads + validate', measure(per_request_schema) - overhead),
+        ('shared schema, load_body', measure(shared_schema) - overhead),
+    ])
+
+
+if __name__ == '__main__':
+    main()
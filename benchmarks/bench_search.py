@@ -0,0 +1,59 @@
+"""
+Full-text search latency through the FTS index versus a LIKE scan.
+
+    python -m benchmarks.bench_search [num_tweets]
+"""
+import random
+import sys
+import time
+
+from app.models import Tweet, db
+from app.search import get_search_index
+
+from .common import make_app, measure
+
+
+VOCABULARY = [f'word{i}' for i in range(20000)]
+
+
+def seed(num_tweets, batch_size=50000):
+    random.seed(0)
+    for low in range(0, num_tweets, batch_size):
+        db.session.execute(Tweet.__table__.insert(), [{
+            'user_id': 1,
+            'body': ' '.join(random.choices(VOCABULARY, k=12)),
+            'num_likes': 0,
+            'num_replies': 0,
+            'num_retweets': 0,
+        } for i in range(low, min(low + batch_size, num_tweets))])
+    db.session.commit()
+
+
+def main(num_tweets=1000000):
+    make_app()
+    print(f'seeding {num_tweets} tweets...')
+    seed(num_tweets)
+    start = time.perf_counter()
+    get_search_index().rebuild()
+    print(f'rebuilt the index in {time.perf_counter() - start:.1f}s')
+
+    search_index = get_search_index()
+    terms = random.sample(VOCABULARY, 50)
+
+    def fts():
+        for term in terms:
+            search_index.search(term, None, 50)
+
+    def like():
+        for term in terms:
+            Tweet.query.filter(Tweet.body.like(f'%{term} %')).limit(50).all()
+
+    indexed = measure(fts, iterations=1, repeat=3) / len(terms)
+    scanned = measure(like, iterations=1, repeat=1) / len(terms)
+    print('first page of results for a single term')
+    print(f'  FTS index (ranked)   {indexed * 1e3:10.3f} ms')
+    print(f'  LIKE scan (unranked) {scanned * 1e3:10.3f} ms  {scanned / indexed:6.1f}x slower')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,43 @@
+"""
+Time to encode a 50-tweet feed page with Flask's default JSON provider, the
+stdlib path of FastJSONProvider and its orjson path.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+from app.models import Tweet, User, db
+from app.utils.json_provider import FastJSONProvider, orjson
+
+from .common import make_app, measure, print_table
+
+
+def main(per_page=50):
+    app = make_app()
+    app.debug = False
+    user = User(email='bench@example.com', password='benchmark')
+    db.session.add(user)
+    db.session.commit()
+    for i in range(per_page):
+        db.session.add(Tweet(user_id=user.id, body=f'benchmark tweet number {i} ' * 4))
+    db.session.commit()
+    page = {
+        'tweets': Tweet.bulk_json(Tweet.query.limit(per_page)),
+        'prev': None,
+        'next': '/api/v1/tweets/?page=2',
+        'count': 1000000
+    }
+
+    providers = [('flask DefaultJSONProvider', DefaultJSONProvider(app))]
+    stdlib = FastJSONProvider(app)
+    stdlib.use_orjson = False
+    providers.append(('FastJSONProvider (stdlib)', stdlib))
+    if orjson is not None:
+        providers.append(('FastJSONProvider (orjson)', FastJSONProvider(app)))
+
+    rows = []
+    for label, provider in providers:
+        rows.append((label, measure(lambda: provider.response(page).get_data())))
+    print_table(f'encoding a {per_page}-tweet page', rows)
+
+
+if __name__ == '__main__':
+    main()
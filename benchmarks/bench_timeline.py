@@ -0,0 +1,76 @@
+"""
+Query plan and latency of the per-user timeline, with and without the
+(user_id, dateadded DESC, id DESC) index.
+
+    python -m benchmarks.bench_timeline [num_tweets] [num_users]
+"""
+from datetime import datetime, timedelta
+import random
+import sys
+
+from sqlalchemy import text
+
+from app.api.user import user_timeline_query
+from app.models import Tweet, User, db
+from app.utils.pagination import keyset_page
+
+from .common import make_app, measure
+
+
+INDEX_NAME = 'ix_tweet__user_id__dateadded'
+
+
+def seed(num_tweets, num_users, batch_size=50000):
+    db.session.execute(User.__table__.insert(), [
+        {'id': id, 'email': f'user{id}@example.com'} for id in range(1, num_users + 1)
+    ])
+    start = datetime(2020, 1, 1)
+    for low in range(0, num_tweets, batch_size):
+        db.session.execute(Tweet.__table__.insert(), [{
+            'user_id': random.randint(1, num_users),
+            'body': f'benchmark tweet number {i}',
+            'dateadded': start + timedelta(seconds=i),
+            'num_likes': 0,
+            'num_replies': 0,
+        } for i in range(low, min(low + batch_size, num_tweets))])
+    db.session.commit()
+
+
+def explain(user_id):
+    statement = user_timeline_query(user_id).order_by(
+        Tweet.dateadded.desc(), Tweet.id.desc()
+    ).limit(51).statement
+    compiled = statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    prefix = 'EXPLAIN QUERY PLAN' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN'
+    return [' '.join(map(str, row)) for row in db.session.execute(text(f'{prefix} {compiled}'))]
+
+
+def time_pages(num_users, per_page=50):
+    def first_and_second_page():
+        user_id = random.randint(1, num_users)
+        tweets, cursor = keyset_page(user_timeline_query(user_id), Tweet.dateadded, Tweet.id, None, per_page)
+        if cursor:
+            keyset_page(user_timeline_query(user_id), Tweet.dateadded, Tweet.id, cursor, per_page)
+    return measure(first_and_second_page, iterations=200, repeat=3) / 2
+
+
+def main(num_tweets=1000000, num_users=10000):
+    make_app()
+    print(f'seeding {num_tweets} tweets across {num_users} users...')
+    seed(num_tweets, num_users)
+
+    with_index = time_pages(num_users)
+    plan_with_index = explain(1)
+    db.session.execute(text(f'DROP INDEX {INDEX_NAME}'))
+    without_index = time_pages(num_users)
+    plan_without_index = explain(2)
+
+    for label, plan, seconds in [('with index', plan_with_index, with_index),
+                                 ('without index', plan_without_index, without_index)]:
+        print(f'{label}: {seconds * 1e3:.3f} ms/page')
+        for line in plan:
+            print(f'    {line}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,78 @@
+"""
+Helpers shared by the benchmark scripts. Run a benchmark from the repository
+root, e.g. `python -m benchmarks.bench_auth`.
+"""
+import logging
+import statistics
+import time
+
+from app import create_app, db
+from config import config, TestingConfig
+
+
+def make_app(config_name='testing'):
+    """
+    Creates an app with a fresh schema and pushes its app context.
+    """
+    app = create_app(config_name)
+    # per-request INFO logging would dominate the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    app.logger.setLevel(logging.WARNING)
+    app.app_context().push()
+    db.create_all()
+    return app
+
+
+def register_file_config(path, name='bench', base=TestingConfig, **overrides):
+    """
+    Registers a config named `name`, derived from `base`, that keeps its
+    database in the SQLite file at `path`, for benchmarks that need several
+    connections, and returns the name to pass to `make_app`.
+    """
+    config[name] = type('BenchConfig', (base,), {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path,
+        'SLOW_QUERY_THRESHOLD': None,
+        **overrides
+    })
+    return name
+
+
+def measure(fn, iterations=1000, repeat=5):
+    """
+    Calls `fn` `iterations` times, `repeat` times over, and returns the best
+    per-call time in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        timings.append((time.perf_counter() - start) / iterations)
+    return min(timings)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        'mean': statistics.fmean(samples) if samples else 0.0,
+        'p50': percentile(samples, 50),
+        'p95': percentile(samples, 95),
+        'p99': percentile(samples, 99),
+    }
+
+
+def print_table(title, rows):
+    """
+    Prints (label, seconds) rows as microseconds per call, relative to the first row.
+    """
+    print(title)
+    baseline = rows[0][1]
+    for label, seconds in rows:
+        print(f'  {label:<32} {seconds * 1e6:10.1f} us/call  {baseline / seconds:6.2f}x')
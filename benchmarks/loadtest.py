@@ -0,0 +1,310 @@
+"""
+Load test of the main API endpoints.
+
+Seeds a SQLite file with users, tweets arranged in reply trees and likes
+through bulk inserts, then drives each scenario with concurrent clients for a
+fixed time, either in-process through the Flask test client or over HTTP
+against a threaded werkzeug server, and reports throughput and p50/p95/p99
+latency per scenario.
+
+    python -m benchmarks.loadtest --clients 8 --duration 5 --output results.json
+    python -m benchmarks.loadtest --baseline results.json
+
+The app runs with ProductionConfig, so that password hashing, page sizes and
+debug settings are those of a deployment; only the database, the pool size
+and the rate limits (a handful of clients would exhaust them in a second) are
+overridden.
+
+With --baseline, scenarios whose throughput dropped or whose p95 grew by more
+than --tolerance are reported as regressions and the exit status is 1.
+"""
+import argparse
+from datetime import datetime, timedelta
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from app.models import Like, Tweet, User, db
+from app.utils.common import TokenGenerator
+from app.utils.passwords import hash_password
+
+from config import ProductionConfig
+
+from .common import make_app, register_file_config, summarize
+
+
+PASSWORD = 'loadtest password'
+SCENARIOS = ('feed', 'thread', 'login', 'create_tweet', 'like')
+MODES = ('inprocess', 'wsgi')
+
+
+def seed(num_users, num_tweets, reply_ratio, num_likes, reserved_users):
+    """
+    Inserts the dataset with one INSERT per table and counters that match it.
+    Returns the ids of the root tweets. The first `reserved_users` users have no
+    likes, so that the like scenario never likes a tweet twice.
+    """
+    password_hash = hash_password(PASSWORD)
+    db.session.execute(User.__table__.insert(), [
+        {'id': id, 'email': f'user{id}@example.com', 'password_hash': password_hash, 'num_followers': 0}
+        for id in range(1, num_users + 1)
+    ])
+
+    start = datetime(2020, 1, 1)
+    tweets = []
+    roots = []
+    num_replies = [0] * (num_tweets + 1)
+    for id in range(1, num_tweets + 1):
+        parent_id = None
+        if id > 1 and random.random() < reply_ratio:
+            parent_id = random.randint(max(1, id - 1000), id - 1)
+            num_replies[parent_id] += 1
+        else:
+            roots.append(id)
+        tweets.append({
+            'id': id,
+            'user_id': random.randint(1, num_users),
+            'body': f'load test tweet number {id}',
+            'dateadded': start + timedelta(seconds=id),
+            'parent_id': parent_id,
+        })
+    likes = set()
+    likers = range(reserved_users + 1, num_users + 1)
+    while likers and len(likes) < min(num_likes, len(likers) * num_tweets):
+        likes.add((random.choice(likers), random.randint(1, num_tweets)))
+    num_likes_by_tweet = [0] * (num_tweets + 1)
+    for user_id, tweet_id in likes:
+        num_likes_by_tweet[tweet_id] += 1
+    for tweet in tweets:
+        tweet.update(num_likes=num_likes_by_tweet[tweet['id']], num_replies=num_replies[tweet['id']],
+                     num_retweets=0)
+    db.session.execute(Tweet.__table__.insert(), tweets)
+    if likes:
+        db.session.execute(Like.__table__.insert(), [
+            {'user_id': user_id, 'tweet_id': tweet_id} for user_id, tweet_id in likes])
+    db.session.commit()
+    return roots
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        return self.client.open(path, method=method, json=body, headers=headers).status_code
+
+
+class HTTPClient:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        # the werkzeug server closes every connection after one response
+        connection = http.client.HTTPConnection(self.host, self.port)
+        try:
+            connection.request(method, path, data, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+
+def make_scenario(name, worker, users, roots, like_ids):
+    """
+    Returns a function that makes one request of scenario `name` as client
+    number `worker`, which acts as user `worker + 1` and likes the tweets of
+    `like_ids[worker]` in turn.
+    """
+    user = users[worker]
+    headers = {'Authorization': f'Bearer {TokenGenerator.encode_token(user)}'}
+    if name == 'feed':
+        return lambda client: client.request('GET', '/api/v1/tweets/?cursor=')
+    if name == 'thread':
+        return lambda client: client.request('GET', f'/api/v1/tweet/{random.choice(roots)}/thread/')
+    if name == 'login':
+        body = {'email': user.email, 'password': PASSWORD}
+        return lambda client: client.request('POST', '/api/v1/auth/login/', body)
+    if name == 'create_tweet':
+        body = {'body': f'load test tweet from {user.email}'}
+        return lambda client: client.request('POST', '/api/v1/tweet/', body, headers)
+    if name == 'like':
+        tweet_ids = like_ids[worker]
+        return lambda client: client.request('POST', '/api/v1/tweet/like/', {'tweet_id': next(tweet_ids)}, headers)
+    raise ValueError(f'unknown scenario {name}')
+
+
+def run_scenario(make_client, requests, duration, warmup):
+    """
+    Runs one thread per request function until `duration` seconds have passed
+    and returns the latencies of successful requests and the failure count.
+    """
+    start = threading.Barrier(len(requests) + 1)
+    lock = threading.Lock()
+    latencies = []
+    failures = [0]
+    deadline = [None]
+
+    def worker(make_request):
+        client = make_client()
+        for _ in range(warmup):
+            make_request(client)
+        start.wait()
+        samples = []
+        failed = 0
+        while time.perf_counter() < deadline[0]:
+            started = time.perf_counter()
+            try:
+                ok = make_request(client) < 400
+            except (OSError, StopIteration):
+                ok = False
+            if ok:
+                samples.append(time.perf_counter() - started)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(samples)
+            failures[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(make_request,)) for make_request in requests]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    start.wait()
+    for thread in threads:
+        thread.join()
+    return latencies, failures[0]
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints each result next to its baseline and returns the regressions.
+    """
+    previous = {(result['mode'], result['scenario']): result for result in baseline['results']}
+    regressions = []
+    print(f'compared with the baseline (tolerance {tolerance:.0%})')
+    for result in results:
+        key = (result['mode'], result['scenario'])
+        before = previous.get(key)
+        if before is None:
+            continue
+        throughput = result['throughput'] / before['throughput'] - 1 if before['throughput'] else 0.0
+        p95 = result['p95'] / before['p95'] - 1 if before['p95'] else 0.0
+        regressed = throughput < -tolerance or p95 > tolerance
+        if regressed:
+            regressions.append(key)
+        print(f'  {key[0]:<10} {key[1]:<13} throughput {throughput:+7.1%}  p95 {p95:+7.1%}'
+              + ('  REGRESSION' if regressed else ''))
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--tweets', type=int, default=20000)
+    parser.add_argument('--reply-ratio', type=float, default=0.3,
+                        help='share of tweets that reply to an earlier tweet')
+    parser.add_argument('--likes', type=int, default=50000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5, help='seconds per scenario')
+    parser.add_argument('--warmup', type=int, default=5, help='requests per client before measuring')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    modes = args.modes.split(',')
+    scenarios = args.scenarios.split(',')
+    if args.clients >= args.users:
+        sys.exit('--users must be larger than --clients')
+    random.seed(args.seed)
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        app = make_app(register_file_config(
+            os.path.join(tmpdir, 'loadtest.sqlite'), name='loadtest', base=ProductionConfig,
+            WORKER_THREADS=args.clients, RATE_LIMITS={}))
+        print(f'seeding {args.users} users, {args.tweets} tweets, {args.likes} likes...')
+        roots = seed(args.users, args.tweets, args.reply_ratio, args.likes, reserved_users=args.clients)
+        users = [db.session.get(User, id) for id in range(1, args.clients + 1)]
+        # shared by the modes, a tweet can only be liked once
+        like_ids = [iter(range(1, args.tweets + 1)) for _ in range(args.clients)]
+        db.session.remove()
+
+        results = []
+        for mode in modes:
+            server = None
+            if mode == 'inprocess':
+                make_client = lambda: InProcessClient(app)
+            elif mode == 'wsgi':
+                logging.getLogger('werkzeug').setLevel(logging.WARNING)
+                server = make_server('127.0.0.1', 0, app, threaded=True)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                make_client = lambda: HTTPClient('127.0.0.1', server.server_port)
+            else:
+                sys.exit(f'unknown mode {mode}')
+            try:
+                for scenario in scenarios:
+                    requests = [make_scenario(scenario, worker, users, roots, like_ids)
+                                for worker in range(args.clients)]
+                    latencies, failures = run_scenario(make_client, requests, args.duration, args.warmup)
+                    result = {
+                        'mode': mode,
+                        'scenario': scenario,
+                        'requests': len(latencies),
+                        'failures': failures,
+                        'throughput': len(latencies) / args.duration,
+                        **summarize(latencies),
+                    }
+                    results.append(result)
+                    print(f'{mode:<10} {scenario:<13} {result["throughput"]:8.1f} req/s  '
+                          + '  '.join(f'{name} {result[name] * 1000:7.1f}ms' for name in ('p50', 'p95', 'p99'))
+                          + f'  failures {failures}')
+            finally:
+                if server is not None:
+                    server.shutdown()
+        db.session.remove()
+        db.engine.dispose()
+    finally:
+        shutil.rmtree(tmpdir)
+
+    report = {
+        'created': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'args': vars(args),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,125 @@
+from datetime import timedelta
 import os
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'hard to guess string'
+    # HS256 signs tokens with SECRET_KEY. With an asymmetric algorithm (RS256,
+    # ES256, EdDSA) tokens are signed with the PEM private key and verified with
+    # the public one; nodes that only verify tokens leave the private key unset.
+    JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM') or 'HS256'
+    JWT_PRIVATE_KEY = os.environ.get('JWT_PRIVATE_KEY')
+    JWT_PUBLIC_KEY = os.environ.get('JWT_PUBLIC_KEY')
+    JWT_EXPIRES_IN = timedelta(minutes=300)
+    # trust the verified claims of a token for the views that only need the
+    # caller's id, without checking that the user still exists
+    AUTH_CLAIMS_ONLY = False
     SSL_REDIRECT = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_RECORD_QUERIES = True
+    # requests a worker process serves at once; each process has its own
+    # connection pool of this size (plus one for the like queue) unless
+    # DB_POOL_SIZE is set. Ignored for in-memory SQLite.
+    WORKER_THREADS = int(os.environ.get('WORKER_THREADS') or 4)
+    DB_POOL_SIZE = None
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = -1
+    DB_POOL_PRE_PING = False
+    # connections of the asyncio engine of the ASGI mode (app/asgi.py), which
+    # serves many more requests at once than there are threads
+    ASYNC_DB_POOL_SIZE = 20
+    ASYNC_DATABASE_URI = None  # derived from SQLALCHEMY_DATABASE_URI
+    # keys of SQLALCHEMY_BINDS that are read replicas of the primary. GET views
+    # decorated with app.utils.replicas.read_only query them round robin, except
+    # for clients that wrote something in the last READ_REPLICA_PIN_SECONDS.
+    READ_REPLICA_BINDS = []
+    READ_REPLICA_PIN_SECONDS = 5
+    # applied to every new SQLite connection. WAL lets readers run alongside
+    # the single writer, busy_timeout (ms) makes writers queue up instead of
+    # failing with "database is locked".
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+    }
+    # queries slower than this many seconds are logged, None disables the log
+    SLOW_QUERY_THRESHOLD = 0.1
+    # Prometheus metrics are served at METRICS_PATH when it is set. With
+    # METRICS_TOKEN set, scrapers must send it as `Authorization: Bearer <token>`.
+    METRICS_PATH = os.environ.get('METRICS_PATH')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # serve /tweets/export/, a stream of the whole table, to authenticated callers
+    TWEETS_EXPORT_ENABLED = False
     TWEETS_PER_PAGE = 50
+    # 'iso', 'epoch' or 'http'; orjson encodes responses when it is installed
+    JSON_DATETIME_FORMAT = 'iso'
+    JSON_USE_ORJSON = True
+    # seconds a cached feed page may be served for, 0 disables the cache
+    FEED_CACHE_TTL = 5
+    FEED_CACHE_BACKEND = 'app.utils.cache.LRUCacheBackend'
+    FEED_CACHE_OPTIONS = {'maxsize': 1024}
+    # home timelines, see app/timeline.py
+    TIMELINE_STORE_BACKEND = 'app.timeline.MemoryTimelineStore'
+    TIMELINE_LENGTH = 800
+    # seconds a stored timeline is kept before it is rebuilt, 0 keeps it until evicted
+    TIMELINE_TTL = 300
+    TIMELINE_STORE_OPTIONS = {'maxsize': 10000}
+    FANOUT_MAX_FOLLOWERS = 10000
+    # buffer likes and write them in batches from a background thread, see app/like_queue.py
+    LIKE_WRITE_BEHIND = False
+    LIKE_FLUSH_INTERVAL = 0.5
+    LIKE_FLUSH_SIZE = 500
+    # bound on buffered likes, past which likes are answered 503
+    LIKE_QUEUE_MAX_PENDING = 10000
+    # liked_by_me state of feed pages cached per viewer, see app/like_state.py;
+    # 0 users disables the cache
+    LIKE_STATE_CACHE_USERS = 10000
+    LIKE_STATE_CACHE_IDS = 2000
+    LIKE_STATE_CACHE_TTL = 60
+    # token buckets per user (or address): name -> (requests, per seconds), see
+    # app/utils/rate_limit.py; empty disables rate limiting
+    RATE_LIMITS = {
+        'tweet': (30, 60),
+        'like': (120, 60),
+        'register': (10, 3600),
+    }
+    RATE_LIMIT_BACKEND = 'app.utils.rate_limit.MemoryRateLimitBackend'
+    RATE_LIMIT_OPTIONS = {'maxsize': 100000}
+    # seconds the response to an Idempotency-Key is replayed for, 0 disables them;
+    # see app/utils/idempotency.py
+    IDEMPOTENCY_TTL = 24 * 3600
+    # how long a key stays claimed by an attempt that never finished
+    IDEMPOTENCY_LOCK_TTL = 60
+    IDEMPOTENCY_BACKEND = 'app.utils.idempotency.MemoryIdempotencyBackend'
+    IDEMPOTENCY_OPTIONS = {'maxsize': 10000}
+    # create missing tables at startup; deployments run `flask db upgrade` instead
+    # and skip the per-table introspection on every start, see app/migrations.py
+    AUTO_CREATE_TABLES = False
+    # rows updated per transaction by migration backfills
+    MIGRATION_BATCH_SIZE = 10000
+    # larger request bodies are answered with 413 without being read
+    REQUEST_MAX_BYTES = 64 * 1024
+    BULK_REQUEST_MAX_BYTES = 16 * 1024 * 1024
+    BULK_TWEETS_MAX_ITEMS = 10000
+    # upper bounds (and defaults) for /tweet/<id>/thread/
+    THREAD_MAX_DEPTH = 50
+    THREAD_MAX_NODES = 1000
+    BULK_INSERT_BATCH_SIZE = 500
+    # number of verified bearer tokens cached in-process, 0 disables the cache
+    TOKEN_CACHE_SIZE = 10000
+    # werkzeug hash method as 'pbkdf2:<hashlib name>:<iterations>', e.g.
+    # 'pbkdf2:sha256:600000' (Werkzeug 2.2 has no scrypt). Spell it out in full: a
+    # bare 'pbkdf2' never matches the 'pbkdf2:sha256:N' prefix of stored hashes, so
+    # every login would rehash. Stored hashes made with other parameters are
+    # upgraded on the next successful login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:260000'
+    PASSWORD_SALT_LENGTH = 16
+    # hash on a pool of this many threads instead of the request thread, 0 disables
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 0)
+    PASSWORD_HASH_MAX_PENDING = None  # defaults to 8 per worker
 
     @staticmethod
     def init_app(app):
@@ -19,6 +131,9 @@ class DevelopmentConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'data-dev.sqlite')
     TWEETS_PER_PAGE = 3 # make pagination easier to test
+    AUTO_CREATE_TABLES = True
+    METRICS_PATH = '/internal/metrics'
+    TWEETS_EXPORT_ENABLED = True
 
 
 class DefaultConfig(DevelopmentConfig):
@@ -30,10 +145,21 @@ class TestingConfig(DevelopmentConfig):
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or \
         'sqlite://'
     WTF_CSRF_ENABLED = False
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'  # keep the suite fast
+    RATE_LIMITS = {}  # tests of rate limiting set their own
+
+
+class ProductionConfig(Config):
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
+        'sqlite:///' + os.path.join(basedir, 'data.sqlite')
+    # drop connections the database or a proxy may have closed while idle
+    DB_POOL_RECYCLE = 1800
+    DB_POOL_PRE_PING = True
 
 
 config = {
     'default': DefaultConfig,
     'development': DevelopmentConfig,
-    'testing': TestingConfig
+    'testing': TestingConfig,
+    'production': ProductionConfig
 }
\ No newline at end of file
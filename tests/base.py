@@ -0,0 +1,40 @@
+import json
+import unittest
+
+from app import create_app, db
+from app.models import User
+
+
+LOGIN_USER_PW = 'anotherpassword'
+
+
+class APITestCase(unittest.TestCase):
+    """
+    Runs each test against a new 'testing' app, with `config` applied, and an
+    empty database.
+    """
+    config = {}
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config.update(self.config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client(use_cookies=True)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _create_user(self, email):
+        """
+        Creates a user and logs them in. Returns their id and the headers
+        authenticating them.
+        """
+        user = User(email=email, password=LOGIN_USER_PW)
+        db.session.add(user)
+        db.session.commit()
+        response = self.client.post('/api/v1/auth/login/', json={'email': email, 'password': LOGIN_USER_PW})
+        return user.id, {'Authorization': f"Bearer {json.loads(response.data)['data']['token']}"}
@@ -0,0 +1,130 @@
+import asyncio
+from importlib.util import find_spec
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from app import create_app, db
+from app.models import User, Tweet
+from app.utils.common import TokenGenerator
+from config import config, TestingConfig
+
+
+async def call(application, method, path, query_string='', headers=(), body=b''):
+    """
+    Makes one request to an ASGI application and returns (status, headers, body).
+    """
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': query_string.encode(), 'server': ('testserver', 80), 'client': ('127.0.0.1', 1234),
+        'headers': [(name.lower().encode(), value.encode())
+                    for name, value in [*headers, ('Content-Length', str(len(body)))]],
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+    start = sent[0]
+    response_headers = {name.decode().lower(): value.decode() for name, value in start['headers']}
+    return start['status'], response_headers, b''.join(message.get('body', b'') for message in sent[1:])
+
+
+@unittest.skipUnless(find_spec('asgiref') and find_spec('aiosqlite'), 'needs asgiref and aiosqlite')
+class AsgiTestCase(unittest.TestCase):
+    def setUp(self):
+        from app.asgi import AsyncAPI
+
+        self.tmpdir = tempfile.mkdtemp()
+        config['asgi-testing'] = type('AsgiTestingConfig', (TestingConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(self.tmpdir, 'test.sqlite'),
+        })
+        self.app = create_app('asgi-testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client(use_cookies=True)
+        self.asgi = AsyncAPI(self.app)
+        self.loop = asyncio.new_event_loop()
+
+        user = User(email='john@example.com', password='cat')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        self.headers = [('Authorization', f'Bearer {TokenGenerator.encode_token(user)}')]
+        parent = Tweet(user_id=user.id, body='tweet number 0')
+        db.session.add(parent)
+        db.session.flush()
+        db.session.add_all(Tweet(user_id=user.id, body=f'tweet number {i}', parent_id=parent.id) for i in range(1, 5))
+        db.session.commit()
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.asgi.engine.dispose())
+        self.loop.close()
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.app_context.pop()
+        del config['asgi-testing']
+        shutil.rmtree(self.tmpdir)
+
+    def request(self, method, path, query_string='', headers=(), body=b''):
+        return self.loop.run_until_complete(call(self.asgi, method, path, query_string, headers, body))
+
+    def test_feed_matches_the_flask_view(self):
+        self.app.config['FEED_CACHE_TTL'] = 0
+        self.app.extensions.pop('feed_cache')
+        for query_string in ['cursor=', 'cursor=&count=exact']:
+            status, headers, body = self.request('GET', '/api/v1/tweets/', query_string)
+            self.assertEqual(status, 200)
+            expected = self.client.get(f'/api/v1/tweets/?{query_string}')
+            self.assertEqual(json.loads(body), json.loads(expected.data))
+            self.assertEqual(headers['etag'], expected.headers['ETag'])
+
+            # follow the next link to the end of the feed
+            next_page = json.loads(body)['next']
+            path, query_string = next_page.split('?')
+            status, headers, body = self.request('GET', path, query_string)
+            self.assertEqual(json.loads(body), json.loads(self.client.get(next_page).data))
+
+        status, headers, body = self.request('GET', '/api/v1/tweets/', 'cursor=bogus')
+        self.assertEqual(status, 400)
+
+    def test_feed_cache_and_etag(self):
+        status, headers, body = self.request('GET', '/api/v1/tweets/', 'cursor=')
+        self.assertEqual(self.app.extensions['feed_cache'].get('/api/v1/tweets/?cursor=')[0], body)
+        # the Flask view serves the page the coroutine cached
+        self.assertEqual(self.client.get('/api/v1/tweets/?cursor=').data, body)
+        status, headers, body = self.request('GET', '/api/v1/tweets/', 'cursor=',
+                                             headers=[('If-None-Match', headers['etag'])])
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b'')
+
+    def test_user_timeline(self):
+        status, headers, body = self.request('GET', f'/api/v1/users/{self.user_id}/tweets/')
+        self.assertEqual(status, 200)
+        expected = self.client.get(f'/api/v1/users/{self.user_id}/tweets/')
+        self.assertEqual(json.loads(body), json.loads(expected.data))
+        status, headers, body = self.request('GET', '/api/v1/users/1000/tweets/')
+        self.assertEqual(status, 404)
+
+    def test_other_requests_go_to_flask(self):
+        status, headers, body = self.request('GET', '/api/v1/tweets/', 'page=2')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), json.loads(self.client.get('/api/v1/tweets/?page=2').data))
+
+        status, headers, body = self.request(
+            'POST', '/api/v1/tweet/', headers=self.headers + [('Content-Type', 'application/json')],
+            body=json.dumps({'body': 'posted through asgi'}).encode())
+        self.assertEqual(status, 200)
+        self.assertEqual(db.session.get(Tweet, json.loads(body)['data']['id']).body, 'posted through asgi')
@@ -0,0 +1,68 @@
+import json
+
+from app import db
+from app.models import Tweet
+
+from .base import APITestCase
+
+
+LOGIN_USER_EMAIL = 'jane@example.com'
+
+
+class BulkTweetsTestCase(APITestCase):
+    config = {'BULK_INSERT_BATCH_SIZE': 2}
+
+    def setUp(self):
+        super().setUp()
+        self.user_id, self.headers = self._create_user(LOGIN_USER_EMAIL)
+
+    def test_bulk_json_array(self):
+        parent = Tweet(user_id=self.user_id, body='ORIGINAL TWEET BODY')
+        db.session.add(parent)
+        db.session.commit()
+        data = [
+            {'body': 'bulk tweet one'},
+            {'body': 'short'},
+            {'body': 'bulk reply one', 'parent_id': parent.id},
+            {'body': 'bulk reply two', 'parent_id': parent.id},
+            {'body': 'bulk tweet two'},
+            {'body': 'bulk tweet one'},
+        ]
+        response = self.client.post('/api/v1/tweets/bulk/', json=data, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)['data']
+        self.assertEqual(data['created'], 5)
+        results = data['results']
+        self.assertIn('body', results[1]['errors'])
+        for index, body in [(0, 'bulk tweet one'), (2, 'bulk reply one'), (4, 'bulk tweet two'), (5, 'bulk tweet one')]:
+            self.assertEqual(db.session.get(Tweet, results[index]['id']).body, body)
+        self.assertNotEqual(results[0]['id'], results[5]['id'])
+        db.session.refresh(parent)
+        self.assertEqual(parent.num_replies, 2)
+
+    def test_bulk_string_parent_id(self):
+        parent = Tweet(user_id=self.user_id, body='ORIGINAL TWEET BODY')
+        db.session.add(parent)
+        db.session.commit()
+        data = [{'body': 'bulk reply one', 'parent_id': str(parent.id)}, {'body': 'bulk tweet one', 'parent_id': 'x'}]
+        response = self.client.post('/api/v1/tweets/bulk/', json=data, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.data)['data']['results']
+        self.assertEqual(db.session.get(Tweet, results[0]['id']).parent_id, parent.id)
+        self.assertIn('parent_id', results[1]['errors'])
+
+    def test_bulk_ndjson(self):
+        body = '{"body": "ndjson tweet one"}\nnot json\n{"body": "ndjson tweet two"}\n'
+        response = self.client.post('/api/v1/tweets/bulk/', data=body, headers={
+            **self.headers, 'Content-Type': 'application/x-ndjson'
+        })
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.data)['data']['results']
+        self.assertEqual(results[1], {'errors': {'_schema': ['Invalid JSON.']}})
+        self.assertEqual(db.session.get(Tweet, results[2]['id']).body, 'ndjson tweet two')
+
+    def test_bulk_requires_auth(self):
+        response = self.client.post('/api/v1/tweets/bulk/', json=[{'body': 'bulk tweet one'}],
+                                    headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Tweet.query.count(), 0)
@@ -0,0 +1,32 @@
+import unittest
+
+from app.utils.cache import FeedCache, LRUCacheBackend
+
+
+class FeedCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.backend = LRUCacheBackend(maxsize=3, clock=lambda: self.now)
+        self.feed_cache = FeedCache(self.backend, ttl=5)
+
+    def test_entries_expire_after_ttl(self):
+        body, etag = self.feed_cache.set('/api/v1/tweets/?', b'{}')
+        self.assertEqual(self.feed_cache.get('/api/v1/tweets/?'), (body, etag))
+        self.now = 5
+        self.assertIsNone(self.feed_cache.get('/api/v1/tweets/?'))
+
+    def test_invalidate_drops_every_page(self):
+        self.feed_cache.set('/api/v1/tweets/?page=1', b'[1]')
+        self.feed_cache.set('/api/v1/tweets/?page=2', b'[2]')
+        self.feed_cache.invalidate()
+        self.assertIsNone(self.feed_cache.get('/api/v1/tweets/?page=1'))
+        self.assertIsNone(self.feed_cache.get('/api/v1/tweets/?page=2'))
+
+    def test_lru_eviction(self):
+        self.feed_cache.invalidate()
+        for key in 'abcd':
+            self.backend.set(key, key, ttl=None)
+        self.assertIsNone(self.backend.get('a'))
+        self.assertEqual(self.backend.get('d'), 'd')
+        # the version counter survives eviction
+        self.assertEqual(self.backend.get(FeedCache.VERSION_KEY), 1)
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import text
+
+from app import create_app, db
+from app.utils.engine import TimedQueuePool, pool_options
+from config import config, TestingConfig
+
+
+class EngineOptionsTestCase(unittest.TestCase):
+    def test_pool_options(self):
+        settings = {
+            'DB_POOL_SIZE': None, 'WORKER_THREADS': 8, 'LIKE_WRITE_BEHIND': False,
+            'DB_MAX_OVERFLOW': 2, 'DB_POOL_TIMEOUT': 3, 'DB_POOL_RECYCLE': 1800, 'DB_POOL_PRE_PING': True
+        }
+        self.assertEqual(pool_options(settings, 'sqlite://'), {})
+        options = pool_options(settings, 'postgresql://localhost/tweets')
+        self.assertIs(options['poolclass'], TimedQueuePool)
+        self.assertEqual(options['pool_size'], 8)
+        self.assertEqual(options['max_overflow'], 2)
+        self.assertTrue(options['pool_pre_ping'])
+        settings['LIKE_WRITE_BEHIND'] = True
+        self.assertEqual(pool_options(settings, 'sqlite:////tmp/x.sqlite')['pool_size'], 9)
+        settings['DB_POOL_SIZE'] = 3
+        self.assertEqual(pool_options(settings, 'sqlite:////tmp/x.sqlite')['pool_size'], 3)
+
+    def test_pragmas_on_memory_database(self):
+        app = create_app('testing')
+        with app.app_context():
+            self.assertEqual(db.session.execute(text('PRAGMA busy_timeout')).scalar(), 5000)
+            db.session.remove()
+
+
+class FileDatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        config['file-testing'] = type('FileTestingConfig', (TestingConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(self.tmpdir, 'test.sqlite'),
+            'WORKER_THREADS': 2,
+        })
+        self.app = create_app('file-testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client(use_cookies=True)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.app_context.pop()
+        del config['file-testing']
+        shutil.rmtree(self.tmpdir)
+
+    def test_pool_and_pragmas(self):
+        self.assertIsInstance(db.engine.pool, TimedQueuePool)
+        self.assertEqual(db.engine.pool.size(), 2)
+        self.assertEqual(db.session.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+        self.assertEqual(db.session.execute(text('PRAGMA synchronous')).scalar(), 1)  # NORMAL
+
+    def test_pool_metrics(self):
+        self.client.get('/api/v1/tweets/')
+        body = self.client.get('/internal/metrics').get_data(as_text=True)
+        self.assertIn('# TYPE db_pool_checkout_wait_seconds histogram', body)
+        self.assertRegex(body, r'db_pool_checkout_wait_seconds_count\{bind="default"\} [1-9]')
+        self.assertIn('db_pool_size{bind="default"} 2', body)
+        self.assertIn('db_pool_checked_out{bind="default"}', body)
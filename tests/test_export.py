@@ -0,0 +1,67 @@
+from datetime import datetime
+import json
+import unittest
+
+from app import create_app, db
+from app.models import User, Tweet
+from app.utils.common import TokenGenerator
+
+
+class ExportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client(use_cookies=True)
+        self.users = []
+        for email in ['jane@example.com', 'jackson@example.com']:
+            user = User(email=email, password='anotherpassword')
+            db.session.add(user)
+            db.session.commit()
+            self.users.append(user.id)
+        for day in range(1, 6):
+            for user_id in self.users:
+                db.session.add(Tweet(user_id=user_id, body=f'TWEET {day}', dateadded=datetime(2023, 1, day)))
+        db.session.commit()
+        self.headers = {'Authorization': f'Bearer {TokenGenerator.encode_token(db.session.get(User, self.users[0]))}'}
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_export_endpoint(self):
+        response = self.client.get('/api/v1/tweets/export/', headers=self.headers)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual([line['id'] for line in lines], list(range(1, 11)))
+        # encoded like every other response
+        self.assertEqual(lines[0]['dateadded'], '2023-01-01T00:00:00+00:00')
+
+        response = self.client.get('/api/v1/tweets/export/', headers=self.headers, query_string={
+            'user_id': self.users[0],
+            'since': '2023-01-02',
+            'until': '2023-01-04'
+        })
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual([line['body'] for line in lines], ['TWEET 2', 'TWEET 3'])
+        self.assertTrue(all(line['user_id'] == self.users[0] for line in lines))
+
+        response = self.client.get('/api/v1/tweets/export/?since=yesterday', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_endpoint_access(self):
+        response = self.client.get('/api/v1/tweets/export/')
+        self.assertEqual(response.status_code, 401)
+        self.app.config['TWEETS_EXPORT_ENABLED'] = False
+        response = self.client.get('/api/v1/tweets/export/', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_command(self):
+        result = self.app.test_cli_runner().invoke(args=[
+            'export-tweets', '--user-id', str(self.users[1]), '--since', '2023-01-05'
+        ])
+        lines = [json.loads(line) for line in result.output.splitlines()]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual((lines[0]['user_id'], lines[0]['body']), (self.users[1], 'TWEET 5'))
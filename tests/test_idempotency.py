@@ -0,0 +1,100 @@
+import json
+import unittest
+
+from flask import make_response
+
+from app import db
+from app.models import Tweet, Like
+from app.utils.idempotency import MemoryIdempotencyBackend, idempotent
+
+from .base import LOGIN_USER_PW, APITestCase
+
+
+class MemoryIdempotencyBackendTestCase(unittest.TestCase):
+    def test_add(self):
+        now = [0]
+        backend = MemoryIdempotencyBackend(maxsize=10, clock=lambda: now[0])
+        self.assertTrue(backend.add('key', 'first', 10))
+        self.assertFalse(backend.add('key', 'second', 10))
+        self.assertEqual(backend.get('key'), 'first')
+        now[0] = 10
+        self.assertTrue(backend.add('key', 'third', 10))
+        backend.delete('key')
+        self.assertIsNone(backend.get('key'))
+
+
+class IdempotencyTestCase(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.headers = self._create_user('john@example.com')[1]
+
+    def _post_tweet(self, body, key, headers=None):
+        return self.client.post('/api/v1/tweet/', json={'body': body},
+                                headers={**(headers or self.headers), 'Idempotency-Key': key})
+
+    def test_retries_are_replayed(self):
+        first = self._post_tweet('hello world', 'key-1')
+        self.assertEqual(first.status_code, 200)
+        retry = self._post_tweet('hello world', 'key-1')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(Tweet.query.count(), 1)
+
+        self.assertEqual(self._post_tweet('hello world', 'key-2').status_code, 200)
+        self.assertEqual(self.client.post('/api/v1/tweet/', json={'body': 'hello world'},
+                                          headers=self.headers).status_code, 200)
+        self.assertEqual(Tweet.query.count(), 3)
+
+    def test_keys_are_scoped_to_the_client(self):
+        self._post_tweet('hello world', 'key-1')
+        response = self._post_tweet('hello world', 'key-1', headers=self._create_user('jane@example.com')[1])
+        self.assertNotIn('Idempotent-Replayed', response.headers)
+        self.assertEqual(Tweet.query.count(), 2)
+
+    def test_reused_key_with_another_body(self):
+        self._post_tweet('hello world', 'key-1')
+        self.assertEqual(self._post_tweet('goodbye world', 'key-1').status_code, 422)
+        self.assertEqual(Tweet.query.count(), 1)
+
+    def test_like_retries_are_replayed(self):
+        self._post_tweet('hello world', 'key-1')
+        headers = {**self.headers, 'Idempotency-Key': 'like-1'}
+        for _ in range(3):
+            response = self.client.post('/api/v1/tweet/like/', json={'tweet_id': 1}, headers=headers)
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(Like.query.count(), 1)
+        self.assertEqual(db.session.get(Tweet, 1).num_likes, 1)
+
+    def _call(self, view):
+        with self.app.test_request_context('/flaky/', method='POST', data='body',
+                                           headers={'Idempotency-Key': 'key-1'}):
+            return make_response(view())
+
+    def test_server_errors_are_not_stored(self):
+        statuses = [503, 200, 500]
+        view = idempotent(lambda: make_response({'data': 'ok'}, statuses.pop(0)))
+        self.assertEqual(self._call(view).status_code, 503)
+        self.assertEqual(self._call(view).status_code, 200)
+        response = self._call(view)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Idempotent-Replayed'], 'true')
+
+    def test_retry_while_in_progress(self):
+        retries = []
+
+        @idempotent
+        def view():
+            retries.append(self._call(view))
+            return make_response({'data': 'ok'}, 201)
+
+        self.assertEqual(self._call(view).status_code, 201)
+        self.assertEqual(retries[0].status_code, 409)
+
+    def test_register(self):
+        headers = {'Idempotency-Key': 'signup-1'}
+        data = {'email': 'new@example.com', 'password': LOGIN_USER_PW, 'password2': LOGIN_USER_PW}
+        self.assertEqual(self.client.post('/api/v1/auth/register/', json=data, headers=headers).status_code, 201)
+        response = self.client.post('/api/v1/auth/register/', json=data, headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.data)['data']['message'], 'User Created')
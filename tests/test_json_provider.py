@@ -0,0 +1,39 @@
+from datetime import datetime
+import json
+import unittest
+
+from app import create_app
+from app.utils.json_provider import FastJSONProvider, orjson
+
+
+DOCUMENT = {
+    'tweets': [{'id': 1, 'body': 'café tweet', 'dateadded': datetime(2023, 1, 2, 3, 4, 5, 600000)}],
+    'next': None
+}
+
+
+class JSONProviderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+
+    def _encode(self, use_orjson, datetime_format):
+        provider = FastJSONProvider(self.app)
+        provider.use_orjson = use_orjson
+        provider.datetime_format = datetime_format
+        with self.app.app_context():
+            return json.loads(provider.response(DOCUMENT).get_data())
+
+    def test_datetime_formats(self):
+        expected = {
+            'iso': '2023-01-02T03:04:05.600000+00:00',
+            'epoch': 1672628645.6,
+            'http': 'Mon, 02 Jan 2023 03:04:05 GMT',
+        }
+        for datetime_format, value in expected.items():
+            data = self._encode(False, datetime_format)
+            self.assertEqual(data['tweets'][0]['dateadded'], value)
+
+    @unittest.skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_matches_stdlib(self):
+        for datetime_format in ['iso', 'epoch', 'http']:
+            self.assertEqual(self._encode(True, datetime_format), self._encode(False, datetime_format))
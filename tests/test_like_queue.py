@@ -0,0 +1,140 @@
+import gc
+import threading
+from unittest import mock
+import weakref
+
+from app import db
+from app.like_queue import (
+    LikeWriteBehind, _like_queues, get_like_queue, init_like_queue, shutdown_like_queue
+)
+from app.models import Tweet, Like
+
+from .base import APITestCase
+
+
+class LikeWriteBehindTestCase(APITestCase):
+    config = {'LIKE_WRITE_BEHIND': True, 'LIKE_FLUSH_INTERVAL': 3600, 'LIKE_FLUSH_SIZE': 3}
+
+    def setUp(self):
+        super().setUp()
+        init_like_queue(self.app)
+        self.users = [self._create_user(f'user{i}@example.com') for i in range(3)]
+        tweet = Tweet(user_id=self.users[0][0], body='ORIGINAL TWEET BODY')
+        db.session.add(tweet)
+        db.session.commit()
+        self.tweet_id = tweet.id
+
+    def tearDown(self):
+        get_like_queue().shutdown()
+        super().tearDown()
+
+    def _like(self, user):
+        return self.client.post('/api/v1/tweet/like/', json={'tweet_id': self.tweet_id}, headers=user[1])
+
+    def test_likes_are_buffered_and_flushed(self):
+        response = self._like(self.users[1])
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self._like(self.users[1]).status_code, 400)
+        self.assertEqual(Like.query.count(), 0)
+
+        # a like that reached the table by another path is skipped, not an error
+        db.session.add(Like(user_id=self.users[2][0], tweet_id=self.tweet_id))
+        db.session.commit()
+        get_like_queue().enqueue(self.users[2][0], self.tweet_id)
+
+        self.assertEqual(get_like_queue().flush(), 2)
+        self.assertEqual(Like.query.count(), 2)
+        self.assertEqual(db.session.get(Tweet, self.tweet_id).num_likes, 2)
+        self.assertEqual(self._like(self.users[1]).status_code, 400)
+
+    def test_delete_pending_like(self):
+        self._like(self.users[1])
+        response = self.client.delete('/api/v1/tweet/like/', json={'tweet_id': self.tweet_id},
+                                      headers=self.users[1][1])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Like.query.count(), 0)
+        self.assertEqual(db.session.get(Tweet, self.tweet_id).num_likes, 0)
+
+    def test_shutdown_flushes(self):
+        self._like(self.users[1])
+        self._like(self.users[2])
+        get_like_queue().shutdown()
+        self.assertEqual(Like.query.count(), 2)
+        with self.assertRaises(RuntimeError):
+            get_like_queue().enqueue(self.users[0][0], self.tweet_id)
+
+    def test_shutdown_is_tied_to_the_app(self):
+        like_queue = get_like_queue()
+        self.assertIn(like_queue, _like_queues)
+        shutdown_like_queue(self.app)
+        self.assertNotIn(like_queue, _like_queues)
+
+        # a queue dropped without shutdown is collected, and its worker exits
+        like_queue = LikeWriteBehind(self.app, flush_interval=0.01, flush_size=10)
+        _like_queues.add(like_queue)
+        like_queue.enqueue(self.users[1][0], self.tweet_id)
+        ref, thread = weakref.ref(like_queue), like_queue._thread
+        del like_queue
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_flush_waits_for_a_flush_in_progress(self):
+        self._like(self.users[1])
+        write = LikeWriteBehind._write
+        started, release = threading.Event(), threading.Event()
+
+        def slow_write(like_queue, batch):
+            started.set()
+            release.wait()
+            return write(like_queue, batch)
+
+        like_queue = get_like_queue()
+        with mock.patch.object(LikeWriteBehind, '_write', slow_write):
+            # the worker has taken the batch and is writing it
+            worker = threading.Thread(target=like_queue.flush)
+            worker.start()
+            started.wait()
+            flushed = []
+            waiting = threading.Thread(target=lambda: flushed.append(like_queue.flush()))
+            waiting.start()
+            waiting.join(0.1)
+            try:
+                self.assertTrue(waiting.is_alive())
+            finally:
+                release.set()
+                worker.join()
+                waiting.join()
+        self.assertEqual(flushed, [0])
+        self.assertEqual(Like.query.count(), 1)
+
+    def test_likes_of_missing_tweets(self):
+        response = self.client.post('/api/v1/tweet/like/', json={'tweet_id': 1000}, headers=self.users[1][1])
+        self.assertEqual(response.status_code, 400)
+        # acknowledged, then the tweet was deleted before the flush
+        get_like_queue().enqueue(self.users[1][0], 1000)
+        self._like(self.users[2])
+        self.assertEqual(get_like_queue().flush(), 1)
+        self.assertEqual([like.user_id for like in Like.query], [self.users[2][0]])
+
+    def test_failed_batch_is_written_one_by_one(self):
+        self._like(self.users[1])
+        self._like(self.users[2])
+        write = LikeWriteBehind._write
+
+        def fail_batches(like_queue, batch):
+            if len(batch) > 1 or batch[0][0] == self.users[1][0]:
+                raise RuntimeError('batch failed')
+            return write(like_queue, batch)
+
+        with mock.patch.object(LikeWriteBehind, '_write', fail_batches):
+            self.assertEqual(get_like_queue().flush(), 1)
+        self.assertEqual([like.user_id for like in Like.query], [self.users[2][0]])
+        self.assertEqual(db.session.get(Tweet, self.tweet_id).num_likes, 1)
+
+    def test_full_queue(self):
+        get_like_queue().max_pending = 1
+        get_like_queue().flush_size = 10
+        self.assertEqual(self._like(self.users[1]).status_code, 202)
+        self.assertEqual(self._like(self.users[2]).status_code, 503)
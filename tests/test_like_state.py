@@ -0,0 +1,117 @@
+import json
+import unittest
+
+from flask_sqlalchemy.record_queries import get_recorded_queries
+
+from app import db
+from app.like_state import LikeStateCache, get_like_state_cache
+from app.models import Tweet, Like, Retweet
+
+from .base import APITestCase
+
+
+class LikeStateCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.cache = LikeStateCache(maxusers=2, maxids=4, ttl=10, clock=lambda: self.now)
+
+    def test_lookup_and_add(self):
+        self.assertEqual(self.cache.lookup(1, [1, 2]), (set(), [1, 2]))
+        self.cache.add(1, [1, 2], {2})
+        self.assertEqual(self.cache.lookup(1, [1, 2, 3]), ({2}, [3]))
+        self.assertEqual(self.cache.stats(), {'hits': 0, 'misses': 2, 'size': 1})
+        self.assertEqual(self.cache.lookup(1, [2, 1]), ({2}, []))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_set_liked_updates_cached_users_only(self):
+        self.cache.set_liked(1, 5, True)
+        self.assertEqual(len(self.cache._entries), 0)
+        self.cache.add(1, [1], set())
+        self.cache.set_liked(1, 5, True)
+        self.cache.set_liked(1, 1, True)
+        self.assertEqual(self.cache.lookup(1, [1, 5]), ({1, 5}, []))
+        self.cache.set_liked(1, 5, False)
+        self.assertEqual(self.cache.lookup(1, [1, 5]), ({1}, []))
+
+    def test_bounds_and_expiry(self):
+        self.cache.add(1, [1, 2, 3], {1})
+        # past maxids the entry starts over
+        self.cache.add(1, [4, 5], {4})
+        self.assertEqual(self.cache.lookup(1, [1, 4]), ({4}, [1]))
+        self.cache.add(2, [1], set())
+        self.cache.add(3, [1], set())
+        self.assertEqual(self.cache.lookup(1, [4]), (set(), [4]))
+        self.now = 10
+        self.assertEqual(self.cache.lookup(3, [1]), (set(), [1]))
+
+
+class LikedByMeTestCase(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = self._create_user('author@example.com')
+        self.viewer = self._create_user('viewer@example.com')
+        tweets = [Tweet(user_id=self.author[0], body=f'tweet number {i}') for i in range(3)]
+        db.session.add_all(tweets)
+        db.session.commit()
+        self.tweet_ids = [tweet.id for tweet in tweets]
+        db.session.add_all([Like(user_id=self.viewer[0], tweet_id=self.tweet_ids[1]),
+                            Like(user_id=self.author[0], tweet_id=self.tweet_ids[2])])
+        db.session.commit()
+
+    def _liked_by_me(self, query_string='cursor=', headers=None):
+        response = self.client.get(f'/api/v1/tweets/?{query_string}', headers=headers or self.viewer[1])
+        self.assertEqual(response.status_code, 200)
+        return {item['id']: item['liked_by_me'] for item in json.loads(response.data)['tweets']}
+
+    def _like_queries(self, query_string='cursor='):
+        num_before = len(get_recorded_queries())
+        self._liked_by_me(query_string)
+        return [query for query in get_recorded_queries()[num_before:] if 'FROM "like"' in query.statement
+                or 'FROM like' in query.statement]
+
+    def test_liked_by_me(self):
+        expected = {id: id == self.tweet_ids[1] for id in self.tweet_ids}
+        for query_string in ['cursor=', 'page=1']:
+            self.assertEqual(self._liked_by_me(query_string), expected)
+        # anonymous pages are unchanged, and not mixed up with the viewer's in the feed cache
+        response = self.client.get('/api/v1/tweets/?cursor=')
+        self.assertNotIn('liked_by_me', json.loads(response.data)['tweets'][0])
+        self.assertIn('Authorization', response.headers['Vary'])
+        self.assertEqual(self._liked_by_me(headers=self.author[1])[self.tweet_ids[2]], True)
+
+    def test_retweeted_tweets(self):
+        db.session.add(Retweet(user_id=self.author[0], tweet_id=self.tweet_ids[1]))
+        db.session.commit()
+        response = self.client.get('/api/v1/tweets/?cursor=&include_retweets=1', headers=self.viewer[1])
+        retweet, = [item for item in json.loads(response.data)['tweets'] if item['type'] == 'retweet']
+        self.assertIs(retweet['tweet']['liked_by_me'], True)
+        self.assertNotIn('liked_by_me', retweet)
+
+    def test_one_query_then_the_cache(self):
+        get_like_state_cache().hits = 0
+        queries = self._like_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertIn(' IN ', queries[0].statement)
+        self.assertEqual(self._like_queries(), [])
+        self.assertEqual(get_like_state_cache().stats()['hits'], 1)
+
+        self.app.extensions.pop('like_state_cache')
+        self.assertEqual(len(self._like_queries()), 1)
+        self.assertEqual(len(self._like_queries()), 1)
+
+    def test_likes_update_the_cache(self):
+        self._liked_by_me()
+        response = self.client.post('/api/v1/tweet/like/', json={'tweet_id': self.tweet_ids[-1]},
+                                    headers=self.viewer[1])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self._like_queries(), [])
+        self.assertIs(self._liked_by_me()[self.tweet_ids[-1]], True)
+
+        response = self.client.delete('/api/v1/tweet/like/', json={'tweet_id': self.tweet_ids[1]},
+                                      headers=self.viewer[1])
+        self.assertEqual(response.status_code, 200)
+        self.assertIs(self._liked_by_me()[self.tweet_ids[1]], False)
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/v1/tweets/?cursor=', headers={'Authorization': 'Bearer bogus'})
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,54 @@
+import unittest
+
+from app import create_app, db
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client(use_cookies=True)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/v1/tweets/')
+        timing = response.headers['Server-Timing']
+        self.assertRegex(timing, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+    def test_metrics_endpoint(self):
+        for i in range(3):
+            self.client.get('/api/v1/tweets/')
+        response = self.client.get('/internal/metrics')
+        self.assertEqual(response.mimetype, 'text/plain')
+        text = response.get_data(as_text=True)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="api.get_tweets",le="+Inf"} 3', text)
+        self.assertIn('http_request_duration_seconds_count{endpoint="api.get_tweets"} 3', text)
+        self.assertIn('http_response_size_bytes_count{endpoint="api.get_tweets"} 3', text)
+        self.assertIn('# TYPE auth_token_cache_hits_total counter', text)
+        self.assertIn('auth_token_cache_hits_total 0', text)
+
+    def test_metrics_token(self):
+        self.app.config['METRICS_TOKEN'] = 'scraper-secret'
+        self.assertEqual(self.client.get('/internal/metrics').status_code, 401)
+        response = self.client.get('/internal/metrics', headers={'Authorization': 'Bearer wrong'})
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get('/internal/metrics', headers={'Authorization': 'Bearer scraper-secret'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_off_in_production(self):
+        app = create_app('production')
+        self.assertNotIn('metrics', app.view_functions)
+
+    def test_slow_query_log(self):
+        self.app.config['SLOW_QUERY_THRESHOLD'] = 0
+        with self.assertLogs(self.app.logger, level='WARNING') as logs:
+            self.client.get('/api/v1/tweets/')
+        self.assertTrue(any('[slow query]' in line and 'api.get_tweets' in line and 'FROM tweet' in line
+                            for line in logs.output))
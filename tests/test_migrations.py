@@ -0,0 +1,140 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from sqlalchemy import inspect
+
+from app import create_app, db
+from app.migrations import MIGRATIONS, applied_versions
+from app.models import Tweet, Retweet
+from app.utils.common import TokenGenerator
+from config import config, TestingConfig
+
+
+# the schema the first release created with db.create_all()
+BASELINE_SCHEMA = '''
+CREATE TABLE user (
+    id INTEGER NOT NULL, email VARCHAR(64), password_hash VARCHAR(128),
+    dateadded DATETIME, dateupdated DATETIME, PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_user_email ON user (email);
+CREATE INDEX ix_user_dateadded ON user (dateadded);
+CREATE INDEX ix_user_dateupdated ON user (dateupdated);
+CREATE TABLE tweet (
+    id INTEGER NOT NULL, user_id INTEGER, body TEXT, dateadded DATETIME, dateupdated DATETIME,
+    parent_id INTEGER, PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id), FOREIGN KEY(parent_id) REFERENCES tweet (id)
+);
+CREATE INDEX ix_tweet_dateadded ON tweet (dateadded);
+CREATE INDEX ix_tweet_dateupdated ON tweet (dateupdated);
+CREATE TABLE "like" (
+    id INTEGER NOT NULL, user_id INTEGER, tweet_id INTEGER, PRIMARY KEY (id),
+    CONSTRAINT uix_like__user_id__tweet_id UNIQUE (user_id, tweet_id),
+    FOREIGN KEY(user_id) REFERENCES user (id), FOREIGN KEY(tweet_id) REFERENCES tweet (id)
+);
+CREATE TABLE retweet (
+    id INTEGER NOT NULL, user_id INTEGER, tweet_id INTEGER, PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id), FOREIGN KEY(tweet_id) REFERENCES tweet (id)
+);
+'''
+
+
+class MigrationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'baseline.sqlite')
+        config['migration-testing'] = type('MigrationTestingConfig', (TestingConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + self.path,
+            'AUTO_CREATE_TABLES': False,
+        })
+
+    def tearDown(self):
+        del config['migration-testing']
+        shutil.rmtree(self.tmpdir)
+
+    def seed_baseline(self):
+        connection = sqlite3.connect(self.path)
+        connection.executescript(BASELINE_SCHEMA)
+        connection.executemany('INSERT INTO user (id, email) VALUES (?, ?)',
+                               [(1, 'john@example.com'), (2, 'jane@example.com')])
+        connection.executemany(
+            'INSERT INTO tweet (id, user_id, body, dateadded, parent_id) VALUES (?, ?, ?, ?, ?)',
+            [(id, 1, f'baseline tweet number {id}', f'2020-01-01 00:00:{id:02}.000000', 1 if id > 1 else None)
+             for id in range(1, 8)])
+        connection.executemany('INSERT INTO "like" (user_id, tweet_id) VALUES (?, ?)',
+                               [(1, 1), (2, 1), (2, 3)])
+        # retweeted twice, which the unique constraint now forbids
+        connection.executemany('INSERT INTO retweet (user_id, tweet_id) VALUES (?, ?)',
+                               [(2, 1), (2, 1), (2, 5)])
+        connection.commit()
+        connection.close()
+
+    def run_cli(self, app, *args):
+        result = app.test_cli_runner().invoke(args=list(args))
+        self.assertEqual(result.exit_code, 0, result.output)
+        return result.output
+
+    def test_upgrade_seeded_baseline_database(self):
+        self.seed_baseline()
+        app = create_app('migration-testing')
+        with app.app_context():
+            self.assertNotIn('num_likes', {c['name'] for c in inspect(db.engine).get_columns('tweet')})
+
+            output = self.run_cli(app, 'db', 'upgrade', '--batch-size', '2')
+            self.assertIn(f'Applied {len(MIGRATIONS)} migrations.', output)
+            self.assertEqual(applied_versions(db.engine), {version for version, step in MIGRATIONS})
+
+            # the migrated schema has every column and index of the models
+            inspector = inspect(db.engine)
+            for table in db.metadata.sorted_tables:
+                self.assertEqual({c['name'] for c in inspector.get_columns(table.name)},
+                                 {c.name for c in table.columns})
+                names = ({index['name'] for index in inspector.get_indexes(table.name)}
+                         | {constraint['name'] for constraint in inspector.get_unique_constraints(table.name)})
+                for index in table.indexes:
+                    self.assertIn(index.name, names)
+
+            # backfilled in batches of two rows
+            tweet = db.session.get(Tweet, 1)
+            self.assertEqual((tweet.num_likes, tweet.num_replies, tweet.num_retweets), (2, 6, 1))
+            self.assertEqual(db.session.get(Tweet, 3).num_likes, 1)
+            self.assertEqual(Retweet.query.count(), 2)
+            self.assertEqual(Retweet.query.filter(Retweet.dateadded.is_(None)).count(), 0)
+
+            # and serves the feed, search and writes
+            client = app.test_client()
+            response = client.get('/api/v1/tweets/?cursor=&include_retweets=1')
+            self.assertEqual(response.status_code, 200)
+            response = client.get('/api/v1/tweets/search/?q=baseline%20number%207')
+            self.assertEqual([item['id'] for item in json.loads(response.data)['tweets']], [7])
+            token = TokenGenerator.encode_token(tweet.author)
+            response = client.post('/api/v1/users/2/follow/', headers={'Authorization': f'Bearer {token}'})
+            self.assertEqual(response.status_code, 201)
+
+            self.assertIn('The schema is up to date.', self.run_cli(app, 'db', 'upgrade'))
+            self.assertIn('applied  0005_tweet_search', self.run_cli(app, 'db', 'status'))
+            db.session.remove()
+            db.engine.dispose()
+
+    def test_upgrade_empty_database(self):
+        app = create_app('migration-testing')
+        with app.app_context():
+            self.assertEqual(inspect(db.engine).get_table_names(), [])
+            self.run_cli(app, 'db', 'upgrade')
+            self.assertTrue({table.name for table in db.metadata.sorted_tables}
+                            <= set(inspect(db.engine).get_table_names()))
+            self.assertEqual(applied_versions(db.engine), {version for version, step in MIGRATIONS})
+            db.engine.dispose()
+
+    def test_upgrade_database_made_by_create_all(self):
+        app = create_app('migration-testing')
+        with app.app_context():
+            db.create_all()
+            indexes = {index['name'] for index in inspect(db.engine).get_indexes('retweet')}
+            self.run_cli(app, 'db', 'upgrade')
+            # nothing was added twice
+            self.assertEqual({index['name'] for index in inspect(db.engine).get_indexes('retweet')}, indexes)
+            db.engine.dispose()
@@ -0,0 +1,68 @@
+import unittest
+
+from app.utils.rate_limit import MemoryRateLimitBackend, init_rate_limiter
+
+from .base import LOGIN_USER_PW, APITestCase
+
+
+class MemoryRateLimitBackendTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.backend = MemoryRateLimitBackend(maxsize=2, clock=lambda: self.now)
+
+    def test_token_bucket(self):
+        # 2 requests, refilled at one per 5 seconds
+        self.assertEqual(self.backend.take('a', 2, 0.2), 0)
+        self.assertEqual(self.backend.take('a', 2, 0.2), 0)
+        self.assertAlmostEqual(self.backend.take('a', 2, 0.2), 5)
+        self.now = 4
+        self.assertAlmostEqual(self.backend.take('a', 2, 0.2), 1)
+        self.now = 5
+        self.assertEqual(self.backend.take('a', 2, 0.2), 0)
+        self.assertEqual(self.backend.take('b', 2, 0.2), 0)
+
+    def test_refilled_and_least_recently_used_buckets_are_dropped(self):
+        self.backend.take('a', 2, 0.2)
+        self.now = 1
+        self.backend.take('b', 2, 0.2)
+        self.now = 5
+        self.backend.take('c', 2, 0.2)
+        self.assertEqual(list(self.backend._buckets), ['b', 'c'])
+        self.backend.take('d', 2, 0.2)
+        self.assertEqual(list(self.backend._buckets), ['c', 'd'])
+
+
+class RateLimitTestCase(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.users = [self._create_user(f'user{i}@example.com')[1] for i in range(2)]
+
+    def _register(self, email, **kwargs):
+        return self.client.post('/api/v1/auth/register/',
+                                json={'email': email, 'password': LOGIN_USER_PW, 'password2': LOGIN_USER_PW}, **kwargs)
+
+    def _enable(self, **limits):
+        self.app.config['RATE_LIMITS'] = limits
+        init_rate_limiter(self.app)
+
+    def test_limits_per_user(self):
+        self._enable(tweet=(2, 60))
+        for i in range(2):
+            response = self.client.post('/api/v1/tweet/', json={'body': f'tweet number {i}'}, headers=self.users[0])
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/v1/tweet/', json={'body': 'one too many'}, headers=self.users[0])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '30')
+        # other users and other endpoints have their own buckets
+        response = self.client.post('/api/v1/tweet/', json={'body': 'another tweet'}, headers=self.users[1])
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/v1/tweet/like/', json={'tweet_id': 1}, headers=self.users[0])
+        self.assertEqual(response.status_code, 201)
+
+    def test_limits_per_address_without_a_user(self):
+        self._enable(register=(1, 60))
+        self.assertEqual(self._register('new@example.com').status_code, 201)
+        self.assertEqual(self._register('other@example.com', environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code,
+                         201)
+        self.assertEqual(self._register('third@example.com').status_code, 429)
+        self.assertIn('rate_limit_rejected_total 1', self.client.get('/internal/metrics').get_data(as_text=True))
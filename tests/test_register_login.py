@@ -1,7 +1,9 @@
+import threading
 import unittest
 
 from app import create_app, db
 from app.models import User
+from app.utils.passwords import HashingOverloaded, PasswordHasher
 
 
 LOGIN_USER_EMAIL = 'jane@example.com'
@@ -65,3 +67,49 @@ class FlaskClientTestCase(unittest.TestCase):
         }
         response = self.client.post('/api/v1/auth/login/', json=data, follow_redirects=True)
         self.assertEqual(response.status_code, 400)
+
+    def test_login_rehashes_outdated_hash(self):
+        self.app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:500'
+        user = User(email='john@example.com', password='catcat!')
+        db.session.add(user)
+        db.session.commit()
+        self.app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+        self.assertTrue(user.password_needs_rehash())
+
+        data = {
+            "email": "john@example.com",
+            "password": "catcat!"
+        }
+        response = self.client.post('/api/v1/auth/login/', json=data, follow_redirects=True)
+        self.assertEqual(response.status_code, 200)
+        db.session.refresh(user)
+        self.assertTrue(user.password_hash.startswith('pbkdf2:sha256:1000$'))
+        self.assertFalse(user.password_needs_rehash())
+        self.assertTrue(user.verify_password('catcat!'))
+
+    def test_hashing_on_worker_pool(self):
+        hasher = PasswordHasher(workers=1, max_pending=1)
+        self.app.extensions['password_hasher'] = hasher
+        try:
+            user = User.query.filter_by(email=LOGIN_USER_EMAIL).first()
+            self.assertTrue(user.verify_password(LOGIN_USER_PW))
+
+            # a full pool sheds load instead of queueing
+            started, release = threading.Event(), threading.Event()
+            busy = threading.Thread(target=hasher.run, args=(lambda: started.set() or release.wait(),))
+            busy.start()
+            started.wait()
+            try:
+                with self.assertRaises(HashingOverloaded):
+                    user.verify_password(LOGIN_USER_PW)
+                response = self.client.post('/api/v1/auth/login/', json={
+                    'email': LOGIN_USER_EMAIL, 'password': LOGIN_USER_PW
+                })
+                self.assertEqual(response.status_code, 503)
+            finally:
+                release.set()
+                busy.join()
+            self.assertTrue(user.verify_password(LOGIN_USER_PW))
+        finally:
+            del self.app.extensions['password_hasher']
+            hasher.shutdown()
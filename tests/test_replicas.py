@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from app import create_app, db
+from app.models import Tweet, User
+from app.utils.common import TokenGenerator
+from config import config, TestingConfig
+
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        uri = lambda name: 'sqlite:///' + os.path.join(self.tmpdir, f'{name}.sqlite')
+        config['replica-testing'] = type('ReplicaTestingConfig', (TestingConfig,), {
+            'SQLALCHEMY_DATABASE_URI': uri('primary'),
+            'SQLALCHEMY_BINDS': {'replica1': uri('replica1'), 'replica2': uri('replica2')},
+            'READ_REPLICA_BINDS': ['replica1', 'replica2'],
+            'FEED_CACHE_TTL': 0,
+        })
+        self.app = create_app('replica-testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client(use_cookies=True)
+
+        user = User(email='john@example.com', password='cat')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        self.headers = {'Authorization': f'Bearer {TokenGenerator.encode_token(user)}'}
+        # stand-ins for replicas that each have a different tweet
+        for tweet_id, key in enumerate(['replica1', 'replica2'], 1):
+            engine = db.engines[key]
+            db.metadata.create_all(engine)
+            with engine.begin() as connection:
+                connection.execute(User.__table__.insert(), {'id': self.user_id, 'email': 'john@example.com'})
+                connection.execute(Tweet.__table__.insert(), {
+                    'id': tweet_id, 'user_id': self.user_id, 'body': f'tweet on {key}'})
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        for engine in db.engines.values():
+            engine.dispose()
+        self.app_context.pop()
+        del config['replica-testing']
+        # the db object keeps a metadata per bind key it has seen
+        for key in ('replica1', 'replica2'):
+            db.metadatas.pop(key, None)
+        shutil.rmtree(self.tmpdir)
+
+    def _feed_bodies(self, headers=None):
+        response = self.client.get('/api/v1/tweets/?cursor=', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return [tweet['body'] for tweet in json.loads(response.data)['tweets']]
+
+    def test_reads_round_robin(self):
+        self.assertEqual(self._feed_bodies(), ['tweet on replica1'])
+        self.assertEqual(self._feed_bodies(), ['tweet on replica2'])
+        self.assertEqual(self._feed_bodies(), ['tweet on replica1'])
+
+    def test_writes_pin_client_to_primary(self):
+        response = self.client.post('/api/v1/tweet/', json={'body': 'tweet on primary'}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Tweet.query.count(), 1)
+
+        # the writer reads its own write from the primary...
+        self.assertEqual(self._feed_bodies(self.headers), ['tweet on primary'])
+        self.assertEqual(self._feed_bodies(self.headers), ['tweet on primary'])
+        # ...other clients keep using the replicas
+        self.assertIn(self._feed_bodies(), [['tweet on replica1'], ['tweet on replica2']])
+
+        router = self.app.extensions['replicas']
+        router.clock = lambda: float('inf')
+        self.assertIn(self._feed_bodies(self.headers), [['tweet on replica1'], ['tweet on replica2']])
+
+    def test_failed_writes_do_not_pin(self):
+        response = self.client.post('/api/v1/tweet/', json={'body': 'no'}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.app.extensions['replicas'].is_pinned(self.headers['Authorization']))
@@ -0,0 +1,67 @@
+import json
+import unittest
+
+from app import create_app, db
+from app.models import User, Tweet
+
+
+LOGIN_USER_EMAIL = 'jane@example.com'
+LOGIN_USER_PW = 'anotherpassword'
+
+
+class RequestParsingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client(use_cookies=True)
+        user = User(email=LOGIN_USER_EMAIL, password=LOGIN_USER_PW)
+        db.session.add(user)
+        db.session.commit()
+        response = self.client.post('/api/v1/auth/login/', json={
+            'email': LOGIN_USER_EMAIL,
+            'password': LOGIN_USER_PW
+        })
+        self.headers = {
+            'Authorization': f"Bearer {json.loads(response.data)['data']['token']}"
+        }
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_oversized_body_rejected(self):
+        self.app.config['REQUEST_MAX_BYTES'] = 100
+        body = json.dumps({'body': 'x' * 200})
+        response = self.client.post('/api/v1/tweet/', data=body, content_type='application/json',
+                                    headers=self.headers)
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('100 bytes', json.loads(response.data)['data'])
+        self.assertEqual(Tweet.query.count(), 0)
+
+        # the bulk endpoint has a limit of its own
+        response = self.client.post('/api/v1/tweets/bulk/', json=[{'body': 'x' * 200}], headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_json(self):
+        response = self.client.post('/api/v1/tweet/', data='{"body": ', content_type='application/json',
+                                    headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Invalid JSON.', json.loads(response.data)['data'])
+        response = self.client.post('/api/v1/auth/login/', data='not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_loaded_types(self):
+        response = self.client.post('/api/v1/tweet/', json={'body': 'parent tweet'}, headers=self.headers)
+        parent_id = json.loads(response.data)['data']['id']
+        response = self.client.post('/api/v1/tweet/', json={'body': 'reply tweet', 'parent_id': str(parent_id)},
+                                    headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        reply = db.session.get(Tweet, json.loads(response.data)['data']['id'])
+        self.assertEqual(reply.parent_id, parent_id)
+
+        response = self.client.post('/api/v1/tweet/like/', json={'tweet_id': 'one'}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Not a valid integer.', json.loads(response.data)['data'])
@@ -0,0 +1,92 @@
+import json
+from unittest import mock
+
+from sqlalchemy import text
+
+from app import db
+from app.models import Tweet
+from app.search import FTS_TABLE, init_search
+
+from .base import APITestCase
+
+
+LOGIN_USER_EMAIL = 'jane@example.com'
+
+
+class SearchTestCase(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user_id, self.headers = self._create_user(LOGIN_USER_EMAIL)
+
+    def _tweet(self, body):
+        response = self.client.post('/api/v1/tweet/', json={'body': body}, headers=self.headers)
+        return json.loads(response.data)['data']['id']
+
+    def _search(self, q):
+        ids = []
+        next = f'/api/v1/tweets/search/?q={q}'
+        while next:
+            response = self.client.get(next)
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.data)
+            ids += [tweet['id'] for tweet in data['tweets']]
+            next = data['next']
+        return ids
+
+    def test_search_is_ranked_and_paged(self):
+        best = self._tweet('coffee coffee coffee')
+        good = self._tweet('coffee and cake')
+        self._tweet('just some tea')
+        others = [self._tweet(f'more coffee than tea in this much longer tweet number {i}') for i in range(4)]
+        ids = self._search('coffee')
+        self.assertEqual(ids[:2], [best, good])
+        self.assertEqual(sorted(ids[2:]), others)
+        self.assertEqual(self._search('coffee cake'), [good])
+        self.assertEqual(self._search('"unbalanced'), [])
+
+    def test_index_follows_write_paths(self):
+        id = self._tweet('original wording')
+        self.client.put(f'/api/v1/tweet/{id}/', json={'body': 'replacement text'}, headers=self.headers)
+        self.assertEqual(self._search('original'), [])
+        self.assertEqual(self._search('replacement'), [id])
+
+        response = self.client.post('/api/v1/tweets/bulk/', json=[{'body': 'bulk replacement'}], headers=self.headers)
+        bulk_id = json.loads(response.data)['data']['results'][0]['id']
+        self.assertEqual(sorted(self._search('replacement')), [id, bulk_id])
+
+        self.client.delete(f'/api/v1/tweet/{id}/', headers=self.headers)
+        self.assertEqual(self._search('replacement'), [bulk_id])
+
+    def test_rebuild_command(self):
+        db.session.add(Tweet(user_id=self.user_id, body='inserted without the index'))
+        db.session.commit()
+        self.assertEqual(self._search('inserted'), [])
+        result = self.app.test_cli_runner().invoke(args=['rebuild-search-index'])
+        self.assertIn('Rebuilt', result.output)
+        self.assertEqual(len(self._search('inserted')), 1)
+
+    def test_delete_of_unindexed_tweet(self):
+        indexed = self._tweet('indexed coffee tweet')
+        tweet = Tweet(user_id=self.user_id, body='unindexed coffee tweet')
+        db.session.add(tweet)
+        db.session.commit()
+        for id in [tweet.id, indexed]:
+            response = self.client.delete(f'/api/v1/tweet/{id}/', headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+        db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('integrity-check')"))
+        self.assertEqual(self._search('coffee'), [])
+
+    def test_unsupported_database(self):
+        with mock.patch.object(db.engine.dialect, 'name', 'mysql'):
+            with self.assertLogs(self.app.logger, level='WARNING'):
+                init_search(self.app)
+            id = self._tweet('tweet without search')
+            self.client.put(f'/api/v1/tweet/{id}/', json={'body': 'edited without search'}, headers=self.headers)
+            response = self.client.get('/api/v1/tweets/search/?q=search')
+            self.assertEqual(response.status_code, 404)
+            response = self.client.delete(f'/api/v1/tweet/{id}/', headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+
+    def test_missing_query(self):
+        response = self.client.get('/api/v1/tweets/search/')
+        self.assertEqual(response.status_code, 400)
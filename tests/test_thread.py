@@ -0,0 +1,78 @@
+import json
+import unittest
+
+from flask_sqlalchemy.record_queries import get_recorded_queries
+
+from app import create_app, db
+from app.models import User, Tweet
+
+
+class ThreadTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client(use_cookies=True)
+        user = User(email='jane@example.com', password='anotherpassword')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        # root -> (reply_1 -> reply_1_1 -> reply_1_1_1), reply_2
+        self.root = self._tweet('ROOT')
+        self.reply_1 = self._tweet('REPLY 1', self.root)
+        self.reply_2 = self._tweet('REPLY 2', self.root)
+        self.reply_1_1 = self._tweet('REPLY 1.1', self.reply_1)
+        self.reply_1_1_1 = self._tweet('REPLY 1.1.1', self.reply_1_1)
+        self.unrelated = self._tweet('UNRELATED')
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _tweet(self, body, parent=None):
+        tweet = Tweet(user_id=self.user_id, body=body, parent_id=parent and parent.id)
+        db.session.add(tweet)
+        if parent:
+            Tweet.adjust_counter(parent.id, 'num_replies', 1)
+        db.session.commit()
+        return tweet
+
+    def _get_thread(self, id, **params):
+        response = self.client.get(f'/api/v1/tweet/{id}/thread/', query_string=params)
+        return response.status_code, json.loads(response.data)['data']
+
+    def test_full_thread_in_one_query(self):
+        root_id = self.root.id
+        num_queries = len(get_recorded_queries())
+        status, data = self._get_thread(root_id)
+        self.assertEqual(len(get_recorded_queries()) - num_queries, 1)
+        self.assertEqual(status, 200)
+        self.assertFalse(data['truncated'])
+
+        root = data['thread']
+        self.assertEqual(root['id'], self.root.id)
+        self.assertEqual(root['children'], [self.reply_1.id, self.reply_2.id])
+        reply_1 = root['replies'][0]
+        self.assertEqual(reply_1['replies'][0]['id'], self.reply_1_1.id)
+        self.assertEqual(reply_1['replies'][0]['replies'][0]['id'], self.reply_1_1_1.id)
+        self.assertEqual(reply_1['replies'][0]['replies'][0]['depth'], 3)
+
+    def test_subthread(self):
+        status, data = self._get_thread(self.reply_1.id)
+        self.assertEqual(data['thread']['children'], [self.reply_1_1.id])
+        self.assertEqual(data['thread']['depth'], 0)
+
+    def test_limits(self):
+        status, data = self._get_thread(self.root.id, max_depth=1)
+        self.assertTrue(data['truncated'])
+        self.assertEqual([reply['replies'] for reply in data['thread']['replies']], [[], []])
+
+        status, data = self._get_thread(self.root.id, max_nodes=2)
+        self.assertTrue(data['truncated'])
+        self.assertEqual(data['thread']['children'], [self.reply_1.id])
+
+    def test_missing_tweet(self):
+        status, data = self._get_thread(12345)
+        self.assertEqual(status, 404)
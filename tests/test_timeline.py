@@ -0,0 +1,128 @@
+from datetime import datetime
+import json
+import unittest
+
+from app import db
+from app.models import User, Tweet
+from app.timeline import MemoryTimelineStore, get_timeline_store
+
+from .base import APITestCase
+
+
+class MemoryTimelineStoreTestCase(unittest.TestCase):
+    def test_push_keeps_newest_entries(self):
+        store = MemoryTimelineStore(length=3)
+        store.push([1], [(datetime(2023, 1, 1), 1)])
+        self.assertIsNone(store.get(1))
+
+        store.set(1, [(datetime(2023, 1, 2), 2), (datetime(2023, 1, 1), 1)])
+        store.push([1, 2], [(datetime(2023, 1, 4), 4), (datetime(2023, 1, 3), 3)])
+        self.assertEqual([id for dateadded, id in store.get(1)], [4, 3, 2])
+        store.remove([1], [3])
+        # a full timeline may have been trimmed, and is dropped rather than shrunk
+        self.assertIsNone(store.get(1))
+        store.set(1, [(datetime(2023, 1, 2), 2), (datetime(2023, 1, 1), 1)])
+        store.remove([1], [1])
+        self.assertEqual([id for dateadded, id in store.get(1)], [2])
+
+    def test_expiry_and_eviction(self):
+        now = [0]
+        store = MemoryTimelineStore(length=3, maxsize=2, ttl=10, clock=lambda: now[0])
+        entries = [(datetime(2023, 1, 1), 1)]
+        store.set(1, entries)
+        store.set(2, entries)
+        store.get(1)
+        store.set(3, entries)
+        # 2 was the least recently read
+        self.assertIsNone(store.get(2))
+        self.assertEqual(store.get(1), entries)
+
+        now[0] = 10
+        self.assertIsNone(store.get(1))
+        store.push([3], [(datetime(2023, 1, 2), 2)])
+        self.assertIsNone(store.get(3))
+
+
+class HomeTimelineTestCase(APITestCase):
+    config = {'FANOUT_MAX_FOLLOWERS': 1}
+
+    def setUp(self):
+        super().setUp()
+        self.reader, self.author, self.celebrity, self.fan = [
+            self._create_user(f'{name}@example.com') for name in ['reader', 'author', 'celebrity', 'fan']
+        ]
+
+    def _tweet(self, user, body):
+        response = self.client.post('/api/v1/tweet/', json={'body': body}, headers=user[1])
+        return json.loads(response.data)['data']['id']
+
+    def _home(self, user):
+        bodies = []
+        next = '/api/v1/timeline/home/'
+        while next:
+            data = json.loads(self.client.get(next, headers=user[1]).data)
+            bodies += [tweet['body'] for tweet in data['tweets']]
+            next = data['next']
+        return bodies
+
+    def test_fan_out_and_merge(self):
+        for followee in [self.author, self.celebrity]:
+            response = self.client.post(f'/api/v1/users/{followee[0]}/follow/', headers=self.reader[1])
+            self.assertEqual(response.status_code, 201)
+        # a second follower makes the celebrity too popular to fan out to
+        self.client.post(f'/api/v1/users/{self.celebrity[0]}/follow/', headers=self.fan[1])
+        self.assertEqual(self._home(self.reader), [])
+
+        self._tweet(self.author, 'author tweet 1')
+        self._tweet(self.celebrity, 'celebrity tweet 1')
+        self._tweet(self.reader, 'own tweet 1')
+        author_tweet_2 = self._tweet(self.author, 'author tweet 2')
+        self._tweet(self.fan, 'unfollowed tweet')
+
+        stored = [id for dateadded, id in get_timeline_store().get(self.reader[0])]
+        self.assertIn(author_tweet_2, stored)
+        self.assertEqual(len(stored), 3)
+        self.assertEqual(self._home(self.reader), [
+            'author tweet 2', 'own tweet 1', 'celebrity tweet 1', 'author tweet 1'
+        ])
+
+        self.client.delete(f'/api/v1/tweet/{author_tweet_2}/', headers=self.author[1])
+        self.client.delete(f'/api/v1/users/{self.author[0]}/follow/', headers=self.reader[1])
+        self.assertEqual(self._home(self.reader), ['own tweet 1', 'celebrity tweet 1'])
+
+    def test_crossing_the_fan_out_threshold(self):
+        self.client.post(f'/api/v1/users/{self.author[0]}/follow/', headers=self.reader[1])
+        self._tweet(self.author, 'fanned out tweet')
+        self.assertEqual(self._home(self.reader), ['fanned out tweet'])
+
+        # a second follower: the author's tweets are now merged in on read
+        self.client.post(f'/api/v1/users/{self.author[0]}/follow/', headers=self.fan[1])
+        self._tweet(self.author, 'merged tweet')
+        self.assertEqual(self._home(self.reader), ['merged tweet', 'fanned out tweet'])
+        self.assertEqual(get_timeline_store().get(self.reader[0]), [])
+
+        # and fanned out again, with the merged tweets in the rebuilt timeline
+        self.client.delete(f'/api/v1/users/{self.author[0]}/follow/', headers=self.fan[1])
+        self._tweet(self.author, 'fanned out again')
+        self.assertEqual(self._home(self.reader), ['fanned out again', 'merged tweet', 'fanned out tweet'])
+
+    def test_delete_from_a_trimmed_timeline(self):
+        self.app.extensions['timeline_store'] = MemoryTimelineStore(length=3)
+        self.client.post(f'/api/v1/users/{self.author[0]}/follow/', headers=self.reader[1])
+        ids = [self._tweet(self.author, f'author tweet {i}') for i in range(1, 7)]
+        self.assertEqual(self._home(self.reader), [f'author tweet {i}' for i in range(6, 0, -1)])
+
+        # the stored timeline only held the newest three, the older ones are
+        # still read from the database
+        self.client.delete(f'/api/v1/tweet/{ids[-1]}/', headers=self.author[1])
+        self.assertEqual(self._home(self.reader), [f'author tweet {i}' for i in range(5, 0, -1)])
+
+    def test_follow_errors(self):
+        response = self.client.post(f'/api/v1/users/{self.reader[0]}/follow/', headers=self.reader[1])
+        self.assertEqual(response.status_code, 400)
+        self.client.post(f'/api/v1/users/{self.author[0]}/follow/', headers=self.reader[1])
+        response = self.client.post(f'/api/v1/users/{self.author[0]}/follow/', headers=self.reader[1])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(db.session.get(User, self.author[0]).num_followers, 1)
+        response = self.client.get('/api/v1/timeline/home/')
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,84 @@
+import json
+import unittest
+
+from flask_sqlalchemy.record_queries import get_recorded_queries
+
+from app import create_app, db
+from app.models import User
+from app.utils.token_cache import AuthIdentity, TokenCache, get_token_cache
+
+
+LOGIN_USER_EMAIL = 'jane@example.com'
+LOGIN_USER_PW = 'anotherpassword'
+
+
+class TokenCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000
+        self.cache = TokenCache(maxsize=2, clock=lambda: self.now)
+
+    def test_lru_eviction(self):
+        self.cache.set('a', {'exp': 2000}, AuthIdentity(1, 'a@example.com'))
+        self.cache.set('b', {'exp': 2000}, AuthIdentity(2, 'b@example.com'))
+        self.assertIsNotNone(self.cache.get('a'))
+        self.cache.set('c', {'exp': 2000}, AuthIdentity(3, 'c@example.com'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('c'))
+        self.assertEqual(self.cache.stats()['hits'], 3)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_expiry(self):
+        self.cache.set('a', {'exp': 1500}, AuthIdentity(1, 'a@example.com'))
+        self.assertIsNotNone(self.cache.get('a'))
+        self.now = 1500
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_invalidate_user(self):
+        self.cache.set('a', {'exp': 2000}, AuthIdentity(1, 'a@example.com'))
+        self.cache.set('b', {'exp': 2000}, AuthIdentity(1, 'a@example.com'))
+        self.cache.invalidate_user(1)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+
+
+class BearerTokenCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client(use_cookies=True)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _create_user_get_token(self):
+        user = User(email=LOGIN_USER_EMAIL, password=LOGIN_USER_PW)
+        db.session.add(user)
+        db.session.commit()
+        response = self.client.post('/api/v1/auth/login/', json={
+            'email': LOGIN_USER_EMAIL,
+            'password': LOGIN_USER_PW
+        })
+        return user, json.loads(response.data)['data']['token']
+
+    def test_cached_identity_skips_query(self):
+        user, token = self._create_user_get_token()
+        identity = User.get_identity_from_bearer_token(f'Bearer {token}')
+        self.assertEqual(identity, AuthIdentity(user.id, LOGIN_USER_EMAIL))
+
+        num_queries = len(get_recorded_queries())
+        self.assertEqual(User.get_identity_from_bearer_token(f'Bearer {token}'), identity)
+        self.assertEqual(len(get_recorded_queries()), num_queries)
+        self.assertEqual(get_token_cache().stats()['hits'], 1)
+
+    def test_deleted_user_is_invalidated(self):
+        user, token = self._create_user_get_token()
+        self.assertIsNotNone(User.get_identity_from_bearer_token(f'Bearer {token}'))
+        db.session.delete(user)
+        db.session.commit()
+        self.assertIsNone(User.get_identity_from_bearer_token(f'Bearer {token}'))
@@ -0,0 +1,134 @@
+import json
+import unittest
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from flask_sqlalchemy.record_queries import get_recorded_queries
+import jwt
+
+from app import create_app, db
+from app.models import Tweet, User
+from app.utils.common import TokenGenerator
+from config import config, TestingConfig
+
+
+LOGIN_USER_EMAIL = 'jane@example.com'
+LOGIN_USER_PW = 'anotherpassword'
+
+
+def make_ec_keys():
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private_pem, public_pem
+
+
+class TokenTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client(use_cookies=True)
+        user = User(email=LOGIN_USER_EMAIL, password=LOGIN_USER_PW)
+        db.session.add(user)
+        db.session.commit()
+        self.user = user
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _login(self):
+        response = self.client.post('/api/v1/auth/login/',
+                                    json={'email': LOGIN_USER_EMAIL, 'password': LOGIN_USER_PW})
+        return json.loads(response.data)['data']['token']
+
+    def test_login_issues_tokens_through_token_generator(self):
+        token = self._login()
+        claims = TokenGenerator.decode_token(token)
+        self.assertEqual(claims['id'], self.user.id)
+        self.assertNotIn('email', claims)
+        self.assertEqual(jwt.get_unverified_header(token)['alg'], 'HS256')
+        self.assertEqual(TokenGenerator.get_user_id(token), self.user.id)
+
+    def test_other_algorithms_are_rejected(self):
+        token = jwt.encode({'id': self.user.id, 'exp': 2 ** 32}, self.app.config['SECRET_KEY'], algorithm='HS512')
+        self.assertFalse(TokenGenerator.check_token(token))
+        self.assertTrue(TokenGenerator.check_token(self._login()))
+
+    def test_claims_only(self):
+        self.app.extensions.pop('token_cache')
+        bearer = f'Bearer {self._login()}'
+
+        def queries(**kwargs):
+            num_before = len(get_recorded_queries())
+            identity = User.get_identity_from_bearer_token(bearer, **kwargs)
+            self.assertEqual(identity.id, self.user.id)
+            return len(get_recorded_queries()) - num_before
+
+        with self.app.test_request_context():
+            self.assertEqual(queries(claims_only=True), 1)
+            self.app.config['AUTH_CLAIMS_ONLY'] = True
+            self.assertEqual(queries(claims_only=True), 0)
+            self.assertEqual(queries(), 1)
+
+        response = self.client.post('/api/v1/tweet/', json={'body': 'claims only tweet'},
+                                    headers={'Authorization': bearer})
+        self.assertEqual(response.status_code, 200)
+
+        # a deleted user's token still reads, but no longer writes
+        db.session.delete(self.user)
+        db.session.commit()
+        response = self.client.get('/api/v1/timeline/home/', headers={'Authorization': bearer})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/v1/tweet/', json={'body': 'orphaned tweet'},
+                                    headers={'Authorization': bearer})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Tweet.query.filter_by(body='orphaned tweet').count(), 0)
+
+
+class AsymmetricTokenTestCase(unittest.TestCase):
+    def setUp(self):
+        private_pem, public_pem = make_ec_keys()
+        config['es256-testing'] = type('ES256TestingConfig', (TestingConfig,), {
+            'JWT_ALGORITHM': 'ES256', 'JWT_PRIVATE_KEY': private_pem, 'JWT_PUBLIC_KEY': public_pem,
+        })
+        # an edge node with the public key only
+        config['es256-verify-testing'] = type('ES256VerifyTestingConfig', (TestingConfig,), {
+            'JWT_ALGORITHM': 'ES256', 'JWT_PUBLIC_KEY': public_pem, 'SECRET_KEY': 'another secret',
+        })
+
+    def tearDown(self):
+        del config['es256-testing']
+        del config['es256-verify-testing']
+
+    def test_sign_with_private_key_verify_with_public_key(self):
+        app = create_app('es256-testing')
+        with app.app_context():
+            db.create_all()
+            user = User(email=LOGIN_USER_EMAIL, password=LOGIN_USER_PW)
+            db.session.add(user)
+            db.session.commit()
+            response = app.test_client().post('/api/v1/auth/login/',
+                                              json={'email': LOGIN_USER_EMAIL, 'password': LOGIN_USER_PW})
+            token = json.loads(response.data)['data']['token']
+            self.assertEqual(jwt.get_unverified_header(token)['alg'], 'ES256')
+            db.session.remove()
+            db.drop_all()
+
+        edge = create_app('es256-verify-testing')
+        with edge.app_context():
+            self.assertEqual(TokenGenerator.get_user_id(token), user.id)
+            with self.assertRaises(RuntimeError):
+                TokenGenerator.encode_token(user)
+
+    def test_public_key_is_required(self):
+        config['es256-testing'].JWT_PUBLIC_KEY = None
+        with self.assertRaises(ValueError):
+            create_app('es256-testing')
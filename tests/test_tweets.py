@@ -1,9 +1,13 @@
+from datetime import datetime
 import json
 import unittest
 from urllib.parse import urlsplit, parse_qs
 
+from flask_sqlalchemy.record_queries import get_recorded_queries
+
 from app import create_app, db
-from app.models import User, Tweet
+from app.models import User, Tweet, Like, Retweet
+from app.utils.pagination import encode_cursor
 
 
 LOGIN_USER_EMAIL = 'jane@example.com'
@@ -167,6 +171,126 @@ class FlaskClientTestCase(unittest.TestCase):
             else:
                 self.assertEqual(tweets_per_page, len(data['tweets']))
 
+    def test_cursor_pagination(self):
+        num_tweets = 13
+        user_id, auth_token = self._create_user_get_token({
+            "email": LOGIN_USER_EMAIL,
+            "password": LOGIN_USER_PW
+        })
+        for i in range(1, num_tweets+1):
+            db.session.add(Tweet(user_id=user_id, body=f'TWEET {i} BODY'))
+        db.session.commit()
+
+        seen_ids = []
+        next = '/api/v1/tweets/?cursor=&count=exact'
+        while next:
+            data = json.loads(self.client.get(next).data)
+            self.assertEqual(data['count'], num_tweets)
+            seen_ids += [tweet['id'] for tweet in data['tweets']]
+            next = data['next']
+        expected_ids = [tweet.id for tweet in Tweet.query.order_by(Tweet.dateadded.desc(), Tweet.id.desc())]
+        self.assertEqual(seen_ids, expected_ids)
+
+        data = json.loads(self.client.get('/api/v1/tweets/?cursor=').data)
+        self.assertIsNone(data['count'])
+        self.assertIsNotNone(data['cursor'])
+
+        response = self.client.get('/api/v1/tweets/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+    def test_user_timeline(self):
+        user_id, auth_token = self._create_user_get_token({
+            "email": LOGIN_USER_EMAIL,
+            "password": LOGIN_USER_PW
+        })
+        user_id_2, auth_token = self._create_user_get_token({
+            "email": LOGIN_USER_EMAIL_2,
+            "password": LOGIN_USER_PW
+        })
+        for i in range(1, 8):
+            db.session.add(Tweet(user_id=user_id, body=f'TWEET {i} BODY'))
+            db.session.add(Tweet(user_id=user_id_2, body=f'OTHER {i} BODY'))
+        db.session.commit()
+
+        bodies = []
+        next = f'/api/v1/users/{user_id}/tweets/'
+        while next:
+            data = json.loads(self.client.get(next).data)
+            bodies += [tweet['body'] for tweet in data['tweets']]
+            next = data['next']
+        self.assertEqual(bodies, [f'TWEET {i} BODY' for i in range(7, 0, -1)])
+
+        response = self.client.get('/api/v1/users/12345/tweets/')
+        self.assertEqual(response.status_code, 404)
+
+    def _count_feed_queries(self):
+        num_before = len(get_recorded_queries())
+        response = self.client.get('/api/v1/tweets/')
+        self.assertEqual(response.status_code, 200)
+        return len(get_recorded_queries()) - num_before
+
+    def test_feed_query_count_is_constant(self):
+        # count the queries of rendering the page, not of serving it from the cache
+        self.app.extensions.pop('feed_cache')
+        user_id, auth_token = self._create_user_get_token({
+            "email": LOGIN_USER_EMAIL,
+            "password": LOGIN_USER_PW
+        })
+        tweet = Tweet(user_id=user_id, body='FIRST TWEET BODY')
+        db.session.add(tweet)
+        db.session.commit()
+        baseline = self._count_feed_queries()
+
+        # fill the page with tweets that have replies and likes
+        liker_ids = []
+        for email in [LOGIN_USER_EMAIL_2, LOGIN_USER_EMAIL_3]:
+            user = User(email=email, password=LOGIN_USER_PW)
+            db.session.add(user)
+            db.session.commit()
+            liker_ids.append(user.id)
+        for i in range(self.app.config['TWEETS_PER_PAGE']):
+            parent = Tweet(user_id=user_id, body=f'PARENT {i} BODY')
+            db.session.add(parent)
+            db.session.commit()
+            for j in range(3):
+                db.session.add(Tweet(user_id=user_id, body=f'REPLY {j} BODY', parent_id=parent.id))
+            for liker_id in liker_ids:
+                db.session.add(Like(user_id=liker_id, tweet_id=parent.id))
+            db.session.commit()
+
+        Tweet.reconcile_counters()
+        self.assertEqual(self._count_feed_queries(), baseline)
+
+        data = json.loads(self.client.get('/api/v1/tweets/').data)
+        for tweet in data['tweets']:
+            db_tweet = db.session.get(Tweet, tweet['id'])
+            self.assertEqual(tweet['children'], sorted(child.id for child in db_tweet.children))
+            self.assertEqual(tweet['num_replies'], len(db_tweet.children))
+
+    def test_feed_cache(self):
+        user_id, auth_token = self._create_user_get_token({
+            "email": LOGIN_USER_EMAIL,
+            "password": LOGIN_USER_PW
+        })
+        headers = {
+            'Authorization': f'Bearer {auth_token}'
+        }
+        response = self.client.post('/api/v1/tweet/', json={'body': 'This is my tweet'}, headers=headers)
+        tweet_id = json.loads(response.data)['data']['id']
+
+        response = self.client.get('/api/v1/tweets/')
+        etag = response.headers['ETag']
+        self.assertEqual(self._count_feed_queries(), 0)
+
+        response = self.client.get('/api/v1/tweets/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        # a like goes through a write path, which invalidates the cached page
+        response = self.client.post('/api/v1/tweet/like/', json={'tweet_id': tweet_id}, headers=headers)
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get('/api/v1/tweets/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['tweets'][0]['num_likes'], 1)
 
     def test_like_lifecycle(self):
         # Create Tweet
@@ -196,6 +320,8 @@ class FlaskClientTestCase(unittest.TestCase):
         like_id = json.loads(response.data)['data']['like_id']
         tweet = Tweet.query.filter_by(id=tweet.id)[0]
         self.assertTrue(like_id in [like.id for like in tweet.likes])
+        db.session.refresh(tweet)
+        self.assertEqual(tweet.num_likes, 1)
 
         # Delete Like via API
         data = {
@@ -203,4 +329,119 @@ class FlaskClientTestCase(unittest.TestCase):
         }
         response = self.client.delete(f'/api/v1/tweet/like/', json=data, headers=headers, follow_redirects=True)
         self.assertEqual(response.status_code, 200)
-        self.assertTrue(like_id not in [like.id for like in tweet.likes])
\ No newline at end of file
+        self.assertTrue(like_id not in [like.id for like in tweet.likes])
+        db.session.refresh(tweet)
+        self.assertEqual(tweet.num_likes, 0)
+
+    def test_retweet_lifecycle(self):
+        user_id, auth_token = self._create_user_get_token({
+            "email": LOGIN_USER_EMAIL,
+            "password": LOGIN_USER_PW
+        })
+        headers = {
+            'Authorization': f'Bearer {auth_token}'
+        }
+        tweet = Tweet(user_id=user_id, body='ORIGINAL TWEET BODY')
+        db.session.add(tweet)
+        db.session.commit()
+
+        response = self.client.post('/api/v1/tweet/retweet/', json={'tweet_id': tweet.id}, headers=headers)
+        self.assertEqual(response.status_code, 201)
+        retweet_id = json.loads(response.data)['data']['retweet_id']
+        response = self.client.post('/api/v1/tweet/retweet/', json={'tweet_id': tweet.id}, headers=headers)
+        self.assertEqual(response.status_code, 400)
+        db.session.refresh(tweet)
+        self.assertEqual(tweet.num_retweets, 1)
+
+        response = self.client.delete('/api/v1/tweet/retweet/', json={'retweet_id': retweet_id}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        db.session.refresh(tweet)
+        self.assertEqual(tweet.num_retweets, 0)
+        self.assertEqual(Retweet.query.count(), 0)
+
+        # deleting a tweet deletes its retweets
+        response = self.client.post('/api/v1/tweet/', json={'body': 'RETWEETED TWEET BODY'}, headers=headers)
+        id = json.loads(response.data)['data']['id']
+        self.client.post('/api/v1/tweet/retweet/', json={'tweet_id': id}, headers=headers)
+        self.assertEqual(Retweet.query.count(), 1)
+        response = self.client.delete(f'/api/v1/tweet/{id}/', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Retweet.query.count(), 0)
+
+    def test_feed_with_retweets(self):
+        user_id, auth_token = self._create_user_get_token({
+            "email": LOGIN_USER_EMAIL,
+            "password": LOGIN_USER_PW
+        })
+        headers = {
+            'Authorization': f'Bearer {auth_token}'
+        }
+        # tweets 1..5, with tweet 1 retweeted after tweet 3 and tweet 2 after tweet 5
+        expected = []
+        tweet_ids = []
+        for i in range(1, 6):
+            response = self.client.post('/api/v1/tweet/', json={'body': f'TWEET {i} BODY'}, headers=headers)
+            tweet_ids.append(json.loads(response.data)['data']['id'])
+            expected.append(('tweet', f'TWEET {i} BODY'))
+            retweeted = {3: 0, 5: 1}.get(i)
+            if retweeted is not None:
+                self.client.post('/api/v1/tweet/retweet/', json={'tweet_id': tweet_ids[retweeted]}, headers=headers)
+                expected.append(('retweet', f'TWEET {retweeted + 1} BODY'))
+
+        items = []
+        next = '/api/v1/tweets/?cursor=&include_retweets=1'
+        while next:
+            data = json.loads(self.client.get(next).data)
+            self.assertLessEqual(len(data['tweets']), self.app.config['TWEETS_PER_PAGE'])
+            items += data['tweets']
+            next = data['next']
+        self.assertEqual(
+            [(item['type'], item['tweet']['body'] if item['type'] == 'retweet' else item['body']) for item in items],
+            expected[::-1]
+        )
+
+        cursor = encode_cursor(datetime.utcnow(), tweet_ids[0], 'x')
+        response = self.client.get(f'/api/v1/tweets/?cursor={cursor}&include_retweets=1')
+        self.assertEqual(response.status_code, 400)
+
+    def test_reply_counter(self):
+        user_id, auth_token = self._create_user_get_token({
+            "email": LOGIN_USER_EMAIL,
+            "password": LOGIN_USER_PW
+        })
+        headers = {
+            'Authorization': f'Bearer {auth_token}'
+        }
+        tweet = Tweet(user_id=user_id, body='ORIGINAL TWEET BODY')
+        db.session.add(tweet)
+        db.session.commit()
+
+        data = {'body': 'REPLY #1', 'parent_id': tweet.id}
+        response = self.client.post('/api/v1/tweet/', json=data, headers=headers, follow_redirects=True)
+        reply_id = json.loads(response.data)['data']['id']
+        db.session.refresh(tweet)
+        self.assertEqual(tweet.num_replies, 1)
+
+        response = self.client.delete(f'/api/v1/tweet/{reply_id}/', headers=headers, follow_redirects=True)
+        self.assertEqual(response.status_code, 200)
+        db.session.refresh(tweet)
+        self.assertEqual(tweet.num_replies, 0)
+
+    def test_reconcile_counters(self):
+        user_id, auth_token = self._create_user_get_token({
+            "email": LOGIN_USER_EMAIL,
+            "password": LOGIN_USER_PW
+        })
+        tweet = Tweet(user_id=user_id, body='ORIGINAL TWEET BODY')
+        db.session.add(tweet)
+        db.session.commit()
+        # rows inserted directly bypass the counter updates
+        db.session.add(Tweet(user_id=user_id, body='REPLY BODY', parent_id=tweet.id))
+        db.session.add(Like(user_id=user_id, tweet_id=tweet.id))
+        db.session.commit()
+        self.assertEqual((tweet.num_likes, tweet.num_replies), (0, 0))
+
+        result = self.app.test_cli_runner().invoke(args=['reconcile-counters', '--batch-size', '1'])
+        self.assertIn('Reconciled counters on 1 tweets.', result.output)
+        db.session.refresh(tweet)
+        self.assertEqual((tweet.num_likes, tweet.num_replies), (1, 1))
\ No newline at end of file